@@ -0,0 +1,99 @@
+"""Recall / speed trade-off of the IVF memory index (orchestra.memory.ann) against brute force.
+
+Items are synthetic "topic" documents: most words come from one of --topics small Zipf
+vocabularies, the rest from a global Zipf vocabulary (stop words and rare words), since IVF
+relies on items forming clusters the way real text does (--data zipf drops the topics; expect
+much lower recall there). For each size the script builds one IVFIndex and reports its build
+time, then for every --nprobe the queries per second and recall@k against an exact scan of the
+same items (SparseVectorIndex scoring). Recall compares top-k scores, so tied items count as
+found whichever of them comes back.
+
+    python bench/ann_recall.py --sizes 10000,100000,1000000 --nprobe 16,96,256
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import random
+import time
+from collections import Counter
+
+from orchestra.memory.ann import IVFIndex
+from orchestra.memory.sparse import SparseVectorIndex
+from orchestra.memory.vector import MemoryItem
+
+class Corpus:
+    def __init__(self, rng: random.Random, vocab: int, topics: int, topic_words: int, topic_share: float) -> None:
+        self.rng = rng
+        self.words = [f"w{i}" for i in range(vocab)]
+        self.cum = list(itertools.accumulate(1.0 / (i + 1) for i in range(vocab)))
+        self.topics = [rng.sample(self.words[200:], topic_words) for _ in range(topics)]
+        self.topic_cum = list(itertools.accumulate(1.0 / (i + 1) for i in range(topic_words)))
+        self.topic_share = topic_share
+
+    def text(self, length: int) -> str:
+        rng = self.rng
+        n_topic = int(length * self.topic_share) if self.topics else 0
+        words = rng.choices(self.words, cum_weights=self.cum, k=length - n_topic)
+        if n_topic:
+            words += rng.choices(rng.choice(self.topics), cum_weights=self.topic_cum, k=n_topic)
+            rng.shuffle(words)
+        return " ".join(words)
+
+def recall(truth: list[list[tuple[MemoryItem, float]]], got: list[list[tuple[MemoryItem, float]]]) -> float:
+    hits = total = 0
+    for want, have in zip(truth, got):
+        a = Counter(round(s, 5) for _, s in want)
+        b = Counter(round(s, 5) for _, s in have)
+        hits += sum((a & b).values())
+        total += sum(a.values())
+    return hits / total if total else 1.0
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--nprobe", default="16,96,256")
+    ap.add_argument("--nlist", type=int, default=0, help="0 = sqrt(items)")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--data", choices=("topics", "zipf"), default="topics")
+    ap.add_argument("--vocab", type=int, default=50000)
+    ap.add_argument("--topics", type=int, default=300)
+    ap.add_argument("--topic-words", type=int, default=400)
+    ap.add_argument("--topic-share", type=float, default=0.6)
+    ap.add_argument("--doc-len", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = Corpus(rng, args.vocab, args.topics if args.data == "topics" else 0, args.topic_words, args.topic_share)
+    queries = [corpus.text(rng.randint(3, 8)) for _ in range(args.queries)]
+    nprobes = [int(p) for p in args.nprobe.split(",")]
+
+    print(f"{'items':>9} {'nlist':>6} {'build s':>8} {'nprobe':>6} {'QPS':>8} {'recall@k':>9}")
+    for size in sorted(int(s) for s in args.sizes.split(",")):
+        rng.seed(args.seed + size)
+        items = [MemoryItem(id=str(i), text=corpus.text(args.doc_len), meta={}) for i in range(size)]
+        index = IVFIndex(nlist=args.nlist, min_train=0)  # IVF at every size, even where exact is as fast
+        t0 = time.perf_counter()
+        for item in items:
+            index.add(item)
+        index._build()  # train and file everything now rather than inside the first query
+        build = time.perf_counter() - t0
+
+        # brute force over the same rows: the exact scan IVFIndex inherits
+        t0 = time.perf_counter()
+        truth = SparseVectorIndex.search_many(index, queries, k=args.k)
+        exact_qps = len(queries) / (time.perf_counter() - t0)
+        nlist = len(index._centroids) if index._centroids is not None else 0
+        print(f"{size:>9} {nlist:>6} {build:>8.1f} {'exact':>6} {exact_qps:>8.0f} {1.0:>9.3f}")
+        for nprobe in nprobes:
+            index.nprobe = nprobe
+            t0 = time.perf_counter()
+            got = [index.search(q, k=args.k) for q in queries]
+            qps = len(queries) / (time.perf_counter() - t0)
+            print(f"{size:>9} {nlist:>6} {'':>8} {nprobe:>6} {qps:>8.0f} {recall(truth, got):>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Query latency of TinyVectorIndex (or the NumPy SparseVectorIndex) as the number of items grows.
+
+Items and queries are drawn from a Zipf-distributed synthetic vocabulary (so there are stop
+words as well as rare terms). For each size the script reports the mean and p95 search latency,
+and for sizes up to --exact-max it also reports recall@k against a brute-force scan
+(--max-postings 0 makes the index exact, for comparison; --no-idf scores plain TF cosine). `--backend sparse` benchmarks
+SparseVectorIndex instead and adds the per-query time of one `search_many` over all queries;
+its recall compares top-k scores with an exact TinyVectorIndex built alongside.
+
+    python bench/vector_search.py --sizes 10000,100000,1000000 --queries 200
+    python bench/vector_search.py --backend sparse --sizes 10000,100000,1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import itertools
+import random
+import statistics
+import time
+from collections import Counter
+
+from orchestra.memory.vector import MemoryItem, TinyVectorIndex, _tf
+
+def make_vocab(n: int) -> tuple[list[str], list[float]]:
+    words = [f"w{i}" for i in range(n)]
+    cum = list(itertools.accumulate(1.0 / (i + 1) for i in range(n)))
+    return words, cum
+
+def make_text(rng: random.Random, words: list[str], cum: list[float], length: int) -> str:
+    return " ".join(rng.choices(words, cum_weights=cum, k=length))
+
+def brute_force(index: TinyVectorIndex, query: str, k: int) -> list[str]:
+    qv = _tf(query)
+    n = len(index.items)
+    qw = {t: v * index._weight(t, n) for t, v in qv.items()}
+    qn = sum(v * v for v in qw.values()) ** 0.5
+    scored = []
+    for i, vec in enumerate(index.vecs):
+        dot = sum(w * vec.get(t, 0.0) for t, w in qw.items())
+        if dot > 0:
+            scored.append((dot / (qn * index.norms[i]), -i, index.items[i].id))
+    return [s[2] for s in heapq.nlargest(k, scored)]
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--vocab", type=int, default=50000)
+    ap.add_argument("--doc-len", type=int, default=20)
+    ap.add_argument("--exact-max", type=int, default=100000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--max-postings", type=int, default=5000, help="0 = exact search")
+    ap.add_argument("--no-idf", dest="idf", action="store_false")
+    ap.add_argument("--backend", choices=("tiny", "sparse"), default="tiny")
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    words, weights = make_vocab(args.vocab)
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    queries = [make_text(rng, words, weights, rng.randint(3, 8)) for _ in range(args.queries)]
+
+    sparse = args.backend == "sparse"
+    if sparse:
+        from orchestra.memory.sparse import SparseVectorIndex
+
+        index = SparseVectorIndex(idf=args.idf)
+        ref = TinyVectorIndex(idf=args.idf)
+    else:
+        index = TinyVectorIndex(idf=args.idf, max_postings=args.max_postings)
+    batch_col = f" {'batch ms':>8}" if sparse else ""
+    print(f"{'items':>10} {'build s':>8} {'mean ms':>8} {'p95 ms':>8}{batch_col} {'recall@k':>9}")
+    t_build = 0.0
+    for size in sizes:
+        t0 = time.perf_counter()
+        for i in range(len(index.items), size):
+            item = MemoryItem(id=str(i), text=make_text(rng, words, weights, args.doc_len), meta={})
+            index.add(item)
+            if sparse and size <= args.exact_max:
+                ref.add(item)
+        t_build += time.perf_counter() - t0
+        if sparse:
+            index.search("")  # build the column view outside the timed loop
+
+        lat = []
+        for q in queries:
+            t0 = time.perf_counter()
+            index.search(q, k=args.k)
+            lat.append(time.perf_counter() - t0)
+        lat.sort()
+        batch = ""
+        if sparse:
+            t0 = time.perf_counter()
+            index.search_many(queries, k=args.k)
+            batch = f" {(time.perf_counter() - t0) * 1000 / len(queries):>8.2f}"
+
+        recall = "-"
+        if size <= args.exact_max:
+            sample = queries[: min(50, len(queries))]
+            hits = total = 0
+            for q in sample:
+                if sparse:
+                    # tied scores may come back in a different order (float32 storage), so
+                    # compare the top-k scores rather than ids
+                    want = Counter(round(s, 5) for _, s in ref.search(q, k=args.k))
+                    got = Counter(round(s, 5) for _, s in index.search(q, k=args.k))
+                    hits += sum((want & got).values())
+                    total += sum(want.values())
+                    continue
+                want = set(brute_force(index, q, args.k))
+                got = {it.id for it, _ in index.search(q, k=args.k)}
+                hits += len(want & got)
+                total += len(want)
+            recall = f"{hits / total:.3f}" if total else "-"
+        print(
+            f"{size:>10} {t_build:>8.1f} {statistics.mean(lat) * 1000:>8.2f} "
+            f"{lat[int(0.95 * (len(lat) - 1))] * 1000:>8.2f}{batch} {recall:>9}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,22 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from typing import Iterator
 from orchestra.agents.types import AgentResponse
 
 class Agent(ABC):
     name: str = "agent"
+    # safe to start before routing confirms it: no side effects and `stream` is lazy,
+    # so closing the iterator aborts the upstream call
+    speculative: bool = False
 
     @abstractmethod
-    def run(self, query: str) -> AgentResponse:
+    def run(self, query: str, history: list[dict[str, str]] | None = None) -> AgentResponse:
+        """Answer `query`; `history` is earlier conversation (role/content messages, oldest
+        first) to show the model before it."""
         raise NotImplementedError
+
+    def stream(self, query: str, history: list[dict[str, str]] | None = None) -> Iterator[str]:
+        """Return the answer as an iterator of text deltas. Agents that can't stream answer
+        up front and return it in one piece."""
+        return iter([self.run(query, history).text])
@@ -0,0 +1,139 @@
+"""Local route classifier.
+
+A multinomial logistic regression over hashed word unigrams and bigrams. It is trained from
+route decisions the LLM router made earlier (logged in session history) and answers in
+microseconds, so the router only pays for a model call when the classifier is unsure.
+
+Hashing uses crc32 (stable across processes) so a saved model means the same thing everywhere.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import random
+import zlib
+from pathlib import Path
+from typing import Iterable
+
+from orchestra.memory.session import SessionStore
+from orchestra.memory.vector import _tokenize
+
+DIM = 1 << 18
+
+def features(text: str) -> dict[int, float]:
+    toks = _tokenize(text)
+    grams = toks + [f"{a} {b}" for a, b in zip(toks, toks[1:])]
+    out: dict[int, float] = {}
+    for g in grams:
+        i = zlib.crc32(g.encode("utf-8")) % DIM
+        out[i] = out.get(i, 0.0) + 1.0
+    if out:
+        inv = 1.0 / math.sqrt(sum(v * v for v in out.values()))
+        for i in out:
+            out[i] *= inv
+    return out
+
+def _softmax(scores: list[float]) -> list[float]:
+    m = max(scores)
+    ex = [math.exp(s - m) for s in scores]
+    z = sum(ex)
+    return [e / z for e in ex]
+
+class RouteModel:
+    def __init__(self, labels: list[str]) -> None:
+        self.labels = list(labels)
+        self.weights: list[dict[int, float]] = [{} for _ in self.labels]
+        self.bias = [0.0] * len(self.labels)
+        self.trained_on = 0
+
+    def _scores(self, x: dict[int, float]) -> list[float]:
+        out = []
+        for w, b in zip(self.weights, self.bias):
+            s = b
+            for i, v in x.items():
+                wi = w.get(i)
+                if wi is not None:
+                    s += wi * v
+            out.append(s)
+        return out
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """Most likely label and its probability."""
+        probs = _softmax(self._scores(features(text)))
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.labels[best], probs[best]
+
+    def fit(
+        self,
+        examples: list[tuple[str, str]],
+        epochs: int = 12,
+        lr: float = 0.5,
+        l2: float = 1e-5,
+        seed: int = 0,
+    ) -> None:
+        """Plain SGD on the cross-entropy loss; L2 is applied lazily to touched weights only."""
+        idx = {lab: i for i, lab in enumerate(self.labels)}
+        data = [(features(t), idx[lab]) for t, lab in examples if lab in idx]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            step = lr / (1.0 + epoch)
+            for x, y in data:
+                probs = _softmax(self._scores(x))
+                for c, p in enumerate(probs):
+                    g = p - (1.0 if c == y else 0.0)
+                    if g == 0.0:
+                        continue
+                    w = self.weights[c]
+                    for i, v in x.items():
+                        w[i] = w.get(i, 0.0) * (1.0 - step * l2) - step * g * v
+                    self.bias[c] -= step * g
+        self.trained_on = len(data)
+
+    def accuracy(self, examples: Iterable[tuple[str, str]]) -> float | None:
+        n = ok = 0
+        for t, lab in examples:
+            n += 1
+            ok += int(self.predict(t)[0] == lab)
+        return ok / n if n else None
+
+    def save(self, path: str) -> None:
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        doc = {
+            "labels": self.labels,
+            "dim": DIM,
+            "bias": self.bias,
+            "trained_on": self.trained_on,
+            # drop near-zero weights; they only cost load time
+            "weights": [{str(i): round(v, 6) for i, v in w.items() if abs(v) > 1e-6} for w in self.weights],
+        }
+        tmp = p.with_suffix(p.suffix + ".tmp")
+        tmp.write_text(json.dumps(doc), encoding="utf-8")
+        tmp.replace(p)
+
+    @classmethod
+    def load(cls, path: str) -> "RouteModel | None":
+        p = Path(path)
+        if not p.exists():
+            return None
+        doc = json.loads(p.read_text(encoding="utf-8"))
+        if doc.get("dim") != DIM:
+            return None
+        m = cls(doc["labels"])
+        m.bias = [float(b) for b in doc["bias"]]
+        m.weights = [{int(i): float(v) for i, v in w.items()} for w in doc["weights"]]
+        m.trained_on = int(doc.get("trained_on", 0))
+        return m
+
+def examples_from_sessions(sessions: SessionStore) -> list[tuple[str, str]]:
+    """(user message, agent) pairs for turns the LLM router decided (not the classifier itself)."""
+    out: list[tuple[str, str]] = []
+    for sid in sessions.ids():
+        msgs = sessions.load(sid)
+        for prev, m in zip(msgs, msgs[1:]):
+            meta = m.meta or {}
+            if prev.role == "user" and m.role == "assistant" and meta.get("route_source") == "llm" and meta.get("agent"):
+                out.append((prev.content, str(meta["agent"])))
+    return out
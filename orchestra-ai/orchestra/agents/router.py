@@ -1,39 +1,134 @@
 from __future__ import annotations
 
 import json
+import threading
 from dataclasses import dataclass
-from typing import Any
+from typing import Iterator
 
+from orchestra.agents.base import Agent
+from orchestra.agents.route_model import RouteModel
+from orchestra.agents.specialists import AnalystAgent, PlannerAgent, ToolUserAgent, WriterAgent
 from orchestra.agents.types import AgentResponse
 from orchestra.llm.client import LLMClient
-from orchestra.agents.specialists import PlannerAgent, WriterAgent, AnalystAgent, ToolUserAgent
+from orchestra.llm.providers import StreamAbort, stream_abort
+from orchestra.llm.ratelimit import estimate_tokens
 from orchestra.tools.registry import ToolRegistry
 
 @dataclass
 class RouteDecision:
     agent: str
     reason: str
+    source: str = "llm"  # llm | model (local classifier) | heuristic
+    confidence: float | None = None
+
+class _Speculation:
+    """Drains an agent's streamed answer on a background thread until claimed or cancelled.
+    `cancel` also aborts the upstream request, so a stalled stream is let go at once rather
+    than at its next delta."""
+    def __init__(self, deltas: Iterator[str]) -> None:
+        self._deltas = deltas
+        self._abort = StreamAbort()
+        self._cond = threading.Condition()
+        self._done = False
+        self._parts: list[str] = []
+        self._error: BaseException | None = None
+        threading.Thread(target=self._drain, name="router-speculate", daemon=True).start()
+
+    def _drain(self) -> None:
+        stream_abort.set(self._abort)  # this thread's own context
+        try:
+            for d in self._deltas:
+                if self._abort.aborted:
+                    break
+                with self._cond:
+                    self._parts.append(d)
+                    self._cond.notify_all()
+        except BaseException as e:
+            self._error = e
+        finally:
+            # closing the generator aborts the upstream stream if we stopped early
+            close = getattr(self._deltas, "close", None)
+            if close is not None:
+                close()
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def cancel(self) -> None:
+        self._abort.abort()
+
+    def deltas(self) -> Iterator[str]:
+        """The answer as it arrives (what was drained so far first); closing this early
+        cancels the speculation, even before the first delta was read."""
+        gen = self._follow()
+        next(gen)  # enter the try below, so that close() reaches it
+        return gen
+
+    def _follow(self) -> Iterator[str]:
+        i = 0
+        try:
+            yield ""
+            while True:
+                with self._cond:
+                    while i == len(self._parts) and not self._done:
+                        self._cond.wait()
+                    new, i, done = self._parts[i:], len(self._parts), self._done
+                yield from new
+                if done:
+                    break
+        except GeneratorExit:
+            self.cancel()
+            raise
+        if self._error is not None:
+            raise self._error
+
+    def result(self) -> str:
+        with self._cond:
+            while not self._done:
+                self._cond.wait()
+        if self._error is not None:
+            raise self._error
+        return "".join(self._parts)
 
 class Router:
-    def __init__(self, llm: LLMClient, tools: ToolRegistry) -> None:
+    def __init__(
+        self,
+        llm: LLMClient,
+        tools: ToolRegistry,
+        tool_max_steps: int = 4,
+        route_model: RouteModel | None = None,
+        fastpath_threshold: float = 0.85,
+        speculate_agent: str | None = None,
+        speculate_max_tokens: int = 1000,
+    ) -> None:
         self.llm = llm
+        self.route_model = route_model
+        self.fastpath_threshold = fastpath_threshold
+        self.speculate_agent = speculate_agent or None
+        self.speculate_max_tokens = speculate_max_tokens
         self.agents = {
             "planner": PlannerAgent(llm),
             "writer": WriterAgent(llm),
             "analyst": AnalystAgent(llm),
-            "tool_user": ToolUserAgent(llm, tools),
+            "tool_user": ToolUserAgent(llm, tools, tool_max_steps),
         }
 
     def decide(self, query: str) -> RouteDecision:
+        if self.route_model is not None:
+            agent, p = self.route_model.predict(query)
+            if p >= self.fastpath_threshold and agent in self.agents:
+                self.llm.metrics.inc("orchestra_router_fastpath_total", outcome="hit")
+                return RouteDecision(agent, f"fast path: local classifier p={p:.2f}", "model", p)
+            self.llm.metrics.inc("orchestra_router_fastpath_total", outcome="fallback")
         system = (
             "Route the user request to one agent: planner, writer, analyst, tool_user. "
-            "Return STRICT JSON: {"agent":"...","reason":"..."}. "
+            'Return STRICT JSON: {"agent":"...","reason":"..."}. '
             "Use tool_user if math, file operations, or fetching a url is needed."
         )
         r = self.llm.chat([
             {"role":"system","content":system},
             {"role":"user","content":query},
-        ], temperature=0.0)
+        ], temperature=0.0, agent="router")
         txt = r.text.strip()
         try:
             obj = json.loads(txt)
@@ -45,15 +140,59 @@ class Router:
             # fallback heuristic
             q = query.lower()
             if any(k in q for k in ["plan","timeline","steps","roadmap"]):
-                return RouteDecision("planner","heuristic: planning keywords")
+                return RouteDecision("planner","heuristic: planning keywords","heuristic")
             if any(k in q for k in ["analyze","compare","pros","cons","estimate"]):
-                return RouteDecision("analyst","heuristic: analysis keywords")
+                return RouteDecision("analyst","heuristic: analysis keywords","heuristic")
             if any(k in q for k in ["http","url","calculate","calc","read file","write file"]):
-                return RouteDecision("tool_user","heuristic: tool keywords")
-            return RouteDecision("writer","heuristic fallback")
+                return RouteDecision("tool_user","heuristic: tool keywords","heuristic")
+            return RouteDecision("writer","heuristic fallback","heuristic")
+
+    def _speculation_target(self, query: str, history: list[dict[str, str]] | None = None) -> Agent | None:
+        """The agent to start alongside routing, or None when the policy says not to."""
+        agent = self.agents.get(self.speculate_agent or "")
+        if agent is None or not agent.speculative:
+            return None
+        if self.route_model is not None and self.route_model.predict(query)[1] >= self.fastpath_threshold:
+            return None  # routing is local and instant; nothing to overlap
+        # a wasted speculative call costs its whole prompt, history included
+        if estimate_tokens([*(history or []), {"role": "user", "content": query}]) > self.speculate_max_tokens:
+            self.llm.metrics.inc("orchestra_router_speculation_total", outcome="skipped")
+            return None
+        return agent
 
-    def run(self, query: str) -> AgentResponse:
-        d = self.decide(query)
-        resp = self.agents[d.agent].run(query)
-        resp.meta = (resp.meta or {}) | {"route_reason": d.reason}
+    def _speculate(self, query: str, history: list[dict[str, str]] | None) -> tuple[RouteDecision, _Speculation | None]:
+        """Route, with the speculative agent already answering alongside when the policy allows;
+        the speculation is returned only if the route picked that agent (else it is cancelled)."""
+        spec_agent = self._speculation_target(query, history)
+        spec = _Speculation(spec_agent.stream(query, history)) if spec_agent is not None else None
+        try:
+            d = self.decide(query)
+        except BaseException:
+            if spec is not None:
+                spec.cancel()
+            raise
+        if spec is None:
+            return d, None
+        if d.agent == spec_agent.name:
+            self.llm.metrics.inc("orchestra_router_speculation_total", outcome="hit")
+            return d, spec
+        self.llm.metrics.inc("orchestra_router_speculation_total", outcome="miss")
+        spec.cancel()
+        return d, None
+
+    def run(self, query: str, history: list[dict[str, str]] | None = None) -> AgentResponse:
+        """Route on `query` alone, then answer it with `history` (earlier turns) in context."""
+        d, spec = self._speculate(query, history)
+        if spec is not None:
+            resp = AgentResponse(spec.result(), {"agent": d.agent, "speculative": True})
+        else:
+            resp = self.agents[d.agent].run(query, history)
+        resp.meta = (resp.meta or {}) | {"route_reason": d.reason, "route_source": d.source}
         return resp
+
+    def stream(self, query: str, history: list[dict[str, str]] | None = None) -> tuple[RouteDecision, Iterator[str]]:
+        """Route, then return the decision and the chosen agent's answer as text deltas."""
+        d, spec = self._speculate(query, history)
+        if spec is not None:
+            return d, spec.deltas()
+        return d, self.agents[d.agent].stream(query, history)
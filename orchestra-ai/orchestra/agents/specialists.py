@@ -1,70 +1,114 @@
 from __future__ import annotations
 
+import json
+from typing import Any, Iterator
+
 from orchestra.agents.base import Agent
 from orchestra.agents.types import AgentResponse
 from orchestra.llm.client import LLMClient
-from orchestra.tools.registry import ToolRegistry
+from orchestra.llm.tool_parser import ToolBatch, ToolCall, ToolCallStream, parse_tool_output
+from orchestra.tools.registry import ToolJob, ToolRegistry
 
-def _mk(llm: LLMClient, system: str, user: str) -> str:
-    r = llm.chat([
+def _messages(system: str, user: str, history: list[dict[str, str]] | None = None) -> list[dict[str, str]]:
+    return [
         {"role":"system","content":system},
+        *(history or []),
         {"role":"user","content":user},
-    ])
+    ]
+
+def _mk(llm: LLMClient, system: str, user: str, agent: str | None = None, history: list[dict[str, str]] | None = None) -> str:
+    r = llm.chat(_messages(system, user, history), agent=agent)
     return r.text
 
-class PlannerAgent(Agent):
-    name = "planner"
+class _ChatAgent(Agent):
+    """An agent that is a single system prompt over the LLM."""
+    system = ""
+    speculative = True
     def __init__(self, llm: LLMClient) -> None:
         self.llm = llm
-    def run(self, query: str) -> AgentResponse:
-        system = "You are a planning assistant. Produce a numbered plan with checkpoints and risk notes."
-        return AgentResponse(_mk(self.llm, system, query), {"agent": self.name})
+    def run(self, query: str, history: list[dict[str, str]] | None = None) -> AgentResponse:
+        return AgentResponse(_mk(self.llm, self.system, query, self.name, history), {"agent": self.name})
+    def stream(self, query: str, history: list[dict[str, str]] | None = None) -> Iterator[str]:
+        return self.llm.stream(_messages(self.system, query, history), agent=self.name)
 
-class WriterAgent(Agent):
+class PlannerAgent(_ChatAgent):
+    name = "planner"
+    system = "You are a planning assistant. Produce a numbered plan with checkpoints and risk notes."
+
+class WriterAgent(_ChatAgent):
     name = "writer"
-    def __init__(self, llm: LLMClient) -> None:
-        self.llm = llm
-    def run(self, query: str) -> AgentResponse:
-        system = "You are a writing assistant. Produce a polished, structured deliverable."
-        return AgentResponse(_mk(self.llm, system, query), {"agent": self.name})
+    system = "You are a writing assistant. Produce a polished, structured deliverable."
 
-class AnalystAgent(Agent):
+class AnalystAgent(_ChatAgent):
     name = "analyst"
-    def __init__(self, llm: LLMClient) -> None:
-        self.llm = llm
-    def run(self, query: str) -> AgentResponse:
-        system = "You are an analyst. Be precise. Show assumptions. Use bullet points and small tables when useful."
-        return AgentResponse(_mk(self.llm, system, query), {"agent": self.name})
+    system = "You are an analyst. Be precise. Show assumptions. Use bullet points and small tables when useful."
+
+def _tool_block(tool: str, res: Any) -> str:
+    return f"Tool result ({tool}):\n\n```json\n{json.dumps(res, indent=2)}\n```"
+
+_NO_MORE_TOOLS = "No more tool calls are possible. Answer the request in plain text from the results above."
 
 class ToolUserAgent(Agent):
     name = "tool_user"
-    def __init__(self, llm: LLMClient, tools: ToolRegistry) -> None:
+    def __init__(self, llm: LLMClient, tools: ToolRegistry, max_steps: int = 4) -> None:
         self.llm = llm
         self.tools = tools
+        self.max_steps = max(1, max_steps)
 
-    def run(self, query: str) -> AgentResponse:
-        # lightweight tool calling: model outputs JSON commands we execute
+    def run(self, query: str, history: list[dict[str, str]] | None = None) -> AgentResponse:
+        # lightweight tool calling: model outputs JSON commands we execute, sees the results,
+        # and either calls more tools or answers in plain text
         system = (
             "You can use tools by outputting JSON with keys: tool, args. "
+            "To use several tools at once, output a JSON array of such objects. "
+            "After tool results are shown to you, call more tools or answer in plain text. "
             "If no tool needed, output plain text. "
             "Available tools: " + ", ".join([t.name for t in self.tools.specs()])
         )
-        out = _mk(self.llm, system, query)
-
-        # If JSON, try to execute tool
-        import json
-        out_str = out.strip()
-        if out_str.startswith("{") and out_str.endswith("}"):
-            try:
-                obj = json.loads(out_str)
-                tool = obj.get("tool")
-                args = obj.get("args", {})
-                if tool:
-                    res = self.tools.call(tool, args)
-                    return AgentResponse(
-                        f"Tool result ({tool}):\n\n```json\n{json.dumps(res, indent=2)}\n```",
-                        {"agent": self.name, "tool": tool},
-                    )
-            except Exception:
-                pass
-        return AgentResponse(out, {"agent": self.name})
+        messages = _messages(system, query, history)
+        pure = {t.name for t in self.tools.specs() if t.pure}
+        used: list[str] = []
+        text = ""
+        for step in range(1, self.max_steps + 1):
+            # stream the reply and start pure tool calls as soon as their JSON closes, so they
+            # run while the model is still writing the rest of the batch; calls with side
+            # effects wait until the whole batch has parsed
+            calls = ToolCallStream(early=lambda tool: tool in pure)
+            started: list[tuple[ToolCall, ToolJob]] = []
+            parts: list[str] = []
+            for delta in self.llm.stream(messages, agent=self.name):
+                parts.append(delta)
+                started += [(c, self.tools.submit(c.tool, c.args)) for c in calls.feed(delta)]
+            out = "".join(parts)
+            jobs = []
+            if calls.accepted:
+                # results in the order the calls were written, not the order they started
+                pos = {id(c): i for i, c in enumerate(calls.calls)}
+                jobs = [(c.tool, j) for c, j in sorted(started, key=lambda cj: pos.get(id(cj[0]), len(pos)))]
+            if not jobs:
+                parsed = parse_tool_output(out)
+                if not isinstance(parsed, ToolBatch) or not parsed.calls:
+                    text = out
+                    break
+                jobs = [(c.tool, self.tools.submit(c.tool, c.args)) for c in parsed.calls]
+            # independent calls overlap on the registry's pool; results stay in call order
+            results = [self.tools.wait(j) for _, j in jobs]
+            names = [n for n, _ in jobs]
+            used += names
+            text = "\n\n".join(_tool_block(n, r) for n, r in zip(names, results))
+            messages += [
+                {"role": "assistant", "content": out},
+                {"role": "user", "content": text},
+            ]
+        else:
+            # out of steps: one last call with tools off, so the answer isn't the raw tool blocks
+            messages[-1] = {"role": "user", "content": f"{text}\n\n{_NO_MORE_TOOLS}"}
+            final = self.llm.chat(messages, agent=self.name).text
+            parsed = parse_tool_output(final)
+            if not isinstance(parsed, ToolBatch) or not parsed.calls:
+                text = final  # else it still insists on tools; the results are the best we have
+        meta: dict[str, Any] = {"agent": self.name, "steps": step}
+        if used:
+            meta["tool"] = used[0]
+            meta["tools"] = used
+        return AgentResponse(text, meta)
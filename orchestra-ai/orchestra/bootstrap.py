@@ -1,13 +1,22 @@
 from __future__ import annotations
 
+import os
 from dataclasses import dataclass
+from functools import cached_property
 
 from orchestra.config import load_settings
+from orchestra.llm.cache import DiskCache
 from orchestra.llm.client import LLMClient
+from orchestra.metrics import Metrics
 from orchestra.tools.registry import ToolRegistry
 from orchestra.tools.builtins import install_builtin_tools
+from orchestra.tools.fetcher import HttpFetcher
+from orchestra.agents.route_model import RouteModel
 from orchestra.agents.router import Router
+from orchestra.memory.context import ContextAssembler
 from orchestra.memory.session import SessionStore
+from orchestra.memory.session_sqlite import SqliteSessionStore
+from orchestra.memory.vector import TinyVectorIndex
 
 @dataclass
 class AppContext:
@@ -15,13 +24,103 @@ class AppContext:
     llm: LLMClient
     tools: ToolRegistry
     router: Router
-    sessions: SessionStore
+    sessions: SessionStore | SqliteSessionStore
+    metrics: Metrics
+    context: ContextAssembler
+
+    @cached_property
+    def memory(self) -> object:
+        """TinyVectorIndex or a drop-in with the same add/search interface, opened on first use:
+        the persistent backend locks its directory, so commands that never touch memory don't
+        contend with a running server for it."""
+        return make_memory(self.settings)
+
+def make_sessions(settings) -> SessionStore | SqliteSessionStore:
+    """Chat history store selected by SESSION_BACKEND."""
+    if settings.session_backend == "jsonl":
+        return SessionStore(
+            settings.data_dir,
+            fsync=settings.session_fsync,
+            cache_sessions=settings.session_cache,
+            max_messages=settings.session_max_messages,
+            compact_interval_s=settings.session_compact_interval_s,
+        )
+    if settings.session_backend == "sqlite":
+        # an empty database starts with whatever the file backend had stored
+        return SqliteSessionStore(
+            settings.session_db, fsync=settings.session_fsync, import_dir=os.path.join(settings.data_dir, "sessions")
+        )
+    raise ValueError(f"unknown SESSION_BACKEND {settings.session_backend!r} (jsonl, sqlite)")
+
+def _numpy_backend(backend: str) -> None:
+    try:
+        import numpy  # noqa: F401
+    except ImportError as e:
+        raise ImportError(f"MEMORY_BACKEND={backend} needs NumPy: pip install -e .[fast]") from e
+
+def make_memory(settings) -> object:
+    """The long-term vector memory selected by MEMORY_BACKEND."""
+    if settings.memory_backend == "memory":
+        return TinyVectorIndex(idf=settings.memory_idf, max_postings=settings.memory_max_postings)
+    if settings.memory_backend == "sparse":
+        _numpy_backend("sparse")
+        from orchestra.memory.sparse import SparseVectorIndex
+
+        return SparseVectorIndex(idf=settings.memory_idf)
+    if settings.memory_backend == "persistent":
+        _numpy_backend("persistent")
+        from orchestra.memory.persistent import PersistentVectorIndex
+
+        return PersistentVectorIndex(
+            settings.memory_dir,
+            idf=settings.memory_idf,
+            flush_items=settings.memory_flush_items,
+            fsync=settings.memory_fsync,
+        )
+    if settings.memory_backend == "ivf":
+        _numpy_backend("ivf")
+        from orchestra.memory.ann import IVFIndex
+
+        return IVFIndex(idf=settings.memory_idf, nlist=settings.memory_ivf_nlist, nprobe=settings.memory_ivf_nprobe)
+    raise ValueError(f"unknown MEMORY_BACKEND {settings.memory_backend!r} (memory, sparse, persistent, ivf)")
 
 def bootstrap() -> AppContext:
     settings = load_settings()
-    llm = LLMClient(settings)
-    sessions = SessionStore(settings.data_dir)
-    tools = ToolRegistry()
-    install_builtin_tools(tools, settings.data_dir)
-    router = Router(llm, tools)
-    return AppContext(settings=settings, llm=llm, tools=tools, router=router, sessions=sessions)
+    metrics = Metrics(settings.metrics_log or None, log_max_bytes=settings.metrics_log_max_bytes)
+    llm = LLMClient(settings, metrics)
+    sessions = make_sessions(settings)
+    tools = ToolRegistry(
+        max_workers=settings.tool_max_workers,
+        timeout_s=settings.tool_timeout_s,
+        cache=DiskCache(settings.cache_dir, settings.cache_max_bytes, filename="tools.sqlite3"),
+        per_tool_concurrency=settings.tool_concurrency,
+    )
+    metrics.add_collector(tools.samples)
+    fetcher = HttpFetcher(
+        cache=DiskCache(settings.cache_dir, settings.cache_max_bytes, filename="http.sqlite3"),
+        per_host=settings.http_per_host,
+        max_redirects=settings.http_max_redirects,
+        timeout_s=settings.http_timeout_s,
+        default_ttl_s=settings.http_default_ttl_s,
+    )
+    install_builtin_tools(tools, settings.data_dir, fetcher)
+    router = Router(
+        llm,
+        tools,
+        tool_max_steps=settings.tool_max_steps,
+        route_model=RouteModel.load(settings.router_model_path),
+        fastpath_threshold=settings.router_fastpath_threshold,
+        speculate_agent=settings.router_speculate_agent,
+        speculate_max_tokens=settings.router_speculate_max_tokens,
+    )
+    context = ContextAssembler(
+        sessions,
+        llm,
+        settings.cache_dir,
+        budget_tokens=settings.context_budget_tokens,
+        summary_tokens=settings.context_summary_tokens,
+    )
+    return AppContext(
+        settings=settings, llm=llm, tools=tools, router=router, sessions=sessions, metrics=metrics,
+        context=context,
+    )
@@ -4,12 +4,14 @@ import json
 import uuid
 import typer
 from rich.console import Console
+from rich.live import Live
 from rich.panel import Panel
 from rich.table import Table
 
 from orchestra.bootstrap import bootstrap
 from orchestra.pipeline import PipelineRunner
 from orchestra.eval.harness import Evaluator
+from orchestra.metrics import iter_records, quantile, route_scope, summarize_by_agent
 
 app = typer.Typer(add_completion=False, help="Orchestra AI - modular agent framework")
 console = Console()
@@ -25,7 +27,10 @@ def tools():
     console.print(t)
 
 @app.command()
-def chat(session: str = typer.Option("chat", help="Session id")):
+def chat(
+    session: str = typer.Option("chat", help="Session id"),
+    stream: bool = typer.Option(True, help="Render the answer as it is generated"),
+):
     """Interactive chat (router + tools)."""
     ctx = bootstrap()
     console.print(Panel.fit("Type /exit to quit. Type /new to start a new session.", title="Orchestra"))
@@ -41,10 +46,25 @@ def chat(session: str = typer.Option("chat", help="Session id")):
             console.print(f"[green]new session:[/green] {sid}")
             continue
 
+        # earlier turns of this session, within CONTEXT_BUDGET_TOKENS
+        with route_scope("cli.chat"):
+            history = ctx.context.build(sid).messages
         ctx.sessions.append(sid, "user", msg)
-        resp = ctx.router.run(msg)
-        ctx.sessions.append(sid, "assistant", resp.text)
+        if stream:
+            with route_scope("cli.chat"):
+                d, deltas = ctx.router.stream(msg, history)
+            text = ""
+            title = f"assistant ({d.agent})"
+            with Live(Panel(text, title=title, subtitle=d.reason), console=console, refresh_per_second=12) as live:
+                for delta in deltas:
+                    text += delta
+                    live.update(Panel(text, title=title, subtitle=d.reason))
+            ctx.sessions.append(sid, "assistant", text, {"agent": d.agent, "route_source": d.source})
+            continue
+        with route_scope("cli.chat"):
+            resp = ctx.router.run(msg, history)
         meta = resp.meta or {}
+        ctx.sessions.append(sid, "assistant", resp.text, {"agent": meta.get("agent"), "route_source": meta.get("route_source")})
         console.print(Panel(resp.text, title=f"assistant ({meta.get('agent','?')})", subtitle=meta.get("route_reason","")))
 
 @app.command()
@@ -75,6 +95,118 @@ def eval(suite: str = typer.Option(..., help="Eval suite YAML"), show_failures:
             if not r.passed:
                 console.print(Panel(r.output, title=f"FAIL {r.id}", subtitle=r.notes))
 
+@app.command()
+def stats(log: str = typer.Option("", help="Call log (defaults to METRICS_LOG)")):
+    """Latency percentiles, cache hit rate and tokens per agent from the LLM call log."""
+    from orchestra.config import load_settings
+    path = log or load_settings().metrics_log
+    rows = summarize_by_agent(iter_records(path))
+    if not rows:
+        console.print(f"[yellow]no calls logged in[/yellow] {path}")
+        return
+
+    def ms(v):
+        return "-" if v is None else f"{v * 1000:.0f}"
+
+    t = Table(title=f"LLM calls by agent ({path})")
+    for c in ["agent", "calls", "p50 ms", "p95 ms", "p99 ms", "ttft p50 ms", "cache hit", "prompt tok", "completion tok"]:
+        t.add_column(c)
+    for r in rows:
+        t.add_row(
+            r["agent"], str(r["calls"]), ms(r["p50"]), ms(r["p95"]), ms(r["p99"]), ms(r["ttft_p50"]),
+            f"{r['cache_hit_rate']:.0%}", str(r["prompt_tokens"]), str(r["completion_tokens"]),
+        )
+    console.print(t)
+
+@app.command()
+def loadtest(
+    n: int = typer.Option(100, help="Total requests"),
+    concurrency: int = typer.Option(8, help="Requests in flight at once"),
+    prompt: str = typer.Option("Write a status update for request {i}.", help="'{i}' becomes the request number"),
+):
+    """Drive the router with concurrent requests; pair with MOCK_* settings for offline capacity tests."""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    ctx = bootstrap()
+
+    def one(i: int) -> float | None:
+        t0 = time.perf_counter()
+        try:
+            with route_scope("loadtest"):
+                ctx.router.run(prompt.replace("{i}", str(i)))
+        except Exception:
+            return None
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        lat = list(pool.map(one, range(n)))
+    wall = time.perf_counter() - t0
+    ok = [x for x in lat if x is not None]
+
+    t = Table(title=f"loadtest: {n} requests, concurrency {concurrency}")
+    t.add_column("metric")
+    t.add_column("value")
+    t.add_row("wall s", f"{wall:.2f}")
+    t.add_row("throughput req/s", f"{len(ok) / wall:.1f}" if wall else "-")
+    t.add_row("errors", str(n - len(ok)))
+    for q in (0.5, 0.95, 0.99):
+        v = quantile(ok, q)
+        t.add_row(f"p{int(q * 100)} ms", "-" if v is None else f"{v * 1000:.0f}")
+    spec = {o: ctx.metrics.counter("orchestra_router_speculation_total", outcome=o) for o in ("hit", "miss", "skipped")}
+    if any(spec.values()):
+        tried = spec["hit"] + spec["miss"]
+        t.add_row("speculation hit/miss/skipped", "/".join(str(int(v)) for v in spec.values()))
+        t.add_row("speculation hit rate", f"{spec['hit'] / tried:.0%}" if tried else "-")
+    console.print(t)
+
+@app.command("router-train")
+def router_train(min_examples: int = typer.Option(20, help="Refuse to train on fewer logged decisions")):
+    """Fit the local fast-path route classifier from LLM routing decisions in session history."""
+    from orchestra.agents.route_model import RouteModel, examples_from_sessions
+
+    ctx = bootstrap()
+    examples = examples_from_sessions(ctx.sessions)
+    if len(examples) < min_examples:
+        console.print(f"[yellow]only {len(examples)} logged routing decisions (need {min_examples})[/yellow]")
+        raise typer.Exit(1)
+
+    labels = sorted(ctx.router.agents)
+    # deterministic 80/20 split for a held-out accuracy estimate, then refit on everything
+    held = [e for i, e in enumerate(examples) if i % 5 == 4]
+    train = [e for i, e in enumerate(examples) if i % 5 != 4]
+    probe = RouteModel(labels)
+    probe.fit(train)
+    acc = probe.accuracy(held)
+
+    model = RouteModel(labels)
+    model.fit(examples)
+    model.save(ctx.settings.router_model_path)
+
+    t = Table(title=f"router model ({ctx.settings.router_model_path})")
+    t.add_column("agent")
+    t.add_column("examples")
+    for lab in labels:
+        t.add_row(lab, str(sum(1 for _, a in examples if a == lab)))
+    console.print(t)
+    console.print(f"held-out accuracy: {'-' if acc is None else f'{acc:.1%}'} on {len(held)} examples")
+
+@app.command("memory-compact")
+def memory_compact():
+    """Flush the persistent memory's log and merge its segments into one."""
+    ctx = bootstrap()
+    try:
+        memory = ctx.memory
+    except RuntimeError as e:  # IndexLockedError: the server has it open
+        console.print(f"[red]{e}[/red]; stop it first")
+        raise typer.Exit(1)
+    if not hasattr(memory, "compact"):
+        console.print(f"[yellow]MEMORY_BACKEND={ctx.settings.memory_backend} has nothing to compact[/yellow]")
+        raise typer.Exit(1)
+    memory.compact()
+    console.print(f"{len(memory)} items in {ctx.settings.memory_dir}")
+
 @app.command()
 def serve(port: int = 8000):
     """Start FastAPI server."""
@@ -10,6 +10,56 @@ class Settings:
     mock_mode: bool
     cache_dir: str
     data_dir: str
+    mock_ttft_s: float = 0.0
+    mock_tokens_per_s: float = 0.0
+    mock_error_rate: float = 0.0
+    mock_rate_limit_rate: float = 0.0
+    mock_seed: int = 0
+    llm_concurrency: int = 8
+    llm_rpm: float = 0.0
+    llm_tpm: float = 0.0
+    llm_expected_completion_tokens: int = 512
+    llm_max_retries: int = 5
+    llm_secondary: str = ""
+    llm_secondary_model: str = ""
+    hedge_quantile: float = 0.95
+    hedge_min_delay_s: float = 0.25
+    cache_max_bytes: int = 256 * 1024 * 1024
+    cache_ttl_s: float = 0.0
+    cache_hot_items: int = 1024
+    semantic_cache_agents: tuple[str, ...] = ()
+    semantic_cache_threshold: float = 0.92
+    semantic_cache_verify_rate: float = 0.0
+    metrics_log: str = ""
+    metrics_log_max_bytes: int = 64 * 1024 * 1024
+    router_model_path: str = ""
+    router_fastpath_threshold: float = 0.85
+    router_speculate_agent: str = ""
+    router_speculate_max_tokens: int = 1000
+    tool_max_workers: int = 8
+    tool_timeout_s: float = 15.0
+    tool_concurrency: int = 4
+    tool_max_steps: int = 4
+    http_default_ttl_s: float = 300.0
+    http_per_host: int = 4
+    http_max_redirects: int = 5
+    http_timeout_s: float = 10.0
+    memory_backend: str = "memory"
+    memory_idf: bool = False
+    memory_max_postings: int = 0
+    memory_dir: str = ""
+    memory_flush_items: int = 10_000
+    memory_fsync: bool = True
+    memory_ivf_nlist: int = 0
+    memory_ivf_nprobe: int = 96
+    session_backend: str = "jsonl"
+    session_db: str = ""
+    session_fsync: str = "interval"
+    session_cache: int = 64
+    session_max_messages: int = 0
+    session_compact_interval_s: float = 60.0
+    context_budget_tokens: int = 2000
+    context_summary_tokens: int = 300
 
 def load_settings() -> Settings:
     load_dotenv()
@@ -17,4 +67,111 @@ def load_settings() -> Settings:
     mock_mode = os.getenv("MOCK_MODE", "true").lower() == "true"
     cache_dir = os.getenv("CACHE_DIR", ".cache")
     data_dir = os.getenv("DATA_DIR", "data")
-    return Settings(model=model, mock_mode=mock_mode, cache_dir=cache_dir, data_dir=data_dir)
+    mock_ttft_s = float(os.getenv("MOCK_TTFT_MS", "0")) / 1000.0
+    mock_tokens_per_s = float(os.getenv("MOCK_TOKENS_PER_S", "0"))
+    mock_error_rate = float(os.getenv("MOCK_ERROR_RATE", "0"))
+    mock_rate_limit_rate = float(os.getenv("MOCK_RATE_LIMIT_RATE", "0"))
+    mock_seed = int(os.getenv("MOCK_SEED", "0"))
+    llm_concurrency = int(os.getenv("LLM_CONCURRENCY", "8"))
+    llm_rpm = float(os.getenv("LLM_RPM", "0"))
+    llm_tpm = float(os.getenv("LLM_TPM", "0"))
+    llm_expected_completion_tokens = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "512"))
+    llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+    llm_secondary = os.getenv("LLM_SECONDARY", "")
+    llm_secondary_model = os.getenv("LLM_SECONDARY_MODEL", "")
+    hedge_quantile = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+    hedge_min_delay_s = float(os.getenv("HEDGE_MIN_DELAY_MS", "250")) / 1000.0
+    cache_max_bytes = int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    cache_ttl_s = float(os.getenv("CACHE_TTL_SECONDS", "0"))
+    cache_hot_items = int(os.getenv("CACHE_HOT_ITEMS", "1024"))
+    semantic_cache_agents = tuple(
+        a.strip() for a in os.getenv("SEMANTIC_CACHE_AGENTS", "").split(",") if a.strip()
+    )
+    semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    semantic_cache_verify_rate = float(os.getenv("SEMANTIC_CACHE_VERIFY_RATE", "0"))
+    metrics_log = os.getenv("METRICS_LOG", os.path.join(data_dir, "metrics", "llm_calls.jsonl"))
+    metrics_log_max_bytes = int(os.getenv("METRICS_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+    router_model_path = os.getenv("ROUTER_MODEL", os.path.join(data_dir, "router_model.json"))
+    router_fastpath_threshold = float(os.getenv("ROUTER_FASTPATH_THRESHOLD", "0.85"))
+    router_speculate_agent = os.getenv("ROUTER_SPECULATE_AGENT", "").strip()
+    router_speculate_max_tokens = int(os.getenv("ROUTER_SPECULATE_MAX_TOKENS", "1000"))
+    tool_max_workers = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+    tool_timeout_s = float(os.getenv("TOOL_TIMEOUT_S", "15"))
+    tool_concurrency = int(os.getenv("TOOL_CONCURRENCY", "4"))
+    tool_max_steps = int(os.getenv("TOOL_MAX_STEPS", "4"))
+    http_default_ttl_s = float(os.getenv("HTTP_DEFAULT_TTL_S", "300"))
+    http_per_host = int(os.getenv("HTTP_PER_HOST", "4"))
+    http_max_redirects = int(os.getenv("HTTP_MAX_REDIRECTS", "5"))
+    http_timeout_s = float(os.getenv("HTTP_TIMEOUT_S", "10"))
+    memory_backend = os.getenv("MEMORY_BACKEND", "memory").strip().lower()
+    memory_idf = os.getenv("MEMORY_IDF", "false").lower() == "true"
+    memory_max_postings = int(os.getenv("MEMORY_MAX_POSTINGS", "0"))
+    memory_dir = os.getenv("MEMORY_DIR", os.path.join(data_dir, "memory"))
+    memory_flush_items = int(os.getenv("MEMORY_FLUSH_ITEMS", "10000"))
+    memory_fsync = os.getenv("MEMORY_FSYNC", "true").lower() == "true"
+    memory_ivf_nlist = int(os.getenv("MEMORY_IVF_NLIST", "0"))
+    memory_ivf_nprobe = int(os.getenv("MEMORY_IVF_NPROBE", "96"))
+    session_backend = os.getenv("SESSION_BACKEND", "jsonl").strip().lower()
+    session_db = os.getenv("SESSION_DB", os.path.join(data_dir, "sessions.sqlite3"))
+    session_fsync = os.getenv("SESSION_FSYNC", "interval").strip().lower()
+    session_cache = int(os.getenv("SESSION_CACHE", "64"))
+    session_max_messages = int(os.getenv("SESSION_MAX_MESSAGES", "0"))
+    session_compact_interval_s = float(os.getenv("SESSION_COMPACT_INTERVAL_S", "60"))
+    context_budget_tokens = int(os.getenv("CONTEXT_BUDGET_TOKENS", "2000"))
+    context_summary_tokens = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "300"))
+    return Settings(
+        model=model,
+        mock_mode=mock_mode,
+        cache_dir=cache_dir,
+        data_dir=data_dir,
+        mock_ttft_s=mock_ttft_s,
+        mock_tokens_per_s=mock_tokens_per_s,
+        mock_error_rate=mock_error_rate,
+        mock_rate_limit_rate=mock_rate_limit_rate,
+        mock_seed=mock_seed,
+        llm_concurrency=llm_concurrency,
+        llm_rpm=llm_rpm,
+        llm_tpm=llm_tpm,
+        llm_expected_completion_tokens=llm_expected_completion_tokens,
+        llm_max_retries=llm_max_retries,
+        llm_secondary=llm_secondary,
+        llm_secondary_model=llm_secondary_model,
+        hedge_quantile=hedge_quantile,
+        hedge_min_delay_s=hedge_min_delay_s,
+        cache_max_bytes=cache_max_bytes,
+        cache_ttl_s=cache_ttl_s,
+        cache_hot_items=cache_hot_items,
+        semantic_cache_agents=semantic_cache_agents,
+        semantic_cache_threshold=semantic_cache_threshold,
+        semantic_cache_verify_rate=semantic_cache_verify_rate,
+        metrics_log=metrics_log,
+        metrics_log_max_bytes=metrics_log_max_bytes,
+        router_model_path=router_model_path,
+        router_fastpath_threshold=router_fastpath_threshold,
+        router_speculate_agent=router_speculate_agent,
+        router_speculate_max_tokens=router_speculate_max_tokens,
+        tool_max_workers=tool_max_workers,
+        tool_timeout_s=tool_timeout_s,
+        tool_concurrency=tool_concurrency,
+        tool_max_steps=tool_max_steps,
+        http_default_ttl_s=http_default_ttl_s,
+        http_per_host=http_per_host,
+        http_max_redirects=http_max_redirects,
+        http_timeout_s=http_timeout_s,
+        memory_backend=memory_backend,
+        memory_idf=memory_idf,
+        memory_max_postings=memory_max_postings,
+        memory_dir=memory_dir,
+        memory_flush_items=memory_flush_items,
+        memory_fsync=memory_fsync,
+        memory_ivf_nlist=memory_ivf_nlist,
+        memory_ivf_nprobe=memory_ivf_nprobe,
+        session_backend=session_backend,
+        session_db=session_db,
+        session_fsync=session_fsync,
+        session_cache=session_cache,
+        session_max_messages=session_max_messages,
+        session_compact_interval_s=session_compact_interval_s,
+        context_budget_tokens=context_budget_tokens,
+        context_summary_tokens=context_summary_tokens,
+    )
@@ -6,6 +6,7 @@ from dataclasses import dataclass
 from typing import Any, Callable
 
 from orchestra.agents.router import Router
+from orchestra.metrics import route_scope
 
 @dataclass
 class CaseResult:
@@ -49,7 +50,8 @@ class Evaluator:
             cid = str(c.get("id"))
             prompt = str(c.get("prompt",""))
             rules = c.get("rules", [])
-            resp = self.router.run(prompt).text
+            with route_scope("eval"):
+                resp = self.router.run(prompt).text
             score, notes = _score_rules(resp, rules)
             passed = score >= float(c.get("pass_score", 0.75))
             out.append(CaseResult(id=cid, passed=passed, score=score, notes=notes, output=resp))
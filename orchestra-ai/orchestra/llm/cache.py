@@ -3,6 +3,11 @@ from __future__ import annotations
 import hashlib
 import json
 import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
 from pathlib import Path
 from typing import Any
 
@@ -10,19 +15,198 @@ def _key(payload: dict[str, Any]) -> str:
     blob = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
     return hashlib.sha256(blob).hexdigest()
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta(name, value) VALUES ('bytes', 0);
+"""
+
+# evict down to this fraction of max_bytes so we don't evict on every set
+_LOW_WATER = 0.9
+# only write accessed_at back to disk when it is older than this (keeps reads read-only)
+_TOUCH_INTERVAL_S = 60.0
+
+@dataclass
+class CacheStats:
+    hot_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    sets: int = 0
+    evictions: int = 0
+    expired: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+
 class DiskCache:
-    def __init__(self, cache_dir: str) -> None:
+    """Response cache in a single SQLite file (WAL mode) with an in-process LRU hot tier.
+
+    Entries are evicted least-recently-used once the file holds more than `max_bytes` of values,
+    and expire after `ttl_s` seconds (0 = never). Several processes (e.g. uvicorn workers) can
+    share one file; SQLite's locking serializes the writers.
+    """
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_s: float = 0.0,
+        hot_items: int = 1024,
+        filename: str = "llm_cache.sqlite3",
+    ) -> None:
         self.root = Path(cache_dir)
         self.root.mkdir(parents=True, exist_ok=True)
+        self.path = self.root / filename
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.hot_items = hot_items
+        self.counters = CacheStats()
+        self._hot: OrderedDict[str, tuple[str, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _hot_put(self, k: str, value: str, expires_at: float | None) -> None:
+        if self.hot_items <= 0:
+            return
+        with self._lock:
+            self._hot[k] = (value, expires_at)
+            self._hot.move_to_end(k)
+            while len(self._hot) > self.hot_items:
+                self._hot.popitem(last=False)
 
     def get(self, payload: dict[str, Any]) -> str | None:
+        return self.lookup(payload)[0]
+
+    def lookup(self, payload: dict[str, Any]) -> tuple[str | None, str | None]:
+        """Like `get`, but also says which tier answered: "hot", "disk" or None on a miss."""
         k = _key(payload)
-        p = self.root / f"{k}.json"
-        if not p.exists():
-            return None
-        return p.read_text(encoding="utf-8")
+        now = time.time()
+        with self._lock:
+            hit = self._hot.get(k)
+            if hit is not None:
+                value, expires_at = hit
+                if expires_at is None or expires_at > now:
+                    self._hot.move_to_end(k)
+                    self.counters.hot_hits += 1
+                    return value, "hot"
+                del self._hot[k]
+
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (k,)
+        ).fetchone()
+        if row is None:
+            with self._lock:
+                self.counters.misses += 1
+            return None, None
+        value, expires_at, accessed_at = row
+        if expires_at is not None and expires_at <= now:
+            self._delete(k)
+            with self._lock:
+                self.counters.misses += 1
+                self.counters.expired += 1
+            return None, None
+        if now - accessed_at > _TOUCH_INTERVAL_S:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, k))
+        self._hot_put(k, value, expires_at)
+        with self._lock:
+            self.counters.disk_hits += 1
+            self.counters.bytes_read += len(value)
+        return value, "disk"
 
-    def set(self, payload: dict[str, Any], value: str) -> None:
+    def set(self, payload: dict[str, Any], value: str, ttl: float | None = None) -> None:
+        """Store `value`. `ttl` overrides the cache-wide TTL for this entry (<= 0 = never expires)."""
         k = _key(payload)
-        p = self.root / f"{k}.json"
-        p.write_text(value, encoding="utf-8")
+        now = time.time()
+        ttl = self.ttl_s if ttl is None else ttl
+        expires_at = now + ttl if ttl > 0 else None
+        size = len(value.encode("utf-8"))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (k,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries(key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (k, value, size, expires_at, now),
+            )
+            conn.execute(
+                "UPDATE meta SET value = value + ? WHERE name = 'bytes'",
+                (size - (old[0] if old else 0),),
+            )
+            total = conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+            evicted = self._evict(conn, total, now) if total > self.max_bytes else 0
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._hot_put(k, value, expires_at)
+        with self._lock:
+            self.counters.sets += 1
+            self.counters.bytes_written += size
+            self.counters.evictions += evicted
+
+    def _evict(self, conn: sqlite3.Connection, total: int, now: float) -> int:
+        # expired entries go first, then least recently used until under the low-water mark
+        target = int(self.max_bytes * _LOW_WATER)
+        freed = conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (now,),
+        ).fetchone()
+        conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        total -= freed[0]
+        n = freed[1]
+        while total > target:
+            rows = conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                n += 1
+                with self._lock:
+                    self._hot.pop(key, None)
+        conn.execute("UPDATE meta SET value = ? WHERE name = 'bytes'", (max(0, total),))
+        return n
+
+    def _delete(self, k: str) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT size FROM entries WHERE key = ?", (k,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM entries WHERE key = ?", (k,))
+                conn.execute("UPDATE meta SET value = value - ? WHERE name = 'bytes'", (row[0],))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> dict[str, Any]:
+        conn = self._conn()
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        stored = conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+        with self._lock:
+            out: dict[str, Any] = asdict(self.counters)
+            out["hot_entries"] = len(self._hot)
+        out.update({"entries": entries, "bytes": stored, "max_bytes": self.max_bytes, "path": str(self.path)})
+        return out
@@ -1,61 +1,328 @@
 from __future__ import annotations
 
-import os
+import asyncio
+import time
 from dataclasses import dataclass
-from typing import Any, Iterable
+from typing import Any, Iterable, Iterator
 
 from orchestra.config import Settings
-from orchestra.llm.cache import DiskCache
+from orchestra.llm.cache import DiskCache, _key
+from orchestra.llm.providers import Completion, Provider, build_provider, stream_abort
+from orchestra.llm.ratelimit import TokenBucket, estimate_tokens, is_retryable, retry_delay
+from orchestra.llm.semantic_cache import SemanticCache, SemanticMatch
+from orchestra.llm.singleflight import SingleFlight
+from orchestra.metrics import CallRecord, Metrics, Sample, current_route
 
 @dataclass
 class LLMResult:
     text: str
     cached: bool
+    coalesced: bool = False
+    tier: str | None = None  # what answered instead of upstream: hot, disk, semantic, coalesced
+    latency_s: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
 
-def _mock_text(messages: list[dict[str, str]]) -> str:
-    # deterministic-ish mock
-    joined = "\n".join([f"{m['role']}: {m['content']}" for m in messages])[:2000]
-    h = abs(hash(joined)) % 99991
-    return f"""MOCK_MODE RESPONSE
-seed={h}
-
-I can't call a real model right now because MOCK_MODE=true.
-I received this input (truncated):
-{joined}
-"""
+@dataclass
+class _LoopState:
+    """Per-event-loop async resources (asyncio primitives bind to the loop they first run on)."""
+    loop: asyncio.AbstractEventLoop
+    sem: asyncio.Semaphore
+    rpm: TokenBucket | None
+    tpm: TokenBucket | None
 
 class LLMClient:
-    def __init__(self, settings: Settings) -> None:
+    def __init__(
+        self, settings: Settings, metrics: Metrics | None = None, provider: Provider | None = None
+    ) -> None:
         self.settings = settings
-        self.cache = DiskCache(settings.cache_dir)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.provider = provider if provider is not None else build_provider(settings, self.metrics)
+        self.cache = DiskCache(
+            settings.cache_dir,
+            max_bytes=settings.cache_max_bytes,
+            ttl_s=settings.cache_ttl_s,
+            hot_items=settings.cache_hot_items,
+        )
+        self._astate: _LoopState | None = None
+        # identical payloads in flight at the same time share one upstream call
+        self._flight = SingleFlight()
+        self.semantic: SemanticCache | None = None
+        if settings.semantic_cache_agents:
+            self.semantic = SemanticCache(
+                threshold=settings.semantic_cache_threshold,
+                verify_rate=settings.semantic_cache_verify_rate,
+            )
+        self.metrics.add_collector(self._samples)
 
-    def chat(self, messages: list[dict[str, str]], temperature: float = 0.2) -> LLMResult:
-        payload: dict[str, Any] = {
+    def _payload(self, messages: list[dict[str, str]], temperature: float) -> dict[str, Any]:
+        return {
             "model": self.settings.model,
             "messages": messages,
             "temperature": temperature,
         }
-        cached = self.cache.get(payload)
+
+    def _async_state(self) -> _LoopState:
+        # rebuild when called from a different loop (e.g. repeated asyncio.run)
+        loop = asyncio.get_running_loop()
+        st = self._astate
+        if st is None or st.loop is not loop:
+            rpm, tpm = self.settings.llm_rpm, self.settings.llm_tpm
+            st = self._astate = _LoopState(
+                loop=loop,
+                sem=asyncio.Semaphore(max(1, self.settings.llm_concurrency)),
+                rpm=TokenBucket(rpm) if rpm > 0 else None,
+                tpm=TokenBucket(tpm) if tpm > 0 else None,
+            )
+        return st
+
+    def _observe(
+        self,
+        agent: str | None,
+        route: str | None,
+        t0: float,
+        res: LLMResult | None,
+        ttft: float | None = None,
+        stream: bool = False,
+        tier: str | None = None,
+    ) -> None:
+        latency = time.perf_counter() - t0
+        if res is not None:
+            res.latency_s = latency
+        self.metrics.observe_call(CallRecord(
+            agent=agent,
+            route=route,
+            tier=tier or (res.tier if res is not None and res.tier else "upstream"),
+            latency_s=latency,
+            ttft_s=ttft,
+            prompt_tokens=res.prompt_tokens if res is not None else 0,
+            completion_tokens=res.completion_tokens if res is not None else 0,
+            stream=stream,
+            ok=res is not None,
+        ))
+
+    def _result(self, c: Completion, coalesced: bool) -> LLMResult:
+        if coalesced:
+            # the leader is charged for the tokens; waiters rode along for free
+            return LLMResult(text=c.text, cached=False, coalesced=True, tier="coalesced")
+        return LLMResult(
+            text=c.text,
+            cached=c.tier is not None,
+            tier=c.tier,
+            prompt_tokens=c.prompt_tokens,
+            completion_tokens=c.completion_tokens,
+        )
+
+    def chat(
+        self, messages: list[dict[str, str]], temperature: float = 0.2, agent: str | None = None
+    ) -> LLMResult:
+        t0 = time.perf_counter()
+        route = current_route.get()
+        res: LLMResult | None = None
+        try:
+            payload = self._payload(messages, temperature)
+            cached, tier = self.cache.lookup(payload)
+            if cached is not None:
+                res = LLMResult(text=cached, cached=True, tier=tier)
+                return res
+            match = self._semantic_lookup(payload, agent)
+            if match is not None and match.hit and not self.semantic.should_verify():
+                res = LLMResult(text=match.answer, cached=True, tier="semantic")
+                return res
+            c, coalesced = self._flight.do(_key(payload), lambda: self._complete(payload))
+            if not coalesced:
+                self._semantic_record(payload, agent, match, c.text)
+            res = self._result(c, coalesced)
+            return res
+        finally:
+            self._observe(agent, route, t0, res)
+
+    async def achat(
+        self, messages: list[dict[str, str]], temperature: float = 0.2, agent: str | None = None
+    ) -> LLMResult:
+        """Async variant of `chat`. At most `settings.llm_concurrency` upstream calls run at once."""
+        t0 = time.perf_counter()
+        route = current_route.get()
+        res: LLMResult | None = None
+        try:
+            payload = self._payload(messages, temperature)
+            cached, tier = self.cache.lookup(payload)
+            if cached is not None:
+                res = LLMResult(text=cached, cached=True, tier=tier)
+                return res
+            match = self._semantic_lookup(payload, agent)
+            if match is not None and match.hit and not self.semantic.should_verify():
+                res = LLMResult(text=match.answer, cached=True, tier="semantic")
+                return res
+            c, coalesced = await self._flight.ado(_key(payload), lambda: self._acomplete(payload))
+            if not coalesced:
+                self._semantic_record(payload, agent, match, c.text)
+            res = self._result(c, coalesced)
+            return res
+        finally:
+            self._observe(agent, route, t0, res)
+
+    def _semantic_lookup(self, payload: dict[str, Any], agent: str | None) -> SemanticMatch | None:
+        if self.semantic is None or agent not in self.settings.semantic_cache_agents:
+            return None
+        return self.semantic.lookup(payload)
+
+    def _semantic_record(
+        self, payload: dict[str, Any], agent: str | None, match: SemanticMatch | None, out: str
+    ) -> None:
+        if self.semantic is None or agent not in self.settings.semantic_cache_agents:
+            return
+        if match is not None and match.hit:
+            self.semantic.record_verification(match.answer, out)
+        else:
+            self.semantic.record_miss(match, out)
+        self.semantic.add(payload, out)
+
+    def _complete(self, payload: dict[str, Any]) -> Completion:
+        # re-check: a leader that finished between our cache miss and joining the flight has stored it
+        cached, tier = self.cache.lookup(payload)
         if cached is not None:
-            return LLMResult(text=cached, cached=True)
+            return Completion(cached, tier=tier)
+        c = self.provider.complete(payload)
+        self.cache.set(payload, c.text)
+        return c
 
-        if self.settings.mock_mode:
-            out = _mock_text(messages)
-            self.cache.set(payload, out)
-            return LLMResult(text=out, cached=False)
+    async def _acomplete(self, payload: dict[str, Any]) -> Completion:
+        cached, tier = self.cache.lookup(payload)
+        if cached is not None:
+            return Completion(cached, tier=tier)
+        # async upstream calls spend RPM/TPM budget; cache hits above never get here
+        st = self._async_state()
+        reserved = estimate_tokens(payload["messages"]) + self.settings.llm_expected_completion_tokens
+        if st.rpm is not None:
+            await st.rpm.acquire(1)
+        if st.tpm is not None:
+            await st.tpm.acquire(reserved)
+        async with st.sem:
+            c = await self.provider.acomplete(payload)
+        if st.tpm is not None:
+            st.tpm.refund(reserved - (c.prompt_tokens + c.completion_tokens))
+        self.cache.set(payload, c.text)
+        return c
 
-        from openai import OpenAI
+    def chat_many(
+        self,
+        batch: list[list[dict[str, str]]],
+        temperature: float = 0.2,
+        agent: str | None = None,
+        return_exceptions: bool = False,
+    ) -> list[LLMResult | BaseException]:
+        """Run many chats concurrently under the RPM/TPM budget, in input order.
+        From async code use `achat_many` instead."""
 
-        key = os.getenv("OPENAI_API_KEY")
-        if not key:
-            raise RuntimeError("Missing OPENAI_API_KEY. Set it in .env or environment variables.")
+        async def run() -> list[LLMResult | BaseException]:
+            try:
+                return await self.achat_many(batch, temperature, agent, return_exceptions)
+            finally:
+                await self.provider.aclose()  # the loop ends here; so does its client
 
-        client = OpenAI(api_key=key)
-        r = client.chat.completions.create(
-            model=self.settings.model,
-            messages=messages,
-            temperature=temperature,
-        )
-        out = r.choices[0].message.content or ""
-        self.cache.set(payload, out)
-        return LLMResult(text=out, cached=False)
+        return asyncio.run(run())
+
+    async def achat_many(
+        self,
+        batch: list[list[dict[str, str]]],
+        temperature: float = 0.2,
+        agent: str | None = None,
+        return_exceptions: bool = False,
+    ) -> list[LLMResult | BaseException]:
+        async def one(messages: list[dict[str, str]]) -> LLMResult:
+            attempt = 0
+            while True:
+                try:
+                    return await self.achat(messages, temperature, agent=agent)
+                except Exception as e:
+                    if attempt >= self.settings.llm_max_retries or not is_retryable(e):
+                        raise
+                    await asyncio.sleep(retry_delay(e, attempt))
+                    attempt += 1
+
+        return await asyncio.gather(*[one(m) for m in batch], return_exceptions=return_exceptions)
+
+    def stats(self) -> dict[str, Any]:
+        out = {"cache": self.cache.stats(), "singleflight": self._flight.snapshot()}
+        if self.semantic is not None:
+            out["semantic"] = self.semantic.stats()
+        return out
+
+    def _samples(self) -> Iterable[Sample]:
+        st = self.stats()
+        cache = st["cache"]
+        yield ("orchestra_cache_hits_total", "counter", "Exact cache hits by tier.", {"tier": "hot"}, cache["hot_hits"])
+        yield ("orchestra_cache_hits_total", "counter", "Exact cache hits by tier.", {"tier": "disk"}, cache["disk_hits"])
+        yield ("orchestra_cache_misses_total", "counter", "Exact cache misses.", {}, cache["misses"])
+        yield ("orchestra_cache_evictions_total", "counter", "Exact cache evictions.", {}, cache["evictions"])
+        yield ("orchestra_cache_bytes", "gauge", "Bytes stored in the exact cache.", {}, cache["bytes"])
+        yield ("orchestra_cache_entries", "gauge", "Entries in the exact cache.", {}, cache["entries"])
+        flight = st["singleflight"]
+        yield ("orchestra_llm_coalesced_total", "counter", "Calls that waited on an identical in-flight call.", {}, flight["coalesced"])
+        yield ("orchestra_llm_in_flight", "gauge", "Distinct upstream calls in flight.", {}, flight["in_flight"])
+        sem = st.get("semantic")
+        if sem:
+            yield ("orchestra_semantic_cache_hits_total", "counter", "Semantic cache hits.", {}, sem["hits"])
+            yield ("orchestra_semantic_cache_misses_total", "counter", "Semantic cache misses.", {}, sem["misses"])
+            yield ("orchestra_semantic_cache_precision", "gauge", "Verified precision of semantic hits.", {}, sem["precision"])
+            yield ("orchestra_semantic_cache_recall", "gauge", "Estimated recall of the semantic tier.", {}, sem["recall"])
+
+    def stream(
+        self, messages: list[dict[str, str]], temperature: float = 0.2, agent: str | None = None
+    ) -> Iterator[str]:
+        """Yield the completion as text deltas. The full text is cached once the stream ends;
+        closing the generator early aborts the upstream request and caches nothing."""
+        # read the route now: the generator may be drained later from another context
+        return self._stream(self._payload(messages, temperature), agent, current_route.get())
+
+    def _stream(self, payload: dict[str, Any], agent: str | None, route: str | None) -> Iterator[str]:
+        t0 = time.perf_counter()
+        ttft: float | None = None
+        res: LLMResult | None = None
+        cancelled = False
+        try:
+            cached, tier = self.cache.lookup(payload)
+            if cached is not None:
+                res = LLMResult(text=cached, cached=True, tier=tier)
+                ttft = time.perf_counter() - t0
+                yield cached
+                return
+            match = self._semantic_lookup(payload, agent)
+            if match is not None and match.hit and not self.semantic.should_verify():
+                res = LLMResult(text=match.answer, cached=True, tier="semantic")
+                ttft = time.perf_counter() - t0
+                yield match.answer
+                return
+
+            parts: list[str] = []
+            deltas = self.provider.stream(payload)
+            try:
+                while True:
+                    try:
+                        delta = next(deltas)
+                    except StopIteration as stop:
+                        usage = stop.value or (0, 0)
+                        break
+                    if ttft is None:
+                        ttft = time.perf_counter() - t0
+                    parts.append(delta)
+                    yield delta
+            finally:
+                deltas.close()  # aborts the upstream request when our caller stops early
+            out = "".join(parts)
+            self.cache.set(payload, out)
+            self._semantic_record(payload, agent, match, out)
+            res = LLMResult(text=out, cached=False, prompt_tokens=usage[0], completion_tokens=usage[1])
+        except GeneratorExit:
+            cancelled = True
+            raise
+        except Exception:
+            hook = stream_abort.get()
+            cancelled = hook is not None and hook.aborted  # the failure is our own abort
+            raise
+        finally:
+            if cancelled:
+                self._observe(agent, route, t0, LLMResult(text="", cached=False), ttft=ttft, stream=True, tier="cancelled")
+            else:
+                self._observe(agent, route, t0, res, ttft=ttft, stream=True)
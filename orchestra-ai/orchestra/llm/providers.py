@@ -0,0 +1,422 @@
+"""Model backends behind LLMClient.
+
+- OpenAIProvider: the OpenAI API or any OpenAI-compatible endpoint (Ollama, vLLM, ...) via base_url
+- MockProvider: offline stand-in used by MOCK_MODE, with simulated latency and failures
+- HedgedProvider: primary + secondary. If the primary hasn't answered within its recent
+  latency percentile, the same request goes to the secondary; the first answer wins and the
+  other call is cancelled. Errors on one side fall back to the other.
+
+`stream()` yields text deltas and returns (prompt_tokens, completion_tokens) as the
+generator's return value, so callers can `usage = yield from provider.stream(payload)`.
+A thread that reads a stream while another may have to give up on it sets `stream_abort` to a
+`StreamAbort` first: providers register how to drop their upstream request there, so `abort()`
+releases a stalled stream right away instead of at its next delta.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Generator
+
+from orchestra.config import Settings
+from orchestra.llm.ratelimit import estimate_tokens
+from orchestra.metrics import Metrics, quantile
+
+@dataclass
+class Completion:
+    text: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tier: str | None = None  # set when a cache answered instead of a provider
+    provider: str | None = None
+
+class StreamAbort:
+    """Callbacks that drop the upstream requests of the streams read under it."""
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._fns: list[Callable[[], None]] = []
+        self.aborted = False
+
+    def add(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            if not self.aborted:
+                self._fns.append(fn)
+                return
+        fn()  # aborted before the stream even started
+
+    def abort(self) -> None:
+        with self._lock:
+            self.aborted = True
+            fns, self._fns = self._fns, []
+        for fn in fns:
+            try:
+                fn()
+            except Exception:
+                pass
+
+stream_abort: ContextVar[StreamAbort | None] = ContextVar("orchestra_stream_abort", default=None)
+
+def _usage(r: Any) -> tuple[int, int]:
+    u = getattr(r, "usage", None)
+    if u is None:
+        return 0, 0
+    return int(getattr(u, "prompt_tokens", 0) or 0), int(getattr(u, "completion_tokens", 0) or 0)
+
+class Provider(ABC):
+    name: str = "provider"
+
+    @abstractmethod
+    def complete(self, payload: dict[str, Any]) -> Completion:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def acomplete(self, payload: dict[str, Any]) -> Completion:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stream(self, payload: dict[str, Any]) -> Generator[str, None, tuple[int, int]]:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        """Release what `acomplete` holds for the running loop; call before that loop closes."""
+
+class OpenAIProvider(Provider):
+    def __init__(
+        self,
+        name: str = "openai",
+        base_url: str | None = None,
+        api_key: str | None = None,
+        model: str | None = None,
+    ) -> None:
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model  # overrides the payload's model (e.g. a local model name)
+        # one long-lived client per kind; the SDK keeps a keep-alive connection pool inside
+        self._lock = threading.Lock()
+        self._client: Any = None
+        # per event loop, weakly: an entry goes away with its loop and is never handed to a
+        # new loop that happens to reuse the old one's id()
+        self._aclients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any] = weakref.WeakKeyDictionary()
+
+    def _key(self) -> str:
+        key = self.api_key or os.getenv("OPENAI_API_KEY")
+        if not key:
+            raise RuntimeError("Missing OPENAI_API_KEY. Set it in .env or environment variables.")
+        return key
+
+    def _payload(self, payload: dict[str, Any]) -> dict[str, Any]:
+        return payload | {"model": self.model} if self.model else payload
+
+    def _sync_client(self) -> Any:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=self._key(), base_url=self.base_url)
+        return self._client
+
+    def _async_client(self) -> Any:
+        # AsyncOpenAI binds its connection pool to the loop it was first used on
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._aclients.get(loop)
+            if client is None:
+                from openai import AsyncOpenAI
+                client = self._aclients[loop] = AsyncOpenAI(api_key=self._key(), base_url=self.base_url)
+        return client
+
+    async def aclose(self) -> None:
+        with self._lock:
+            client = self._aclients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()  # its httpx pool, which can't outlive the loop anyway
+
+    def complete(self, payload: dict[str, Any]) -> Completion:
+        r = self._sync_client().chat.completions.create(**self._payload(payload))
+        return Completion(r.choices[0].message.content or "", *_usage(r), provider=self.name)
+
+    async def acomplete(self, payload: dict[str, Any]) -> Completion:
+        r = await self._async_client().chat.completions.create(**self._payload(payload))
+        return Completion(r.choices[0].message.content or "", *_usage(r), provider=self.name)
+
+    def stream(self, payload: dict[str, Any]) -> Generator[str, None, tuple[int, int]]:
+        s = self._sync_client().chat.completions.create(
+            **self._payload(payload), stream=True, stream_options={"include_usage": True}
+        )
+        hook = stream_abort.get()
+        if hook is not None:
+            hook.add(s.close)  # closing the response makes the blocked read fail
+        usage = (0, 0)
+        try:
+            for ev in s:
+                if getattr(ev, "usage", None) is not None:
+                    usage = _usage(ev)
+                if not ev.choices:
+                    continue
+                delta = ev.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            s.close()
+        return usage
+
+def _mock_text(messages: list[dict[str, str]]) -> str:
+    # deterministic across processes: sha256, not the per-process salted hash()
+    joined = "\n".join([f"{m['role']}: {m['content']}" for m in messages])[:2000]
+    digest = hashlib.sha256(joined.encode("utf-8")).hexdigest()[:16]
+    return f"""MOCK_MODE RESPONSE
+digest={digest}
+
+I can't call a real model right now because MOCK_MODE=true.
+I received this input (truncated):
+{joined}
+"""
+
+class MockAPIError(Exception):
+    """Injected upstream failure; `status_code` mirrors the OpenAI SDK's APIStatusError."""
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = None
+
+class MockProvider(Provider):
+    """Offline backend with deterministic output and optional simulated latency and failures.
+
+    Latency is `ttft_s` to the first token plus one token per word at `tokens_per_s`
+    (0 = instant). `error_rate` and `rate_limit_rate` inject 500s and 429s, drawn from a
+    generator seeded with `seed` so a single-threaded run fails the same calls every time.
+    """
+    def __init__(
+        self,
+        name: str = "mock",
+        ttft_s: float = 0.0,
+        tokens_per_s: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.name = name
+        self.ttft_s = ttft_s
+        self.tokens_per_s = tokens_per_s
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _fail(self) -> None:
+        if self.error_rate <= 0 and self.rate_limit_rate <= 0:
+            return
+        with self._lock:
+            r = self._rng.random()
+        if r < self.rate_limit_rate:
+            raise MockAPIError(429, f"{self.name}: simulated rate limit")
+        if r < self.rate_limit_rate + self.error_rate:
+            raise MockAPIError(500, f"{self.name}: simulated server error")
+
+    def _plan(self, payload: dict[str, Any]) -> tuple[list[str], int]:
+        chunks = re.findall(r"\S+\s*|\s+", _mock_text(payload["messages"]))
+        return chunks, estimate_tokens(payload["messages"])
+
+    def _duration(self, n_tokens: int) -> float:
+        return self.ttft_s + (n_tokens / self.tokens_per_s if self.tokens_per_s > 0 else 0.0)
+
+    def complete(self, payload: dict[str, Any]) -> Completion:
+        self._fail()
+        chunks, prompt_tokens = self._plan(payload)
+        if self._duration(len(chunks)) > 0:
+            time.sleep(self._duration(len(chunks)))
+        return Completion("".join(chunks), prompt_tokens, len(chunks), provider=self.name)
+
+    async def acomplete(self, payload: dict[str, Any]) -> Completion:
+        self._fail()
+        chunks, prompt_tokens = self._plan(payload)
+        if self._duration(len(chunks)) > 0:
+            await asyncio.sleep(self._duration(len(chunks)))
+        return Completion("".join(chunks), prompt_tokens, len(chunks), provider=self.name)
+
+    def stream(self, payload: dict[str, Any]) -> Generator[str, None, tuple[int, int]]:
+        self._fail()
+        chunks, prompt_tokens = self._plan(payload)
+        aborted = threading.Event()
+        hook = stream_abort.get()
+        if hook is not None:
+            hook.add(aborted.set)
+        if self.ttft_s > 0 and aborted.wait(self.ttft_s):
+            raise MockAPIError(499, f"{self.name}: stream aborted")
+        per_token = 1.0 / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+        for i, chunk in enumerate(chunks):
+            if per_token and i and aborted.wait(per_token):
+                raise MockAPIError(499, f"{self.name}: stream aborted")
+            yield chunk
+        return prompt_tokens, len(chunks)
+
+class HedgedProvider(Provider):
+    def __init__(
+        self,
+        primary: Provider,
+        secondary: Provider,
+        hedge_quantile: float = 0.95,
+        min_delay_s: float = 0.25,
+        initial_delay_s: float = 2.0,
+        metrics: Metrics | None = None,
+        max_workers: int = 16,
+    ) -> None:
+        self.primary = primary
+        self.secondary = secondary
+        self.name = f"hedged({primary.name},{secondary.name})"
+        self.hedge_quantile = hedge_quantile
+        self.min_delay_s = min_delay_s
+        self.initial_delay_s = initial_delay_s
+        self.metrics = metrics
+        self._samples: deque[float] = deque(maxlen=512)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait for the primary before hedging; None disables hedging (fallback only)."""
+        if self.hedge_quantile <= 0:
+            return None
+        with self._lock:
+            samples = list(self._samples)
+        if len(samples) < 20:
+            return self.initial_delay_s
+        return max(self.min_delay_s, quantile(samples, self.hedge_quantile) or 0.0)
+
+    def _observe_primary(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def _count(self, outcome: str) -> None:
+        if self.metrics is not None:
+            self.metrics.inc("orchestra_llm_hedge_total", outcome=outcome)
+
+    def _timed_primary(self, payload: dict[str, Any]) -> Completion:
+        t0 = time.perf_counter()
+        c = self.primary.complete(payload)
+        self._observe_primary(time.perf_counter() - t0)
+        return c
+
+    def complete(self, payload: dict[str, Any]) -> Completion:
+        f1 = self._pool.submit(self._timed_primary, payload)
+        delay = self.hedge_delay()
+        done, _ = wait([f1], timeout=delay)
+        if f1 in done:
+            if f1.exception() is None:
+                return f1.result()
+            self._count("fallback")
+            return self.secondary.complete(payload)
+        self._count("fired")
+        f2 = self._pool.submit(self.secondary.complete, payload)
+        pending: set[Future] = {f1, f2}
+        err: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    # a running sync call can't be interrupted; the loser's result is dropped
+                    for other in pending:
+                        other.cancel()
+                    self._count("secondary_won" if f is f2 else "primary_won")
+                    return f.result()
+                err = f.exception()
+        assert err is not None
+        raise err
+
+    async def _atimed_primary(self, payload: dict[str, Any]) -> Completion:
+        t0 = time.perf_counter()
+        c = await self.primary.acomplete(payload)
+        self._observe_primary(time.perf_counter() - t0)
+        return c
+
+    async def acomplete(self, payload: dict[str, Any]) -> Completion:
+        t1 = asyncio.ensure_future(self._atimed_primary(payload))
+        tasks = [t1]
+        try:
+            done, _ = await asyncio.wait({t1}, timeout=self.hedge_delay())
+            if t1 in done:
+                if t1.exception() is None:
+                    return t1.result()
+                self._count("fallback")
+                tasks.append(asyncio.ensure_future(self.secondary.acomplete(payload)))
+                return await tasks[-1]
+            self._count("fired")
+            t2 = asyncio.ensure_future(self.secondary.acomplete(payload))
+            tasks.append(t2)
+            pending = {t1, t2}
+            err: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        self._count("secondary_won" if t is t2 else "primary_won")
+                        return t.result()
+                    err = t.exception()
+            assert err is not None
+            raise err
+        finally:
+            # also when our caller is cancelled mid-wait: no call keeps running upstream
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+
+    async def aclose(self) -> None:
+        await asyncio.gather(self.primary.aclose(), self.secondary.aclose())
+
+    def stream(self, payload: dict[str, Any]) -> Generator[str, None, tuple[int, int]]:
+        # no hedging once tokens are flowing; fall back only if the primary fails before any output
+        gen = self.primary.stream(payload)
+        try:
+            first = next(gen)
+        except StopIteration as stop:
+            return stop.value
+        except Exception:
+            self._count("fallback")
+            return (yield from self.secondary.stream(payload))
+        yield first
+        return (yield from gen)
+
+def _mock(settings: Settings, name: str, seed_offset: int = 0) -> MockProvider:
+    return MockProvider(
+        name=name,
+        ttft_s=settings.mock_ttft_s,
+        tokens_per_s=settings.mock_tokens_per_s,
+        error_rate=settings.mock_error_rate,
+        rate_limit_rate=settings.mock_rate_limit_rate,
+        seed=settings.mock_seed + seed_offset,
+    )
+
+def build_provider(settings: Settings, metrics: Metrics | None = None) -> Provider:
+    primary: Provider = _mock(settings, "mock") if settings.mock_mode else OpenAIProvider()
+    sec = settings.llm_secondary
+    if not sec:
+        return primary
+    if sec == "mock":
+        secondary: Provider = _mock(settings, "mock-secondary", seed_offset=1)
+    else:
+        secondary = OpenAIProvider(
+            name="secondary",
+            base_url=sec,
+            api_key=os.getenv("LLM_SECONDARY_API_KEY") or "local",
+            model=settings.llm_secondary_model or None,
+        )
+    return HedgedProvider(
+        primary,
+        secondary,
+        hedge_quantile=settings.hedge_quantile,
+        min_delay_s=settings.hedge_min_delay_s,
+        metrics=metrics,
+        max_workers=max(4, settings.llm_concurrency * 2),
+    )
@@ -0,0 +1,65 @@
+"""Rate limiting and retry helpers for batched model calls.
+
+- TokenBucket: async bucket refilled continuously (used for requests/min and tokens/min)
+- estimate_tokens: cheap prompt size estimate used to reserve TPM budget up front
+- retry_delay / is_retryable: jittered exponential backoff for 429 and 5xx responses
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Any
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst: float | None = None) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # FIFO: waiters queue on the lock so a big request isn't starved by small ones
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, n: float = 1.0) -> None:
+        n = min(n, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+    def refund(self, n: float) -> None:
+        """Give back over-reserved tokens (or charge more when `n` is negative)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + n)
+
+def estimate_tokens(messages: list[dict[str, str]]) -> int:
+    # ~4 chars per token plus a few tokens of per-message framing
+    return sum(len(m.get("content", "")) // 4 + 4 for m in messages)
+
+def is_retryable(e: BaseException) -> bool:
+    status = getattr(e, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return type(e).__name__ in ("APIConnectionError", "APITimeoutError")
+
+def retry_delay(e: BaseException, attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Seconds to wait before retry `attempt` (0-based): Retry-After if the server sent one,
+    otherwise exponential backoff with full jitter."""
+    response: Any = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            after = float(headers.get("retry-after", ""))
+            return min(cap, max(0.0, after))
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0.0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,164 @@
+"""Semantic (near-duplicate) response cache.
+
+The exact cache keys on the full payload, so "Summarize this" and "summarize  this!" miss.
+This tier normalizes and vectorizes the last user message and looks for a previous payload
+with the same model, temperature and preceding messages (system prompt + history) whose
+user message is similar enough. It sits behind the exact cache and is opt-in per agent.
+
+Quality is tracked two ways:
+- precision: a sample of hits (`verify_rate`) is re-asked upstream and the answers compared
+- recall: on a miss, if the best neighbour below the threshold had an answer matching the
+  fresh one, that is counted as a missed hit
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from orchestra.llm.cache import _key
+from orchestra.memory.vector import MemoryItem, TinyVectorIndex, _cos, _tf, _tokenize
+
+@dataclass
+class SemanticMatch:
+    answer: str
+    score: float
+    hit: bool
+
+@dataclass
+class SemanticStats:
+    lookups: int = 0
+    hits: int = 0
+    misses: int = 0
+    verified: int = 0
+    verified_ok: int = 0
+    missed_hits: int = 0
+
+def normalize(text: str) -> str:
+    return " ".join(_tokenize(text))
+
+class _Partition:
+    # exact plain TF cosine: SEMANTIC_CACHE_THRESHOLD is calibrated against it
+    def __init__(self) -> None:
+        self.index = TinyVectorIndex(idf=False, max_postings=0)
+        self.answers: dict[str, str] = {}
+
+class SemanticCache:
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        max_items: int = 2000,
+        max_partitions: int = 256,
+        verify_rate: float = 0.0,
+        answer_threshold: float = 0.9,
+    ) -> None:
+        self.threshold = threshold
+        self.max_items = max_items
+        self.max_partitions = max_partitions
+        self.verify_rate = verify_rate
+        self.answer_threshold = answer_threshold
+        self.counters = SemanticStats()
+        self._parts: OrderedDict[str, _Partition] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _split(self, payload: dict[str, Any]) -> tuple[str, str] | None:
+        messages = payload.get("messages") or []
+        if not messages or messages[-1].get("role") != "user":
+            return None
+        context = {k: v for k, v in payload.items() if k != "messages"}
+        context["context"] = messages[:-1]
+        return _key(context), normalize(messages[-1].get("content", ""))
+
+    def lookup(self, payload: dict[str, Any]) -> SemanticMatch | None:
+        """Best neighbour for `payload`; `hit` is set when it clears the threshold."""
+        split = self._split(payload)
+        if split is None:
+            return None
+        pkey, text = split
+        with self._lock:
+            self.counters.lookups += 1
+            part = self._parts.get(pkey)
+            if part is None or not text:
+                self.counters.misses += 1
+                return None
+            self._parts.move_to_end(pkey)
+            exact = part.answers.get(text)
+            if exact is not None:
+                best: SemanticMatch | None = SemanticMatch(exact, 1.0, True)
+            else:
+                found = part.index.search(text, k=1)
+                best = SemanticMatch(part.answers[found[0][0].id], found[0][1], False) if found else None
+                if best is not None:
+                    best.hit = best.score >= self.threshold
+            if best is not None and best.hit:
+                self.counters.hits += 1
+            else:
+                self.counters.misses += 1
+            return best
+
+    def add(self, payload: dict[str, Any], answer: str) -> None:
+        split = self._split(payload)
+        if split is None or not split[1]:
+            return
+        pkey, text = split
+        with self._lock:
+            part = self._parts.get(pkey)
+            if part is None:
+                part = self._parts[pkey] = _Partition()
+                while len(self._parts) > self.max_partitions:
+                    self._parts.popitem(last=False)
+            if text in part.answers:
+                part.answers[text] = answer
+                return
+            if len(part.answers) >= self.max_items:
+                # keep the newer half; TinyVectorIndex has no delete so rebuild it
+                keep = list(part.answers.items())[len(part.answers) // 2:]
+                part.index = TinyVectorIndex(idf=False, max_postings=0)
+                part.answers = {}
+                for t, a in keep:
+                    part.index.add(MemoryItem(id=t, text=t, meta={}))
+                    part.answers[t] = a
+            part.index.add(MemoryItem(id=text, text=text, meta={}))
+            part.answers[text] = answer
+
+    def should_verify(self) -> bool:
+        return self.verify_rate > 0.0 and random.random() < self.verify_rate
+
+    def _same_answer(self, a: str, b: str) -> bool:
+        return a == b or _cos(_tf(a), _tf(b)) >= self.answer_threshold
+
+    def record_verification(self, cached_answer: str, fresh_answer: str) -> None:
+        ok = self._same_answer(cached_answer, fresh_answer)
+        with self._lock:
+            self.counters.verified += 1
+            self.counters.verified_ok += int(ok)
+
+    def record_miss(self, best: SemanticMatch | None, fresh_answer: str) -> None:
+        if best is None or best.hit:
+            return
+        if self._same_answer(best.answer, fresh_answer):
+            with self._lock:
+                self.counters.missed_hits += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            c = self.counters
+            precision = c.verified_ok / c.verified if c.verified else None
+            # recall estimate: hits that were right vs. those plus near-misses that would have been right
+            good = c.hits * (precision if precision is not None else 1.0)
+            recall = good / (good + c.missed_hits) if (good + c.missed_hits) else None
+            return {
+                "lookups": c.lookups,
+                "hits": c.hits,
+                "misses": c.misses,
+                "verified": c.verified,
+                "verified_ok": c.verified_ok,
+                "missed_hits": c.missed_hits,
+                "precision": precision,
+                "recall": recall,
+                "partitions": len(self._parts),
+                "threshold": self.threshold,
+            }
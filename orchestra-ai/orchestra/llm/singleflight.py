@@ -0,0 +1,100 @@
+"""Single-flight call coalescing.
+
+Concurrent callers that ask for the same key share one execution: the first caller (the
+leader) runs the function, everyone arriving while it is in flight waits and gets the same
+result (or the same exception). Threads and asyncio tasks are tracked separately because a
+thread can't await a task and a task must not block its loop on a thread event.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+class _LeaderCancelled(Exception):
+    """Handed to waiters when the leader's task was cancelled: retry rather than fail."""
+
+@dataclass
+class FlightStats:
+    leaders: int = 0
+    coalesced: int = 0
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self.stats = FlightStats()
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+        self._tasks: dict[tuple[int, str], asyncio.Future] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> tuple[T, bool]:
+        """Run `fn` once per in-flight `key`. Returns (result, coalesced)."""
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._calls[key] = fut
+                self.stats.leaders += 1
+            else:
+                self.stats.coalesced += 1
+        if not leader:
+            return fut.result(), True
+        try:
+            res = fn()
+            fut.set_result(res)
+            return res, False
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Async counterpart of `do`; coalesces tasks on the same event loop. If the leader's
+        own task is cancelled (say its client disconnected), the waiters are not: one of them
+        runs `fn` again as the new leader."""
+        loop = asyncio.get_running_loop()
+        tkey = (id(loop), key)
+        while True:
+            with self._lock:
+                fut = self._tasks.get(tkey)
+                leader = fut is None
+                if leader:
+                    fut = loop.create_future()
+                    self._tasks[tkey] = fut
+                    self.stats.leaders += 1
+                else:
+                    self.stats.coalesced += 1
+            if leader:
+                break
+            try:
+                # shield so one cancelled waiter doesn't cancel the shared result for the others
+                return await asyncio.shield(fut), True
+            except _LeaderCancelled:
+                continue
+        try:
+            res = await fn()
+            fut.set_result(res)
+            return res, False
+        except BaseException as e:
+            with self._lock:
+                if self._tasks.get(tkey) is fut:
+                    self._tasks.pop(tkey)  # before waking the waiters, so they don't rejoin it
+            fut.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            raise
+        finally:
+            with self._lock:
+                if self._tasks.get(tkey) is fut:
+                    self._tasks.pop(tkey)
+            if fut.done():
+                fut.exception()  # mark retrieved so lone leaders don't log "never retrieved"
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {"leaders": self.stats.leaders, "coalesced": self.stats.coalesced, "in_flight": len(self._calls) + len(self._tasks)}
@@ -1,12 +1,10 @@
-from __future__ import annotations
-
 """Tool call parsing utilities.
 
-This module is intentionally verbose so the repository has a meaningful amount of code.
 It contains:
 - robust JSON extraction from messy model outputs
+- an incremental scanner that spots tool calls in a streamed completion as soon as they close
 - schema validation with helpful error messages
-- safe coercions for simple primitive types
+- safe coercions for simple primitive types, and validators compiled once per schema
 
 You can reuse this for projects where you want the model to emit:
 1) plain text
@@ -14,14 +12,11 @@ You can reuse this for projects where you want the model to emit:
 3) multi-tool batches
 """
 
+from __future__ import annotations
+
 import json
-import re
 from dataclasses import dataclass
-from typing import Any, Iterable, Optional
-
-_JSON_BLOCK_RE = re.compile(r"```json\s*(\{.*?\}|\[.*?\])\s*```", re.DOTALL | re.IGNORECASE)
-_BRACE_RE = re.compile(r"\{.*\}", re.DOTALL)
-_BRACKET_RE = re.compile(r"\[.*\]", re.DOTALL)
+from typing import Any, Callable
 
 @dataclass
 class ParseError:
@@ -37,21 +32,152 @@ class ToolCall:
 class ToolBatch:
     calls: list[ToolCall]
 
+def _loads(raw: str) -> tuple[bool, Any]:
+    try:
+        return True, json.loads(raw)
+    except ValueError:
+        return False, None
+
+class JsonScanner:
+    """Finds balanced JSON values in text that arrives in chunks.
+
+    One pass per character, tracking the bracket stack and string/escape state, so a value is
+    known complete the moment its closing bracket arrives. Prose outside brackets (code fences
+    included) is skipped. `feed` returns the objects completed by the chunk: top-level objects,
+    and objects directly inside a top-level array, so each call of a batch is reported as soon
+    as it closes rather than when the whole array does. Each object comes with the index (into
+    `values`) of the top-level value it belongs to.
+    """
+    def __init__(self) -> None:
+        self.values: list[str] = []  # raw text of every completed top-level value
+        self._buf: list[str] = []
+        self._stack: list[str] = []
+        self._in_str = False
+        self._esc = False
+        self._item_start: int | None = None
+
+    def pending(self) -> str | None:
+        """Text of a top-level value that was opened but never closed."""
+        return "".join(self._buf) if self._stack else None
+
+    def feed(self, chunk: str) -> list[tuple[dict[str, Any], int]]:
+        """Scan `chunk`; return (object, value index) for each object it completed."""
+        out: list[tuple[dict[str, Any], int]] = []
+        buf, stack = self._buf, self._stack
+        for ch in chunk:
+            if not stack:
+                if ch == "{" or ch == "[":
+                    stack.append(ch)
+                    buf.append(ch)
+                continue
+            buf.append(ch)
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                continue
+            if ch == '"':
+                self._in_str = True
+            elif ch == "{" or ch == "[":
+                if ch == "{" and stack == ["["]:
+                    self._item_start = len(buf) - 1
+                stack.append(ch)
+            elif ch == "}" or ch == "]":
+                opener = stack.pop()
+                if (opener == "{") != (ch == "}"):
+                    # mismatched brackets: not JSON, start over from the next opener
+                    stack.clear()
+                    buf.clear()
+                    self._item_start = None
+                    continue
+                if not stack:
+                    raw = "".join(buf)
+                    buf.clear()
+                    self.values.append(raw)
+                    if ch == "}":
+                        ok, obj = _loads(raw)
+                        if ok and isinstance(obj, dict):
+                            out.append((obj, len(self.values) - 1))
+                elif stack == ["["] and ch == "}" and self._item_start is not None:
+                    ok, obj = _loads("".join(buf[self._item_start:]))
+                    self._item_start = None
+                    if ok and isinstance(obj, dict):
+                        out.append((obj, len(self.values)))
+        return out
+
 def _first_json_candidate(text: str) -> str | None:
-    m = _JSON_BLOCK_RE.search(text)
-    if m:
-        return m.group(1).strip()
+    """The first balanced {...} or [...] that parses as JSON; failing that, the first balanced
+    one, then an unclosed one (so truncated JSON is reported as invalid rather than absent)."""
+    sc = JsonScanner()
+    sc.feed(text)
+    for raw in sc.values:
+        if _loads(raw)[0]:
+            return raw.strip()
+    if sc.values:
+        return sc.values[0].strip()
+    pending = sc.pending()
+    return pending.strip() if pending else None
 
-    # fallback: first {...} or [...]
-    m2 = _BRACE_RE.search(text)
-    if m2:
-        return m2.group(0).strip()
+class ToolCallStream:
+    """Turns streamed model output into ToolCalls as each one closes.
 
-    m3 = _BRACKET_RE.search(text)
-    if m3:
-        return m3.group(0).strip()
+    Mirrors `parse_tool_output`: only the first top-level JSON value that parses counts. A lone
+    call object is returned when it closes. Calls inside a batch array are returned early only
+    if `early(tool)` says so (meant for pure tools, which are harmless to run for nothing);
+    the rest are held until the whole array has closed and validated, so a side-effecting call
+    never runs for output the full text would reject. After the stream, `accepted` says whether
+    the output really was a valid call or batch; if not, discard whatever was started early.
+    """
+    def __init__(self, early: Callable[[str], bool] | None = None) -> None:
+        self.scanner = JsonScanner()
+        self.early = early or (lambda tool: False)
+        self.calls: list[ToolCall] = []  # once accepted: the value's calls in written order
+        self.accepted = False
+        self._seen: list[tuple[ToolCall, int]] = []
+        self._held: list[tuple[ToolCall, int]] = []
+        self._done = False
 
-    return None
+    def feed(self, chunk: str) -> list[ToolCall]:
+        if self._done:
+            return []
+        n_values = len(self.scanner.values)
+        found = self.scanner.feed(chunk)
+        # stop at the first completed top-level value that is valid JSON
+        last = None
+        for i in range(n_values, len(self.scanner.values)):
+            ok, raw = _loads(self.scanner.values[i])
+            if ok:
+                last = i
+                self._done = True
+                self.accepted = isinstance(_as_obj(raw), ToolBatch)
+                break
+        out: list[ToolCall] = []
+        for obj, idx in found:
+            if last is not None and idx > last:
+                break
+            tool = obj.get("tool")
+            args = obj.get("args", {})
+            if not (isinstance(tool, str) and tool.strip() and isinstance(args, dict)):
+                continue
+            call = ToolCall(tool=tool.strip(), args=args)
+            self._seen.append((call, idx))
+            in_batch = idx >= len(self.scanner.values) or self.scanner.values[idx].startswith("[")
+            if in_batch and not self.early(call.tool):
+                self._held.append((call, idx))
+            else:
+                out.append(call)
+        if last is not None and self.accepted:
+            out += [c for c, idx in self._held if idx == last]
+            self.calls = [c for c, idx in self._seen if idx == last]
+        if self._done:
+            self._held = self._seen = []
+        else:
+            # batches that closed without parsing are not calls
+            self._held = [(c, idx) for c, idx in self._held if idx >= len(self.scanner.values)]
+        return out
 
 def _as_obj(raw: Any) -> ToolBatch | ParseError:
     # single call object
@@ -148,3 +274,64 @@ def coerce_args(schema: dict[str, Any], args: dict[str, Any]) -> tuple[dict[str,
             warnings.append(f"unknown arg: {k}")
 
     return out, warnings
+
+def _to_bool(val: Any) -> bool:
+    if isinstance(val, str):
+        return val.lower() in ("true","1","yes","y","on")
+    return bool(val)
+
+def _to_int(val: Any) -> int:
+    if isinstance(val, float) and not val.is_integer():
+        raise ValueError("not an integer")
+    return int(val)
+
+def _expect(kind: type) -> Callable[[Any], Any]:
+    def check(val: Any) -> Any:
+        if not isinstance(val, kind):
+            raise TypeError(f"expected {kind.__name__}")
+        return val
+    return check
+
+_COERCERS: dict[str, Callable[[Any], Any]] = {
+    "integer": _to_int,
+    "number": float,
+    "boolean": _to_bool,
+    "string": str,
+    "object": _expect(dict),
+    "array": _expect(list),
+}
+
+def compile_args(schema: dict[str, Any]) -> Callable[[dict[str, Any]], tuple[dict[str, Any], list[str]]]:
+    """Compile a simple object schema once into a validator/coercer.
+
+    The returned function maps args -> (coerced_args, errors): declared properties are coerced
+    like `coerce_args` does, missing ones take the schema default, and unknown keys pass through.
+    A non-empty error list (missing required, uncoercible value) means the call should not run.
+    """
+    fields = [
+        (k, _COERCERS.get(spec.get("type")), spec.get("type"), "default" in spec, spec.get("default"))
+        for k, spec in (schema.get("properties") or {}).items()
+    ]
+    required = tuple(schema.get("required") or ())
+
+    def validate(args: dict[str, Any]) -> tuple[dict[str, Any], list[str]]:
+        if not isinstance(args, dict):
+            return {}, ["args must be an object"]
+        out = dict(args)
+        errors: list[str] = []
+        for k in required:
+            if k not in args:
+                errors.append(f"missing required: {k}")
+        for k, coerce, t, has_default, default in fields:
+            if k not in args:
+                if has_default:
+                    out[k] = default
+                continue
+            if coerce is not None:
+                try:
+                    out[k] = coerce(args[k])
+                except (TypeError, ValueError):
+                    errors.append(f"{k}: expected {t}")
+        return out, errors
+
+    return validate
@@ -0,0 +1,221 @@
+"""Approximate search for SparseVectorIndex: IVF (inverted file) with coarse k-means clusters.
+
+Every item is also projected to a small dense vector (signed feature hashing of its TF row into
+`dim` dims). Spherical k-means on a sample of those vectors gives `nlist` centroids, and each
+item is filed under its nearest one. A query is projected the same way and probes its `nprobe`
+closest clusters, plus up to `nprobe` clusters holding its rarest term; only their items are
+scored, exactly, with the sparse TF cosine. The index is kept sorted by (cluster, term), so
+that costs one binary search per probed cluster and query term plus the matching postings.
+Raise `nprobe` for recall, lower it for speed; `nprobe >= nlist` gives the exact result. The
+default 96 reaches about 0.9 recall@10 on bench/ann_recall.py from 50k items up (more as the
+index grows: 0.95 at 1M); 16 was nearer 0.75.
+
+Items added after the clustered lists were built sit in a small delta that every query scans
+exactly, so an `add` doesn't invalidate anything. The delta is filed into the lists (each item
+under its nearest existing centroid, merged into the sorted keys) once it outgrows
+`_DELTA_MIN` items or 1/`_DELTA_SHARE` of the index, and the clusters are retrained once the
+index has doubled since the last training. Indexes under `min_train` items are searched
+exactly: there the exact scan is already about as fast.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from orchestra.memory.sparse import DIM, SparseVectorIndex, _query_terms, _top
+from orchestra.memory.vector import MemoryItem
+
+# rows projected to dense per matrix product, when assigning items to clusters
+_ASSIGN_ROWS = 8192
+# the delta of unclustered items is merged into the lists past max(_DELTA_MIN, n / _DELTA_SHARE)
+_DELTA_MIN = 2048
+_DELTA_SHARE = 32
+
+def _signed_buckets(dim: int) -> tuple[np.ndarray, np.ndarray]:
+    """Bucket and sign of every hashed term id, for projecting rows into `dim` dims."""
+    cols = np.arange(DIM, dtype=np.uint64)
+    h = (cols * np.uint64(0x9E3779B97F4A7C15)) & np.uint64(0xFFFFFFFFFFFFFFFF)
+    bucket = ((h >> np.uint64(32)) % np.uint64(dim)).astype(np.int64)
+    sign = np.where((h >> np.uint64(63)) == 1, -1.0, 1.0).astype(np.float32)
+    return bucket, sign
+
+class IVFIndex(SparseVectorIndex):
+    def __init__(
+        self,
+        idf: bool = True,
+        nlist: int = 0,
+        nprobe: int = 96,
+        dim: int = 256,
+        min_train: int = 50_000,
+        kmeans_iters: int = 10,
+        seed: int = 0,
+    ) -> None:
+        super().__init__(idf=idf)
+        self.nlist = nlist  # 0 = sqrt(items) at training time
+        self.nprobe = nprobe
+        self.dim = dim
+        self.min_train = min_train
+        self.kmeans_iters = kmeans_iters
+        self._rng = np.random.default_rng(seed)
+        self._bucket, self._sign = _signed_buckets(dim)
+        self._centroids: np.ndarray | None = None
+        self._trained_n = 0
+        self._assign = np.zeros(0, dtype=np.int32)
+        # (keys, rows, vals) sorted by cluster * DIM + term, over the first _listed rows
+        self._lists: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+        self._listed = 0
+        self._df = np.zeros(DIM, dtype=np.int64)
+        self._df_rows = 0
+        self._idf = np.ones(DIM, dtype=np.float32)
+
+    # -- build ---------------------------------------------------------------
+
+    def _project(self, rows: np.ndarray) -> np.ndarray:
+        """The given rows as unit vectors in the dense `dim` space."""
+        starts = self._indptr[rows]
+        lens = self._indptr[rows + 1] - starts
+        pos = np.repeat(starts - (np.cumsum(lens) - lens), lens) + np.arange(int(lens.sum()))
+        local = np.repeat(np.arange(len(rows), dtype=np.int64), lens)
+        idx = self._indices[pos]
+        x = np.bincount(
+            local * self.dim + self._bucket[idx],
+            weights=self._data[pos] * self._sign[idx] * self._idf[idx],
+            minlength=len(rows) * self.dim,
+        ).reshape(len(rows), self.dim).astype(np.float32)
+        return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+    def _train(self) -> None:
+        n = len(self.items)
+        # clusters are formed on idf-weighted projections (frozen until the next training), so
+        # they follow the rare, topical words rather than the stop words every item shares
+        self._idf = np.log1p(n / np.maximum(self._doc_freq(), 1)).astype(np.float32)
+        nlist = self.nlist or max(1, int(math.sqrt(n)))
+        nlist = min(nlist, n)
+        # enough points per centroid for k-means to mean something, without projecting everything
+        sample = self._rng.choice(n, size=min(n, max(64 * nlist, 20_000)), replace=False)
+        x = self._project(sample)
+        c = x[self._rng.choice(len(x), size=nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            a = np.argmax(x @ c.T, axis=1)
+            order = np.argsort(a, kind="stable")
+            counts = np.bincount(a, minlength=nlist)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            nonempty = counts > 0
+            sums = np.add.reduceat(x[order], starts[nonempty], axis=0)
+            c[nonempty] = sums
+            # an empty cluster restarts at a random point
+            empty = np.flatnonzero(~nonempty)
+            if len(empty):
+                c[empty] = x[self._rng.choice(len(x), size=len(empty), replace=False)]
+            c /= np.maximum(np.linalg.norm(c, axis=1, keepdims=True), 1e-12)
+        self._centroids = c
+        self._trained_n = n
+        self._assign = np.zeros(0, dtype=np.int32)
+
+    def _file(self, lo: int, hi: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sorted (keys, rows, vals) of rows lo..hi, each under its nearest centroid."""
+        assign = [self._assign]
+        for a in range(lo, hi, _ASSIGN_ROWS):
+            x = self._project(np.arange(a, min(hi, a + _ASSIGN_ROWS)))
+            assign.append(np.argmax(x @ self._centroids.T, axis=1).astype(np.int32))
+        self._assign = np.concatenate(assign)
+        s, e = self._indptr[lo], self._indptr[hi]
+        rows = np.repeat(np.arange(lo, hi, dtype=np.int32), np.diff(self._indptr[lo:hi + 1]))
+        keys = self._assign[rows].astype(np.int64) * DIM + self._indices[s:e]
+        order = np.argsort(keys, kind="stable")
+        return keys[order], rows[order], self._data[s:e][order]
+
+    def _build(self) -> tuple[tuple[np.ndarray, np.ndarray, np.ndarray], int]:
+        """The clustered lists and how many rows they cover (call with the lock held)."""
+        self._compact()
+        n = len(self.items)
+        if self._centroids is None or n >= 2 * self._trained_n:
+            self._train()
+            # entries sorted by (cluster, term): the postings of one term inside one cluster
+            # are a contiguous run, found by binary search on the key
+            self._lists, self._listed = self._file(0, n), n
+        elif n - self._listed >= max(_DELTA_MIN, self._listed // _DELTA_SHARE):
+            # merge the delta into the sorted lists: one linear pass, no full re-sort
+            keys, rows, vals = self._lists
+            dk, dr, dv = self._file(self._listed, n)
+            at = np.searchsorted(keys, dk, side="right")
+            self._lists = (np.insert(keys, at, dk), np.insert(rows, at, dr), np.insert(vals, at, dv))
+            self._listed = n
+        return self._lists, self._listed
+
+    def _doc_freq(self) -> np.ndarray:
+        """Document frequency of every term, brought up to date with the rows added since."""
+        self._compact()
+        n = len(self.items)
+        if self._df_rows < n:
+            # a new array rather than += so a search holding the old one isn't disturbed
+            self._df = self._df + np.bincount(self._indices[self._indptr[self._df_rows]:], minlength=DIM)
+            self._df_rows = n
+        return self._df
+
+    # -- search --------------------------------------------------------------
+
+    def search_many(self, queries: list[str], k: int = 5) -> list[list[tuple[MemoryItem, float]]]:
+        if len(self.items) < self.min_train or not queries:
+            return super().search_many(queries, k)
+        with self._lock:
+            n = len(self.items)
+            df = self._doc_freq()
+            (keys, rows, vals), listed = self._build()
+            centroids, idf, items = self._centroids, self._idf, self.items
+            # the delta, scanned exactly: its entries as (row, term, value)
+            s0, s1 = self._indptr[listed], self._indptr[n]
+            d_rows = np.repeat(np.arange(listed, n, dtype=np.int32), np.diff(self._indptr[listed:n + 1]))
+            d_cols, d_vals = self._indices[s0:s1], self._data[s0:s1]
+        nlist = len(centroids)
+        nprobe = min(self.nprobe, nlist)
+        base = np.arange(nlist, dtype=np.int64) * DIM
+        out: list[list[tuple[MemoryItem, float]]] = []
+        for q in queries:
+            cols, tf = _query_terms(q)
+            w = tf
+            if self.idf and len(cols):
+                w = w * np.log1p(n / np.maximum(df[cols], 1))
+            norm = np.linalg.norm(w)
+            if not len(cols) or not norm:
+                out.append([])
+                continue
+            w = w / norm
+            qv = np.bincount(
+                self._bucket[cols], weights=tf * self._sign[cols] * idf[cols], minlength=self.dim
+            )
+            sim = centroids @ qv
+            probe = np.argpartition(-sim, nprobe - 1)[:nprobe]
+            # plus the clusters holding the rarest query term (at most nprobe more): the best
+            # matches often share one rare word with the query and nothing with its centroid
+            rare = base + cols[np.argmin(df[cols])]
+            has = np.flatnonzero(keys[np.minimum(np.searchsorted(keys, rare), len(keys) - 1)] == rare)
+            if len(has) > nprobe:
+                has = has[np.argpartition(-sim[has], nprobe - 1)[:nprobe]]
+            probe = np.union1d(probe, has)
+            # postings of the query terms inside the probed clusters only
+            want = (base[probe][:, None] + cols[None, :]).ravel()
+            starts = np.searchsorted(keys, want)
+            lens = np.searchsorted(keys, want + 1) - starts
+            pos = np.repeat(starts - (np.cumsum(lens) - lens), lens) + np.arange(int(lens.sum()))
+            r = rows[pos]
+            contrib = vals[pos] * np.repeat(np.tile(w, len(probe)), lens)
+            if len(d_cols):
+                # plus the delta's entries for the query terms
+                order = np.argsort(cols)
+                at = np.minimum(np.searchsorted(cols[order], d_cols), len(cols) - 1)
+                hit = cols[order][at] == d_cols
+                r = np.concatenate([r, d_rows[hit]])
+                contrib = np.concatenate([contrib, d_vals[hit] * w[order][at[hit]]])
+            if not len(r):
+                out.append([])
+                continue
+            o = np.argsort(r, kind="stable")
+            r, contrib = r[o], contrib[o]
+            first = np.concatenate([[0], np.flatnonzero(np.diff(r)) + 1])
+            hits = _top(np.add.reduceat(contrib, first)[None, :], k)[0]
+            cand = r[first]
+            out.append([(items[cand[j]], s) for j, s in hits])
+        return out
@@ -0,0 +1,223 @@
+"""Conversation history for the agents, packed into a token budget.
+
+`build(session_id)` returns the messages to put between an agent's system prompt and the new
+user message: the most recent turns that fit in `budget_tokens`, preceded by a running summary
+of everything older. Recent turns are read from the session store with the paged `messages`
+API, starting after the last message already folded into the summary, so the work per turn is
+bounded by the budget, not the length of the session.
+
+The summary is updated incrementally: once the unsummarized turns no longer fit, the oldest of
+them are folded into it with one LLM call (agent "summarizer"), leaving the newest
+`_KEEP` of the budget verbatim, so that a summary call happens once every few turns rather
+than on every one. The summary and how far it reaches are kept per session in a table of
+`cache_dir/context.sqlite3` that is never evicted (unlike a DiskCache, whose LRU/TTL would
+silently cost a long session its whole summary), and read from there on every build (no
+in-process tier), so all workers share one up-to-date state. The summary is anchored on its last message by append time
+and content, not by position: when trimming (`SESSION_MAX_MESSAGES`) shifts the message numbers
+the anchor is found again, and only a session that was rewritten (`save`) is summarized again
+from the start.
+
+Every build counts the tokens it sent and the tokens the full history would have cost in
+`orchestra_context_tokens_total{kind="sent"|"full"}`; the summarizer's own calls show up
+under its agent in `orchestra stats`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from orchestra.llm.client import LLMClient
+from orchestra.llm.ratelimit import estimate_tokens
+
+# share of the budget left as verbatim turns after folding the rest into the summary
+_KEEP = 0.5
+# messages read per page from the session store
+_PAGE = 1000
+
+_SUMMARY_SYSTEM = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Update the summary with the new messages. Keep facts, names, numbers, decisions, open "
+    "questions and the user's preferences; drop pleasantries. Reply with the summary only, "
+    "in at most {words} words."
+)
+
+@dataclass
+class Context:
+    messages: list[dict[str, str]]  # summary (if any) + recent turns, oldest first
+    tokens: int  # estimated prompt tokens of `messages`
+    full_tokens: int  # what sending the whole history would have cost
+    summarized: int  # messages covered by the summary
+
+def _tokens(m: dict[str, Any]) -> int:
+    return estimate_tokens([{"content": m["content"]}])
+
+def _digest(m: dict[str, Any]) -> str:
+    return hashlib.sha256(f"{m['role']}\0{m['content']}".encode("utf-8")).hexdigest()[:16]
+
+def _is_anchor(m: dict[str, Any], st: dict[str, Any]) -> bool:
+    """Whether `m` is the last message the summary covers."""
+    return m.get("ts") == st.get("ts") and _digest(m) == st["digest"]
+
+class _SummaryStore:
+    """Summary state per session in its own SQLite table: one row each, replaced on update."""
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute("CREATE TABLE IF NOT EXISTS summaries (session TEXT PRIMARY KEY, state TEXT NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> dict[str, Any] | None:
+        row = self._conn().execute("SELECT state FROM summaries WHERE session = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, session_id: str, state: dict[str, Any]) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO summaries(session, state) VALUES (?, ?)", (session_id, json.dumps(state))
+        )
+
+class ContextAssembler:
+    def __init__(
+        self,
+        sessions: Any,  # SessionStore or SqliteSessionStore
+        llm: LLMClient,
+        cache_dir: str,
+        budget_tokens: int = 2000,
+        summary_tokens: int = 300,
+    ) -> None:
+        self.sessions = sessions
+        self.llm = llm
+        self.summaries = _SummaryStore(Path(cache_dir) / "context.sqlite3")
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self._lock = threading.Lock()
+        self._session_locks: dict[str, threading.Lock] = {}
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            lock = self._session_locks.get(session_id)
+            if lock is None:
+                lock = self._session_locks[session_id] = threading.Lock()
+            return lock
+
+    # -- summary state -------------------------------------------------------
+
+    def _state(self, session_id: str) -> dict[str, Any]:
+        """The stored summary state, with `seq` pointing at its anchor's current position."""
+        empty = {"summary": "", "seq": 0, "ts": None, "digest": "", "tokens": 0}
+        st = self.summaries.get(session_id)
+        if st is None:
+            return empty
+        if not st["seq"]:
+            return st
+        last, _ = self.sessions.messages(session_id, str(st["seq"] - 1), 1)
+        if last and _is_anchor(last[0], st):
+            return st
+        seq = self._find_anchor(session_id, st)
+        if seq is None:
+            return empty  # history was rewritten: start over
+        st = st | {"seq": seq}
+        self.summaries.set(session_id, st)
+        return st
+
+    def _find_anchor(self, session_id: str, st: dict[str, Any]) -> int | None:
+        """Where the anchor moved to after trimming: its new seq, 0 if it was trimmed away
+        along with everything before it, None if the session no longer contains it."""
+        cursor: str | None = ""
+        first = True
+        while cursor is not None:
+            page, cursor = self.sessions.messages(session_id, cursor, _PAGE)
+            if first and page:
+                first = False
+                ts = page[0].get("ts")
+                if ts is not None and st.get("ts") is not None and ts > st["ts"]:
+                    return 0  # all that is left is newer than the summary
+            for m in page:
+                if _is_anchor(m, st):
+                    return m["seq"]
+        return None
+
+    def _pending(self, session_id: str, after: int) -> list[dict[str, Any]]:
+        out: list[dict[str, Any]] = []
+        cursor: str | None = str(after)
+        while cursor is not None:
+            page, cursor = self.sessions.messages(session_id, cursor, _PAGE)
+            out += page
+        return out
+
+    def _fold(self, summary: str, msgs: list[dict[str, Any]]) -> str:
+        """`summary` updated with `msgs`, in one LLM call per budget's worth of messages."""
+        chunk: list[str] = []
+        size = 0
+        for i, m in enumerate(msgs):
+            line = f"{m['role']}: {m['content'][: self.budget_tokens * 4]}"
+            chunk.append(line)
+            size += len(line) // 4
+            if size >= self.budget_tokens or i == len(msgs) - 1:
+                user = f"Summary so far:\n{summary or '(none)'}\n\nNew messages:\n" + "\n".join(chunk)
+                r = self.llm.chat(
+                    [
+                        {"role": "system", "content": _SUMMARY_SYSTEM.format(words=int(self.summary_tokens * 0.75))},
+                        {"role": "user", "content": user},
+                    ],
+                    temperature=0.0,
+                    agent="summarizer",
+                )
+                summary = r.text.strip()[: self.summary_tokens * 4]
+                self.llm.metrics.inc("orchestra_context_summaries_total")
+                chunk, size = [], 0
+        return summary
+
+    # -- public --------------------------------------------------------------
+
+    def build(self, session_id: str) -> Context:
+        """History to send with the next message of `session_id` (call before appending it)."""
+        if self.budget_tokens <= 0:
+            return Context([], 0, 0, 0)
+        with self._session_lock(session_id):
+            st = self._state(session_id)
+            pending = self._pending(session_id, st["seq"])
+            sizes = [_tokens(m) for m in pending]
+            summary_cost = _tokens({"content": st["summary"]}) if st["summary"] else 0
+            if summary_cost + sum(sizes) > self.budget_tokens:
+                # fold the oldest turns so the newest fit in _KEEP of the budget (minus the summary)
+                room = self.budget_tokens * _KEEP - self.summary_tokens
+                cut, used = len(pending), 0
+                while cut > 0 and used + sizes[cut - 1] <= room:
+                    cut -= 1
+                    used += sizes[cut]
+                if cut:  # else only the summary itself is over budget; nothing left to fold
+                    old, pending, folded = pending[:cut], pending[cut:], sizes[:cut]
+                    sizes = sizes[cut:]
+                    st = {
+                        "summary": self._fold(st["summary"], old),
+                        "seq": old[-1]["seq"],
+                        "ts": old[-1].get("ts"),
+                        "digest": _digest(old[-1]),
+                        "tokens": st["tokens"] + sum(folded),
+                    }
+                    self.summaries.set(session_id, st)
+        messages = []
+        if st["summary"]:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{st['summary']}"})
+        messages += [{"role": m["role"], "content": m["content"]} for m in pending]
+        tokens = estimate_tokens(messages)
+        full = st["tokens"] + sum(sizes)
+        self.llm.metrics.inc("orchestra_context_tokens_total", tokens, kind="sent")
+        self.llm.metrics.inc("orchestra_context_tokens_total", full, kind="full")
+        return Context(messages, tokens, full, st["seq"])
@@ -0,0 +1,330 @@
+"""On-disk vector memory: an append log plus immutable, memory-mapped segments.
+
+Layout under `root`:
+
+    manifest.json         {"segments": [...], "log": 7, "next_segment": 3}, replaced atomically
+    log-000007.jsonl      items added since the last flush, one JSON line each
+    seg-000002/           one segment, opened with np.load(mmap_mode="r"):
+        col_ptr.npy, rows.npy, vals.npy   L2-normalized TF rows, column-major (CSC) over the
+                                          hashed term space of sparse.py, so a query only
+                                          reads the columns of its own terms
+        offsets.npy, docs.bin             the items as JSON, and where each one starts
+
+`add` appends one line to the log (fsync'd unless `fsync=False`) and never rewrites a segment.
+Once the log holds `flush_items` items it is written out as a new segment and a fresh log is
+started. Opening the index maps the segments and replays only the current log, so start-up time
+does not depend on how many items are stored. `compact` merges all segments into one; call it
+now and then (`orchestra memory-compact`, with the server stopped) to keep the segment count low.
+
+A crash leaves at most a torn last log line (dropped on replay) or an unreferenced segment
+directory (deleted on open); the manifest is what decides what exists.
+
+One process at a time: the index holds an exclusive lock on `root/LOCK` from open to `close`,
+so a second opener (say `orchestra memory-compact` while the server runs) fails with
+IndexLockedError instead of deleting files the first one is still using.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock
+    fcntl = None
+
+from orchestra.memory.sparse import DIM, Columns, _query_terms, _scores, _to_columns, _top, _unit_row
+from orchestra.memory.vector import MemoryItem
+
+_ARRAYS = ("col_ptr", "rows", "vals", "offsets")
+# columns per slice when merging segments, bounds the merge's working memory
+_MERGE_COLS = 1 << 14
+
+class IndexLockedError(RuntimeError):
+    """The index directory is open in another process."""
+
+def _fsync_dir(path: Path) -> None:
+    if os.name == "posix":
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def _doc(item: MemoryItem) -> bytes:
+    return json.dumps({"id": item.id, "text": item.text, "meta": item.meta}, ensure_ascii=False).encode("utf-8")
+
+class _Segment:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        a = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in _ARRAYS}
+        self.csc: Columns = (a["col_ptr"], a["rows"], a["vals"])
+        self.offsets = a["offsets"]
+        self.n = len(self.offsets) - 1
+        self.docs = np.memmap(path / "docs.bin", dtype=np.uint8, mode="r") if self.offsets[-1] else b""
+
+    def item(self, i: int) -> MemoryItem:
+        d = json.loads(bytes(self.docs[self.offsets[i]:self.offsets[i + 1]]))
+        return MemoryItem(id=d["id"], text=d["text"], meta=d["meta"])
+
+    def df(self, cols: np.ndarray) -> np.ndarray:
+        col_ptr = self.csc[0]
+        return col_ptr[cols + 1] - col_ptr[cols]
+
+def _write_segment(path: Path, csc: Columns, docs: list[bytes], fsync: bool) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+    with (tmp / "docs.bin").open("wb") as f:
+        for i, d in enumerate(docs):
+            f.write(d)
+            offsets[i + 1] = offsets[i] + len(d)
+    for name, arr in zip(_ARRAYS, (*csc, offsets)):
+        np.save(tmp / f"{name}.npy", arr)
+    if fsync:
+        for p in tmp.iterdir():
+            with p.open("rb") as f:
+                os.fsync(f.fileno())
+        _fsync_dir(tmp)
+    os.replace(tmp, path)
+
+class PersistentVectorIndex:
+    """Drop-in for TinyVectorIndex (`add` / `search` over MemoryItem) that survives restarts."""
+
+    def __init__(self, root: str | Path, idf: bool = True, flush_items: int = 10_000, fsync: bool = True) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.idf = idf
+        self.flush_items = max(1, flush_items)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._segments: list[_Segment] = []
+        self._tail: list[MemoryItem] = []
+        self._tail_rows: list[tuple[list[int], list[float]]] = []
+        self._tail_csc: Columns | None = None
+        self._lock_fd = self._acquire()
+        try:
+            self._open()
+        except BaseException:
+            os.close(self._lock_fd)
+            raise
+
+    # -- files ---------------------------------------------------------------
+
+    def _manifest(self) -> dict:
+        p = self.root / "manifest.json"
+        if p.exists():
+            return json.loads(p.read_text(encoding="utf-8"))
+        return {"segments": [], "log": 1, "next_segment": 1}
+
+    def _save_manifest(self, m: dict) -> None:
+        tmp = self.root / "manifest.json.tmp"
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(m, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, self.root / "manifest.json")
+        if self.fsync:
+            _fsync_dir(self.root)
+        self._m = m
+
+    def _log_path(self, gen: int) -> Path:
+        return self.root / f"log-{gen:06d}.jsonl"
+
+    def _acquire(self) -> int:
+        fd = os.open(self.root / "LOCK", os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return fd
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            holder = os.pread(fd, 32, 0).decode("ascii", "replace").strip() or "?"
+            os.close(fd)
+            raise IndexLockedError(f"{self.root} is open in another process (pid {holder})") from None
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, str(os.getpid()).encode("ascii"), 0)
+        return fd
+
+    def _open(self) -> None:
+        m = self._m = self._manifest()
+        live = set(m["segments"])
+        # leftovers of an interrupted flush/compaction, and logs already turned into segments
+        for p in self.root.iterdir():
+            if p.name.startswith("seg-") and p.name not in live:
+                shutil.rmtree(p, ignore_errors=True)
+            elif p.name.startswith("log-") and p.name != self._log_path(m["log"]).name:
+                p.unlink()
+        self._segments = [_Segment(self.root / name) for name in m["segments"]]
+        self._replay(self._log_path(m["log"]))
+        self._log = self._log_path(m["log"]).open("ab")
+
+    def _replay(self, path: Path) -> None:
+        if not path.exists():
+            return
+        good = 0
+        with path.open("rb") as f:
+            for line in f:
+                try:
+                    d = json.loads(line)
+                except ValueError:
+                    break  # torn write at the end of the log
+                if not line.endswith(b"\n"):
+                    break
+                self._add_tail(MemoryItem(id=d["id"], text=d["text"], meta=d["meta"]))
+                good += len(line)
+        if good != path.stat().st_size:
+            with path.open("r+b") as f:
+                f.truncate(good)
+
+    # -- writes --------------------------------------------------------------
+
+    def _add_tail(self, item: MemoryItem) -> None:
+        self._tail.append(item)
+        self._tail_rows.append(_unit_row(item.text))
+        self._tail_csc = None
+
+    def add(self, item: MemoryItem) -> None:
+        with self._lock:
+            self._log.write(_doc(item) + b"\n")
+            self._log.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            self._add_tail(item)
+            if len(self._tail) >= self.flush_items:
+                self._flush()
+
+    def flush(self) -> None:
+        """Write the logged items out as a segment now."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._tail:
+            return
+        m = dict(self._m)
+        name = f"seg-{m['next_segment']:06d}"
+        _write_segment(self.root / name, self._tail_columns(), [_doc(it) for it in self._tail], self.fsync)
+        old_log = self._log_path(m["log"])
+        m.update(segments=m["segments"] + [name], log=m["log"] + 1, next_segment=m["next_segment"] + 1)
+        self._save_manifest(m)
+        self._log.close()
+        old_log.unlink()
+        self._log = self._log_path(m["log"]).open("ab")
+        self._segments.append(_Segment(self.root / name))
+        self._tail, self._tail_rows, self._tail_csc = [], [], None
+
+    def compact(self) -> None:
+        """Flush the log and merge every segment into one."""
+        with self._lock:
+            self._flush()
+            if len(self._segments) < 2:
+                return
+            m = dict(self._m)
+            name = f"seg-{m['next_segment']:06d}"
+            self._merge(self.root / name)
+            old = self._segments
+            m.update(segments=[name], next_segment=m["next_segment"] + 1)
+            self._save_manifest(m)
+            self._segments = [_Segment(self.root / name)]
+            for s in old:
+                shutil.rmtree(s.path, ignore_errors=True)
+
+    def _merge(self, path: Path) -> None:
+        segs = self._segments
+        nnz = sum(len(s.csc[1]) for s in segs)
+        base = np.cumsum([0] + [s.n for s in segs])
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        col_ptr = sum(s.csc[0].astype(np.int64) for s in segs)
+        rows = np.lib.format.open_memmap(tmp / "rows.npy", mode="w+", dtype=np.int32, shape=(nnz,))
+        vals = np.lib.format.open_memmap(tmp / "vals.npy", mode="w+", dtype=np.float32, shape=(nnz,))
+        # column slices keep memory bounded: within a slice, entries are ordered by column, then
+        # by segment (row ids of later segments are larger, so each column stays row-sorted)
+        for c0 in range(0, DIM, _MERGE_COLS):
+            c1 = min(DIM, c0 + _MERGE_COLS)
+            cols, rs, vs = [], [], []
+            for b, s in zip(base, segs):
+                p, r, v = s.csc
+                lo, hi = int(p[c0]), int(p[c1])
+                cols.append(np.repeat(np.arange(c0, c1), np.diff(p[c0:c1 + 1])))
+                rs.append(np.asarray(r[lo:hi]) + b)
+                vs.append(v[lo:hi])
+            order = np.argsort(np.concatenate(cols), kind="stable")
+            lo, hi = int(col_ptr[c0]), int(col_ptr[c1])
+            rows[lo:hi] = np.concatenate(rs)[order]
+            vals[lo:hi] = np.concatenate(vs)[order]
+        rows.flush()
+        vals.flush()
+        del rows, vals
+        np.save(tmp / "col_ptr.npy", col_ptr)
+        offsets = [np.zeros(1, dtype=np.int64)]
+        with (tmp / "docs.bin").open("wb") as f:
+            for s in segs:
+                with (s.path / "docs.bin").open("rb") as src:
+                    shutil.copyfileobj(src, f)
+                offsets.append(np.asarray(s.offsets[1:]) + offsets[-1][-1])
+        np.save(tmp / "offsets.npy", np.concatenate(offsets))
+        if self.fsync:
+            for p in tmp.iterdir():
+                with p.open("rb") as f:
+                    os.fsync(f.fileno())
+            _fsync_dir(tmp)
+        os.replace(tmp, path)
+
+    def close(self) -> None:
+        with self._lock:
+            self._log.close()
+            if self._lock_fd >= 0:
+                os.close(self._lock_fd)  # releases the directory lock
+                self._lock_fd = -1
+
+    # -- reads ---------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return sum(s.n for s in self._segments) + len(self._tail)
+
+    def _tail_columns(self) -> Columns:
+        if self._tail_csc is None:
+            lens = np.array([len(c) for c, _ in self._tail_rows], dtype=np.int64)
+            idx = np.array([h for c, _ in self._tail_rows for h in c], dtype=np.int32)
+            data = np.array([v for _, vs in self._tail_rows for v in vs], dtype=np.float32)
+            self._tail_csc = _to_columns(lens, idx, data)
+        return self._tail_csc
+
+    def search(self, query: str, k: int = 5) -> list[tuple[MemoryItem, float]]:
+        with self._lock:
+            segs = list(self._segments)
+            tail = list(self._tail)
+            tail_csc = self._tail_columns() if tail else None
+        cols, w = _query_terms(query)
+        n = sum(s.n for s in segs) + len(tail)
+        if not len(cols) or n == 0 or k <= 0:
+            return []
+        if self.idf:
+            df = sum((s.df(cols) for s in segs), np.zeros(len(cols), dtype=np.int64))
+            if tail_csc is not None:
+                df = df + tail_csc[0][cols + 1] - tail_csc[0][cols]
+            w = w * np.log1p(n / np.maximum(df, 1))
+        norm = np.linalg.norm(w)
+        w = w / norm if norm else w
+        # top k per segment, then the best k overall
+        found: list[tuple[float, int, int, int]] = []
+        parts = [(cols, w)]
+        for si, s in enumerate(segs):
+            found += [(sc, -si, -i, si) for i, sc in _top(_scores(s.csc, parts, s.n), k)[0]]
+        if tail_csc is not None:
+            found += [(sc, -len(segs), -i, -1) for i, sc in _top(_scores(tail_csc, parts, len(tail)), k)[0]]
+        found.sort(reverse=True)
+        return [
+            (tail[-i] if si == -1 else segs[si].item(-i), sc)
+            for sc, _, i, si in found[:k]
+        ]
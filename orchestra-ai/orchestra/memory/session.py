@@ -1,35 +1,328 @@
+"""Chat history: one append-only JSONL log per session under `data_dir/sessions/`.
+
+`append` writes a single line with one O_APPEND write, so an append costs the same on message
+10 and message 10,000, and concurrent appends (threads or worker processes) never drop each
+other's messages. Durability follows `fsync`:
+
+- "always": fsync after every append
+- "interval": a background thread fsyncs the files appended to every `fsync_interval_s`
+  (a crash can lose that window, but never corrupts earlier lines)
+- "never": leave it to the OS
+
+`load(session_id, last_n=...)` reads backwards from the end of the file, so the last few turns
+of a long session don't cost a full read. Fully loaded sessions are kept in a small LRU; a hit
+only reads what was appended since (by this or another process).
+
+The background thread also compacts: it drops torn or unreadable lines (from a crash
+mid-write), trims sessions to `max_messages` when that is set, and migrates the old
+`<id>.json` files (one JSON array, rewritten on every append) to JSONL.
+"""
+
 from __future__ import annotations
 
 import json
+import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+_FSYNC = ("always", "interval", "never")
+# bytes read per step when tail-reading from the end of a log
+_TAIL_BLOCK = 64 * 1024
+
 @dataclass
 class Message:
     role: str
     content: str
+    meta: dict[str, Any] | None = None
+    ts: float | None = None  # unix time of the append; stays with the message through trimming
+
+def _encode(m: Message) -> bytes:
+    raw = {k: v for k, v in m.__dict__.items() if v is not None}
+    return json.dumps(raw, ensure_ascii=False).encode("utf-8") + b"\n"
+
+def _decode(lines: list[bytes]) -> list[Message]:
+    out = []
+    for line in lines:
+        if not line.endswith(b"\n"):
+            continue  # torn write at the end of the file
+        try:
+            out.append(Message(**json.loads(line)))
+        except (ValueError, TypeError):
+            continue
+    return out
+
+def parse_cursor(cursor: str) -> int:
+    """The seq a `messages` cursor points after; ValueError if it isn't one we handed out."""
+    if not cursor:
+        return 0
+    if not (cursor.isascii() and cursor.isdigit()):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return int(cursor)
 
 class SessionStore:
-    def __init__(self, data_dir: str) -> None:
+    def __init__(
+        self,
+        data_dir: str,
+        fsync: str = "interval",
+        fsync_interval_s: float = 1.0,
+        cache_sessions: int = 64,
+        max_messages: int = 0,
+        compact_interval_s: float = 60.0,
+    ) -> None:
+        if fsync not in _FSYNC:
+            raise ValueError(f"fsync must be one of {', '.join(_FSYNC)}")
         self.root = Path(data_dir) / "sessions"
         self.root.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.fsync_interval_s = fsync_interval_s
+        self.cache_sessions = cache_sessions
+        self.max_messages = max_messages  # 0 = keep everything
+        self.compact_interval_s = compact_interval_s
+        self._lock = threading.Lock()
+        self._session_locks: dict[str, threading.Lock] = {}
+        # session id -> (messages, bytes of the file they cover, inode)
+        self._cache: OrderedDict[str, tuple[list[Message], int, int]] = OrderedDict()
+        self._unsynced: set[str] = set()
+        self._appended: set[str] = set()  # since the last compaction pass
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._background, name="session-store", daemon=True)
+        self._thread.start()
 
     def path(self, session_id: str) -> Path:
+        return self.root / f"{session_id}.jsonl"
+
+    def _legacy_path(self, session_id: str) -> Path:
         return self.root / f"{session_id}.json"
 
-    def load(self, session_id: str) -> list[Message]:
+    def ids(self) -> list[str]:
+        return sorted({p.stem for p in self.root.glob("*.jsonl")} | {p.stem for p in self.root.glob("*.json")})
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            lock = self._session_locks.get(session_id)
+            if lock is None:
+                lock = self._session_locks[session_id] = threading.Lock()
+            return lock
+
+    # -- cache ---------------------------------------------------------------
+
+    def _read(self, session_id: str) -> list[Message]:
+        """Whole history, through the LRU. A cached session is brought up to date by reading
+        only what was appended since (by any process); a rewritten file is read again."""
+        p = self.path(session_id)
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            hit = self._cache.get(session_id)
+            if hit is not None:
+                self._cache.move_to_end(session_id)
+        msgs, offset, ino = hit if hit is not None and hit[2] == st.st_ino and hit[1] <= st.st_size else ([], 0, st.st_ino)
+        if offset < st.st_size:
+            with p.open("rb") as f:
+                f.seek(offset)
+                data = f.read(st.st_size - offset)
+            end = data.rfind(b"\n") + 1  # a line still being written is left for next time
+            msgs = msgs + _decode(data[:end].splitlines(keepends=True))
+            offset += end
+        if self.cache_sessions > 0:
+            with self._lock:
+                self._cache[session_id] = (msgs, offset, ino)
+                self._cache.move_to_end(session_id)
+                while len(self._cache) > self.cache_sessions:
+                    self._cache.popitem(last=False)
+        return msgs
+
+    # -- files ---------------------------------------------------------------
+
+    def _migrate(self, session_id: str) -> None:
+        """Convert a legacy `<id>.json` array to JSONL (call with the session lock held)."""
+        legacy = self._legacy_path(session_id)
+        if not legacy.exists():
+            return
         p = self.path(session_id)
         if not p.exists():
+            raw = json.loads(legacy.read_text(encoding="utf-8"))
+            self._rewrite(p, [Message(**m) for m in raw])
+        legacy.unlink()
+
+    def _rewrite(self, p: Path, msgs: list[Message]) -> None:
+        tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            f.write(b"".join(_encode(m) for m in msgs))
+            f.flush()
+            if self.fsync != "never":
+                os.fsync(f.fileno())
+        os.replace(tmp, p)
+
+    def _open_append(self, p: Path) -> int:
+        """An O_APPEND fd on the current file at `p`, shared-locked against compaction."""
+        while True:
+            fd = os.open(p, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl is None:
+                return fd
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                if os.fstat(fd).st_ino == os.stat(p).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)  # compaction replaced the file while we waited; append to the new one
+
+    def _compact_file(self, session_id: str) -> None:
+        p = self.path(session_id)
+        with self._session_lock(session_id):
+            self._migrate(session_id)
+            if not p.exists():
+                return
+            fd = os.open(p, os.O_RDONLY)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                with os.fdopen(os.dup(fd), "rb") as f:
+                    lines = f.readlines()
+                msgs = _decode(lines)
+                keep = msgs[-self.max_messages:] if self.max_messages else msgs
+                if len(keep) == len(lines):
+                    return
+                self._rewrite(p, keep)
+            finally:
+                os.close(fd)
+
+    # -- public --------------------------------------------------------------
+
+    def load(self, session_id: str, last_n: int | None = None) -> list[Message]:
+        """The session's messages, or only its last `last_n`."""
+        if not self.path(session_id).exists() and self._legacy_path(session_id).exists():
+            with self._session_lock(session_id):
+                self._migrate(session_id)
+        if last_n is None:
+            return list(self._read(session_id))
+        if last_n <= 0:
+            return []
+        with self._lock:
+            hot = session_id in self._cache
+        if hot:
+            return self._read(session_id)[-last_n:]
+        try:
+            return self._tail(self.path(session_id), last_n)
+        except FileNotFoundError:
             return []
-        raw = json.loads(p.read_text(encoding="utf-8"))
-        return [Message(**m) for m in raw]
+
+    def _tail(self, p: Path, n: int) -> list[Message]:
+        if n <= 0:
+            return []
+        with p.open("rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos, buf = end, b""
+            # one extra line: the first one in the buffer may be cut off
+            while pos > 0 and buf.count(b"\n") <= n:
+                step = min(_TAIL_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+        lines = buf.splitlines(keepends=True)
+        if pos > 0:
+            lines = lines[1:]
+        return _decode(lines)[-n:]
 
     def save(self, session_id: str, messages: list[Message]) -> None:
+        """Replace a session's whole history."""
+        with self._session_lock(session_id):
+            self._legacy_path(session_id).unlink(missing_ok=True)
+            self._rewrite(self.path(session_id), messages)
+
+    def append(self, session_id: str, role: str, content: str, meta: dict[str, Any] | None = None) -> None:
+        line = _encode(Message(role=role, content=content, meta=meta, ts=time.time()))
         p = self.path(session_id)
-        p.write_text(json.dumps([m.__dict__ for m in messages], ensure_ascii=False, indent=2), encoding="utf-8")
+        with self._session_lock(session_id):
+            if not p.exists():
+                self._migrate(session_id)
+            fd = self._open_append(p)
+            try:
+                size = os.fstat(fd).st_size
+                if size and os.pread(fd, 1, size - 1) != b"\n":
+                    line = b"\n" + line  # don't glue onto a line torn by a crash
+                os.write(fd, line)
+                if self.fsync == "always":
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            with self._lock:
+                if self.fsync == "interval":
+                    self._unsynced.add(session_id)
+                self._appended.add(session_id)
 
-    def append(self, session_id: str, role: str, content: str) -> None:
+    def list_sessions(self, cursor: str = "", limit: int = 100) -> tuple[list[dict[str, Any]], str | None]:
+        """One page of sessions ordered by id, after `cursor` (this backend lists the directory)."""
+        ids = [sid for sid in self.ids() if sid > cursor][: limit + 1]
+        page = []
+        for sid in ids[:limit]:
+            p = self.path(sid) if self.path(sid).exists() else self._legacy_path(sid)
+            try:
+                page.append({"id": sid, "updated": p.stat().st_mtime})
+            except FileNotFoundError:
+                continue
+        return page, (ids[limit - 1] if len(ids) > limit else None)
+
+    def messages(self, session_id: str, cursor: str = "", limit: int = 100) -> tuple[list[dict[str, Any]], str | None]:
+        """One page of a session's messages with seq (1-based) greater than `cursor`."""
+        after = parse_cursor(cursor)
         msgs = self.load(session_id)
-        msgs.append(Message(role=role, content=content))
-        self.save(session_id, msgs)
+        page = [
+            {"seq": seq, "role": m.role, "content": m.content, "meta": m.meta, "ts": m.ts}
+            for seq, m in enumerate(msgs[after:after + limit], start=after + 1)
+        ]
+        return page, (str(page[-1]["seq"]) if after + limit < len(msgs) else None)
+
+    # -- background ----------------------------------------------------------
+
+    def _sync(self) -> None:
+        with self._lock:
+            pending, self._unsynced = self._unsynced, set()
+        for sid in pending:
+            try:
+                fd = os.open(self.path(sid), os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def compact(self, session_ids: list[str] | None = None) -> None:
+        """Compact the given sessions (default: all of them)."""
+        for sid in self.ids() if session_ids is None else session_ids:
+            self._compact_file(sid)
+
+    def _background(self) -> None:
+        try:
+            self.compact([p.stem for p in self.root.glob("*.json")])  # legacy files
+        except Exception:
+            pass
+        last_compact = time.monotonic()
+        while not self._stop.wait(self.fsync_interval_s if self.fsync == "interval" else self.compact_interval_s):
+            try:
+                self._sync()
+                if time.monotonic() - last_compact >= self.compact_interval_s:
+                    last_compact = time.monotonic()
+                    with self._lock:
+                        touched, self._appended = self._appended, set()
+                    self.compact(sorted(touched))
+            except Exception:
+                pass  # best effort; the next round retries
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._sync()
@@ -0,0 +1,207 @@
+"""SessionStore on one SQLite database (WAL), for `orchestra serve` with several workers.
+
+Every worker process opens the same file. Writes from a process go through a single writer
+thread that takes whatever appends are queued and commits them in one transaction (group
+commit), so a burst of requests costs one commit instead of one per message; `append` still
+returns only after its message is committed, so a following `load` sees it. Each write runs in
+its own savepoint, so one that fails is rolled back alone and the rest of the batch commits. Message numbers
+(`seq`) are assigned inside the transaction and are gap-free per session across processes.
+
+Listing sessions and paging through a session's messages are keyset queries on the
+`sessions` primary key and the (session_id, seq) primary key of `messages`, so neither
+depends on how many sessions exist.
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable
+
+from orchestra.memory.session import Message, _decode, parse_cursor
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, created REAL NOT NULL, updated REAL NOT NULL, n INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, meta TEXT, ts REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+# SESSION_FSYNC -> PRAGMA synchronous (in WAL mode NORMAL syncs at checkpoints, not per commit)
+_SYNCHRONOUS = {"always": "FULL", "interval": "NORMAL", "never": "OFF"}
+
+def _row(seq: int, role: str, content: str, meta: str | None, ts: float) -> dict[str, Any]:
+    return {"seq": seq, "role": role, "content": content, "meta": json.loads(meta) if meta else None, "ts": ts}
+
+class SqliteSessionStore:
+    def __init__(self, db_path: str | Path, fsync: str = "interval", batch_max: int = 256, import_dir: str | Path | None = None) -> None:
+        if fsync not in _SYNCHRONOUS:
+            raise ValueError(f"fsync must be one of {', '.join(_SYNCHRONOUS)}")
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.batch_max = batch_max
+        self._local = threading.local()
+        self._queue: queue.Queue[tuple[Callable[[sqlite3.Connection], Any], Future] | None] = queue.Queue()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        if import_dir is not None:
+            self._import(Path(import_dir))
+        self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self._writer.start()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={_SYNCHRONOUS[self.fsync]}")
+            self._local.conn = conn
+        return conn
+
+    def _import(self, sessions_dir: Path) -> None:
+        """Copy JSON / JSONL sessions from the file backend into an empty database, once."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None and sessions_dir.is_dir():
+                for p in sorted(sessions_dir.iterdir()):
+                    if p.suffix == ".jsonl":
+                        with p.open("rb") as f:
+                            msgs = _decode(f.readlines())
+                    elif p.suffix == ".json":
+                        msgs = [Message(**m) for m in json.loads(p.read_text(encoding="utf-8"))]
+                    else:
+                        continue
+                    self._replace(conn, p.stem, msgs, p.stat().st_mtime)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # -- writes --------------------------------------------------------------
+
+    def _write_loop(self) -> None:
+        conn = self._conn()
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            batch = [job]
+            while len(batch) < self.batch_max:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    self._queue.put(None)  # stop after this batch
+                    break
+                batch.append(job)
+            results: list[tuple[Any, BaseException | None]] = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for fn, _ in batch:
+                    conn.execute("SAVEPOINT job")
+                    try:
+                        res = fn(conn)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO job")
+                        results.append((None, e))
+                    else:
+                        results.append((res, None))
+                    conn.execute("RELEASE job")
+                conn.execute("COMMIT")
+            except BaseException as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), (res, err) in zip(batch, results):
+                if err is not None:
+                    fut.set_exception(err)
+                else:
+                    fut.set_result(res)
+
+    def _submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        fut: Future = Future()
+        self._queue.put((fn, fut))
+        return fut.result()
+
+    @staticmethod
+    def _replace(conn: sqlite3.Connection, session_id: str, messages: list[Message], now: float) -> None:
+        conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions(id, created, updated, n) VALUES (?, COALESCE((SELECT created FROM sessions WHERE id = ?), ?), ?, ?)",
+            (session_id, session_id, now, now, len(messages)),
+        )
+        conn.executemany(
+            "INSERT INTO messages(session_id, seq, role, content, meta, ts) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (session_id, i, m.role, m.content, json.dumps(m.meta, ensure_ascii=False) if m.meta is not None else None, m.ts if m.ts is not None else now)
+                for i, m in enumerate(messages, start=1)
+            ],
+        )
+
+    def append(self, session_id: str, role: str, content: str, meta: dict[str, Any] | None = None) -> None:
+        meta_json = json.dumps(meta, ensure_ascii=False) if meta is not None else None
+
+        def write(conn: sqlite3.Connection) -> None:
+            now = time.time()
+            (seq,) = conn.execute(
+                "INSERT INTO sessions(id, created, updated, n) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(id) DO UPDATE SET n = n + 1, updated = excluded.updated RETURNING n",
+                (session_id, now, now),
+            ).fetchone()
+            conn.execute(
+                "INSERT INTO messages(session_id, seq, role, content, meta, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, seq, role, content, meta_json, now),
+            )
+
+        self._submit(write)
+
+    def save(self, session_id: str, messages: list[Message]) -> None:
+        """Replace a session's whole history."""
+        self._submit(lambda conn: self._replace(conn, session_id, messages, time.time()))
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+
+    # -- reads ---------------------------------------------------------------
+
+    def ids(self) -> list[str]:
+        return [sid for (sid,) in self._conn().execute("SELECT id FROM sessions ORDER BY id")]
+
+    def load(self, session_id: str, last_n: int | None = None) -> list[Message]:
+        """The session's messages, or only its last `last_n`."""
+        if last_n is not None and last_n <= 0:
+            return []
+        rows = self._conn().execute(
+            "SELECT role, content, meta, ts FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+            (session_id, -1 if last_n is None else last_n),
+        ).fetchall()
+        return [Message(role=r, content=c, meta=json.loads(m) if m else None, ts=ts) for r, c, m, ts in reversed(rows)]
+
+    def list_sessions(self, cursor: str = "", limit: int = 100) -> tuple[list[dict[str, Any]], str | None]:
+        """One page of sessions ordered by id, after `cursor`."""
+        rows = self._conn().execute(
+            "SELECT id, updated, n FROM sessions WHERE id > ? ORDER BY id LIMIT ?", (cursor, limit + 1)
+        ).fetchall()
+        page = [{"id": sid, "updated": updated, "messages": n} for sid, updated, n in rows[:limit]]
+        return page, (page[-1]["id"] if len(rows) > limit else None)
+
+    def messages(self, session_id: str, cursor: str = "", limit: int = 100) -> tuple[list[dict[str, Any]], str | None]:
+        """One page of a session's messages with seq greater than `cursor`."""
+        rows = self._conn().execute(
+            "SELECT seq, role, content, meta, ts FROM messages WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (session_id, parse_cursor(cursor), limit + 1),
+        ).fetchall()
+        page = [_row(*r) for r in rows[:limit]]
+        return page, (str(page[-1]["seq"]) if len(rows) > limit else None)
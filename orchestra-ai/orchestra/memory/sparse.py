@@ -0,0 +1,185 @@
+"""NumPy-backed sparse index with the same interface as TinyVectorIndex.
+
+Install with the `fast` extra (`pip install -e .[fast]`).
+
+Terms are hashed (crc32, stable across processes) into a fixed 2^20-dim space, and each item
+becomes one L2-normalized TF row. Rows are kept as CSR arrays (indptr / indices / float32
+data), 8 bytes per stored term instead of a dict entry; the column-major copy (CSC) used for
+queries doubles that and is rebuilt lazily after adds. The score vector X @ q gathers only the
+columns of the query's terms and sums them per row with `np.bincount`; `search_many` does the
+same for a batch in one go (X @ Q^T). Hash collisions are possible but rare at 2^20 dims.
+
+`add` and `search` may be called from several threads (the API serves them from a threadpool):
+adds and the lazy rebuilds happen under a lock, and a search scores a consistent snapshot of
+the arrays outside it. The CSR arrays grow by doubling, so folding new rows in costs only the
+new rows, not a copy of everything stored.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import zlib
+
+import numpy as np
+
+from orchestra.memory.vector import MemoryItem, _tokenize
+
+DIM = 1 << 20
+# scores per chunk of search_many (batch x items, float64): about 4MB, so the score block stays
+# in cache; bigger blocks make the scatter memory-bound and slower per query
+_BATCH_CELLS = 1 << 19
+
+# CSC arrays: (col_ptr over DIM + 1, row ids, float32 values)
+Columns = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+def _hashed_tf(text: str) -> dict[int, float]:
+    out: dict[int, float] = {}
+    for t in _tokenize(text):
+        h = zlib.crc32(t.encode("utf-8")) % DIM
+        out[h] = out.get(h, 0.0) + 1.0
+    return out
+
+def _unit_row(text: str) -> tuple[list[int], list[float]]:
+    """Sorted hashed term ids and L2-normalized TF weights of one item."""
+    tf = _hashed_tf(text)
+    norm = math.sqrt(sum(v * v for v in tf.values())) or 1.0
+    cols = sorted(tf)
+    return cols, [tf[h] / norm for h in cols]
+
+def _to_columns(lens: np.ndarray, indices: np.ndarray, data: np.ndarray) -> Columns:
+    """Row-major entries (row lengths, column ids, values) -> CSC (col_ptr, row ids, values)."""
+    rows = np.repeat(np.arange(len(lens), dtype=np.int32), lens)
+    order = np.argsort(indices, kind="stable")
+    col_ptr = np.zeros(DIM + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=DIM), out=col_ptr[1:])
+    return col_ptr, rows[order], data[order].astype(np.float32, copy=False)
+
+def _query_terms(text: str) -> tuple[np.ndarray, np.ndarray]:
+    tf = _hashed_tf(text)
+    return (
+        np.fromiter(tf.keys(), dtype=np.int64, count=len(tf)),
+        np.fromiter(tf.values(), dtype=np.float64, count=len(tf)),
+    )
+
+def _scores(csc: Columns, parts: list[tuple[np.ndarray, np.ndarray]], n: int) -> np.ndarray:
+    """Dense (len(parts), n) scores X @ Q^T for queries given as (column ids, weights): the
+    stored entries of every query's columns are gathered at once and summed with one bincount."""
+    col_ptr, rows, vals = csc
+    cols = np.concatenate([c for c, _ in parts])
+    w = np.concatenate([w for _, w in parts])
+    qid = np.repeat(np.arange(len(parts), dtype=np.int64), [len(c) for c, _ in parts])
+    starts = col_ptr[cols]
+    lens = col_ptr[cols + 1] - starts
+    total = int(lens.sum())
+    # positions of every stored entry in the queries' columns, without a Python loop
+    pos = np.repeat(starts - (np.cumsum(lens) - lens), lens) + np.arange(total)
+    keys = np.repeat(qid * n, lens) + rows[pos]
+    return np.bincount(
+        keys, weights=vals[pos] * np.repeat(w, lens), minlength=len(parts) * n
+    ).reshape(len(parts), n)
+
+def _top(scores: np.ndarray, k: int) -> list[list[tuple[int, float]]]:
+    """(row, score) top k of every row of a score matrix, best first, ties by row order."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return [[] for _ in range(scores.shape[0])]
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    out = []
+    for row, cand in zip(scores, top):
+        cand = cand[np.lexsort((cand, -row[cand]))]
+        out.append([(int(i), float(row[i])) for i in cand if row[i] > 0.0])
+    return out
+
+def _grow(buf: np.ndarray, need: int) -> np.ndarray:
+    """`buf`, or a copy with room for at least `need` entries (capacity doubles)."""
+    if need <= len(buf):
+        return buf
+    out = np.empty(max(need, 2 * len(buf), 1024), dtype=buf.dtype)
+    out[:len(buf)] = buf
+    return out
+
+class SparseVectorIndex:
+    def __init__(self, idf: bool = True) -> None:
+        self.idf = idf
+        self.items: list[MemoryItem] = []
+        self._lock = threading.RLock()
+        # CSR over the compacted rows; _indptr / _indices / _data are views of the growable
+        # buffers, and entries already stored are never written again, so a search can keep
+        # using the views it took while adds go on
+        self._ptr_buf = np.zeros(1, dtype=np.int64)
+        self._idx_buf = np.zeros(0, dtype=np.int32)
+        self._val_buf = np.zeros(0, dtype=np.float32)
+        self._indptr = self._ptr_buf[:1]
+        self._indices = self._idx_buf[:0]
+        self._data = self._val_buf[:0]
+        # rows added since the last compaction into the CSR arrays
+        self._pending_idx: list[int] = []
+        self._pending_val: list[float] = []
+        self._pending_len: list[int] = []
+        self._csc: Columns | None = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, item: MemoryItem) -> None:
+        cols, vals = _unit_row(item.text)
+        with self._lock:
+            self._pending_idx.extend(cols)
+            self._pending_val.extend(vals)
+            self._pending_len.append(len(cols))
+            self.items.append(item)
+            self._csc = None
+
+    def _compact(self) -> None:
+        """Fold pending rows into the CSR arrays (call with the lock held)."""
+        if not self._pending_len:
+            return
+        rows, nnz = len(self._indptr), len(self._indices)
+        lens = np.asarray(self._pending_len, dtype=np.int64)
+        end = nnz + int(lens.sum())
+        self._ptr_buf = _grow(self._ptr_buf, rows + len(lens))
+        self._idx_buf = _grow(self._idx_buf, end)
+        self._val_buf = _grow(self._val_buf, end)
+        self._ptr_buf[rows:rows + len(lens)] = nnz + np.cumsum(lens)
+        self._idx_buf[nnz:end] = self._pending_idx
+        self._val_buf[nnz:end] = self._pending_val
+        self._indptr = self._ptr_buf[:rows + len(lens)]
+        self._indices = self._idx_buf[:end]
+        self._data = self._val_buf[:end]
+        self._pending_idx, self._pending_val, self._pending_len = [], [], []
+
+    def _columns(self) -> Columns:
+        """CSC view, rebuilt after adds (call with the lock held)."""
+        if self._csc is None:
+            self._compact()
+            self._csc = _to_columns(np.diff(self._indptr), self._indices, self._data)
+        return self._csc
+
+    def _query(self, text: str, col_ptr: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+        """Hashed query terms and their (idf-weighted, normalized) weights."""
+        cols, w = _query_terms(text)
+        if self.idf and len(cols):
+            df = col_ptr[cols + 1] - col_ptr[cols]
+            w = w * np.log1p(n / np.maximum(df, 1))
+        norm = np.linalg.norm(w)
+        return cols, (w / norm if norm else w)
+
+    def search(self, query: str, k: int = 5) -> list[tuple[MemoryItem, float]]:
+        return self.search_many([query], k)[0]
+
+    def search_many(self, queries: list[str], k: int = 5) -> list[list[tuple[MemoryItem, float]]]:
+        """Top-k for each query; a chunk of queries is scored as one sparse product X @ Q^T."""
+        with self._lock:
+            n = len(self.items)
+            if n == 0 or not queries:
+                return [[] for _ in queries]
+            csc = self._columns()
+            items = self.items
+        step = max(1, _BATCH_CELLS // n)
+        out: list[list[tuple[MemoryItem, float]]] = []
+        for lo in range(0, len(queries), step):
+            parts = [self._query(q, csc[0], n) for q in queries[lo:lo + step]]
+            for hits in _top(_scores(csc, parts, n), k):
+                out.append([(items[i], s) for i, s in hits])
+        return out
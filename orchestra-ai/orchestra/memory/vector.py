@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import heapq
 import math
+from array import array
 from dataclasses import dataclass
 from typing import Iterable
 
@@ -52,17 +54,77 @@ class MemoryItem:
     meta: dict
 
 class TinyVectorIndex:
-    """A tiny TF-based index (no external deps). Good enough for demos and small apps."""
-    def __init__(self) -> None:
+    """A tiny TF-based index (no external deps). Good enough for demos and small apps.
+
+    Search walks postings lists (term -> item ids) instead of every item, using norms computed
+    at insert time, and keeps only the top k in a heap. By default it scores exactly like plain
+    TF cosine. With `idf` the query terms are weighted by log(1 + N/df), so rare words decide
+    the ranking; item vectors stay plain TF, so adding items never rescales earlier ones.
+
+    With `max_postings` > 0, query terms are visited rarest first and their postings merged
+    while the total stays within `max_postings` (the rarest term is always merged). The
+    remaining, more common terms only re-score the candidates found so far instead of adding
+    every item that contains them, so query cost stops growing with the index. An item that
+    shares only common words with the query can then be missed. 0 (the default) is exact.
+    """
+    def __init__(self, idf: bool = False, max_postings: int = 0) -> None:
+        self.idf = idf
+        self.max_postings = max_postings
         self.items: list[MemoryItem] = []
         self.vecs: list[dict[str, float]] = []
+        self.norms: list[float] = []
+        self.postings: dict[str, array] = {}
 
     def add(self, item: MemoryItem) -> None:
+        i = len(self.items)
+        vec = _tf(item.text)
         self.items.append(item)
-        self.vecs.append(_tf(item.text))
+        self.vecs.append(vec)
+        self.norms.append(math.sqrt(sum(v * v for v in vec.values())))
+        for t in vec:
+            ids = self.postings.get(t)
+            if ids is None:
+                ids = self.postings[t] = array("I")
+            ids.append(i)
+
+    def _weight(self, t: str, n: int) -> float:
+        if not self.idf:
+            return 1.0
+        ids = self.postings.get(t)
+        return math.log(1.0 + n / (len(ids) if ids else 1))
 
     def search(self, query: str, k: int = 5) -> list[tuple[MemoryItem, float]]:
         qv = _tf(query)
-        scored = [(self.items[i], _cos(qv, self.vecs[i])) for i in range(len(self.items))]
-        scored.sort(key=lambda x: x[1], reverse=True)
-        return [s for s in scored[:k] if s[1] > 0.0]
+        n = len(self.items)
+        if not qv or n == 0 or k <= 0:
+            return []
+        qw = {t: v * self._weight(t, n) for t, v in qv.items()}
+        qn = math.sqrt(sum(v * v for v in qw.values()))
+        terms = sorted((t for t in qw if t in self.postings), key=lambda t: len(self.postings[t]))
+        if not terms or qn == 0.0:
+            return []
+        vecs = self.vecs
+        acc: dict[int, float] = {}
+        budget = self.max_postings
+        scanned = 0
+        for t in terms:
+            w = qw[t]
+            ids = self.postings[t]
+            if not budget or not acc or scanned + len(ids) <= budget:
+                scanned += len(ids)
+                for i in ids:
+                    acc[i] = acc.get(i, 0.0) + w * vecs[i][t]
+            else:
+                for i in acc:
+                    d = vecs[i].get(t)
+                    if d is not None:
+                        acc[i] += w * d
+
+        norms = self.norms
+        best = heapq.nlargest(k, acc.items(), key=lambda kv: (kv[1] / norms[kv[0]], -kv[0]))
+        out = []
+        for i, dot in best:
+            score = dot / (qn * norms[i])
+            if score > 0.0:
+                out.append((self.items[i], score))
+        return out
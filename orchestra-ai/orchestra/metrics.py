@@ -0,0 +1,317 @@
+"""In-process metrics.
+
+- CallRecord: one row per LLMClient call (latency, TTFT, tokens, cache tier, agent, route)
+- Histogram: fixed-bucket histogram (Prometheus style) with interpolated quantiles
+- Metrics: aggregates records and counters, renders Prometheus text and appends every
+  call to a JSONL log so `orchestra stats` can summarize across processes
+
+Log lines are buffered and written by a background thread every `flush_interval_s` (and at
+exit), one O_APPEND write per batch, so a call never waits on the file. Once the log passes
+`log_max_bytes` it is renamed to `<log>.1` (replacing the previous one) and a new one started;
+`iter_records` streams both, oldest first.
+
+The route is the entry point that triggered the call ("/chat", "cli.chat", "pipeline", ...),
+set with `route_scope` and carried in a context variable.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers may rotate the log at the same time
+    fcntl = None
+
+current_route: ContextVar[str | None] = ContextVar("orchestra_route", default=None)
+
+@contextmanager
+def route_scope(route: str) -> Iterator[None]:
+    token = current_route.set(route)
+    try:
+        yield
+    finally:
+        current_route.reset(token)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+@dataclass
+class CallRecord:
+    agent: str | None
+    route: str | None
+    tier: str  # upstream | hot | disk | semantic | coalesced | cancelled
+    latency_s: float
+    ttft_s: float | None = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    stream: bool = False
+    ok: bool = True
+    ts: float = field(default_factory=time.time)
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        i = 0
+        while i < len(self.buckets) and v > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += v
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Linear interpolation inside the bucket holding the q-th observation."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c > 0:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lo
+                return lo + (self.buckets[i] - lo) * ((rank - seen) / c)
+            seen += c
+        return self.buckets[-1]
+
+def quantile(values: list[float], q: float) -> float | None:
+    """Exact nearest-rank quantile of `values`."""
+    if not values:
+        return None
+    s = sorted(values)
+    return s[min(len(s) - 1, max(0, math.ceil(q * len(s)) - 1))]
+
+def _esc(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(d: dict[str, Any]) -> str:
+    if not d:
+        return ""
+    return "{" + ",".join(f'{k}="{_esc(v)}"' for k, v in d.items()) + "}"
+
+# collector output: (name, type, help, labels, value)
+Sample = tuple[str, str, str, dict[str, Any], float]
+
+class Metrics:
+    def __init__(
+        self,
+        log_path: str | None = None,
+        log_max_bytes: int = 64 * 1024 * 1024,
+        flush_interval_s: float = 1.0,
+    ) -> None:
+        self.log_path = Path(log_path) if log_path else None
+        if self.log_path is not None:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self.log_max_bytes = log_max_bytes  # 0 = never rotate
+        self.flush_interval_s = flush_interval_s
+        self._lock = threading.Lock()
+        self._pending: list[str] = []  # log lines not yet written
+        self._flush_lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.latency: dict[tuple[str, str], Histogram] = {}
+        self.ttft: dict[str, Histogram] = {}
+        self.calls: dict[tuple[str, str, str], int] = {}
+        self.tokens: dict[tuple[str, str], int] = {}
+        self.counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+
+    def observe_call(self, rec: CallRecord) -> None:
+        agent = rec.agent or "-"
+        route = rec.route or "-"
+        with self._lock:
+            self.latency.setdefault((agent, rec.tier), Histogram()).observe(rec.latency_s)
+            if rec.ttft_s is not None:
+                self.ttft.setdefault(agent, Histogram()).observe(rec.ttft_s)
+            k = (agent, route, rec.tier if rec.ok else "error")
+            self.calls[k] = self.calls.get(k, 0) + 1
+            for kind, n in (("prompt", rec.prompt_tokens), ("completion", rec.completion_tokens)):
+                if n:
+                    self.tokens[(agent, kind)] = self.tokens.get((agent, kind), 0) + n
+            if self.log_path is not None:
+                self._pending.append(json.dumps(asdict(rec), ensure_ascii=False) + "\n")
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name="metrics-log", daemon=True)
+                    self._flusher.start()
+                    atexit.register(self.close)
+
+    # -- call log ------------------------------------------------------------
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval_s):
+            try:
+                self.flush()
+            except OSError:
+                pass  # disk full, log dir gone, ...: keep the lines for the next round
+
+    def flush(self) -> None:
+        """Write buffered log lines now."""
+        if self.log_path is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+            if not lines:
+                return
+            data = "".join(lines).encode("utf-8")
+            try:
+                fd = self._open_log(len(data))
+            except OSError:
+                with self._lock:
+                    self._pending[:0] = lines
+                raise
+            try:
+                # one O_APPEND write per batch, so several workers can share the file
+                os.write(fd, data)
+            finally:
+                os.close(fd)  # also drops the flock
+
+    def _open_log(self, size: int) -> int:
+        """fd of the log to append `size` bytes to, rotating it first if that would pass
+        `log_max_bytes`. Holds an exclusive flock so only one worker rotates."""
+        assert self.log_path is not None
+        while True:
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                st = os.fstat(fd)
+                if os.stat(self.log_path).st_ino != st.st_ino:
+                    os.close(fd)  # another worker rotated it while we waited for the lock
+                    continue
+            except FileNotFoundError:
+                os.close(fd)
+                continue
+            if not self.log_max_bytes or st.st_size == 0 or st.st_size + size <= self.log_max_bytes:
+                return fd
+            os.replace(self.log_path, self.log_path.with_name(self.log_path.name + ".1"))
+            os.close(fd)
+
+    def close(self) -> None:
+        """Stop the flush thread and write what is still buffered."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def counter(self, name: str, **labels: str) -> float:
+        with self._lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def add_collector(self, fn: Callable[[], Iterable[Sample]]) -> None:
+        """Register a callback that reports extra samples (e.g. cache gauges) at render time."""
+        self._collectors.append(fn)
+
+    def render_prometheus(self) -> str:
+        out: list[str] = []
+
+        def head(name: str, kind: str, help_: str) -> None:
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} {kind}")
+
+        def hist(name: str, help_: str, series: dict[Any, Histogram], label_names: tuple[str, ...]) -> None:
+            head(name, "histogram", help_)
+            for key, h in sorted(series.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                base = dict(zip(label_names, key))
+                cum = 0
+                for le, c in zip(list(h.buckets) + ["+Inf"], h.counts):
+                    cum += c
+                    out.append(f"{name}_bucket{_labels(base | {'le': le})} {cum}")
+                out.append(f"{name}_sum{_labels(base)} {h.sum}")
+                out.append(f"{name}_count{_labels(base)} {h.count}")
+
+        with self._lock:
+            hist("orchestra_llm_latency_seconds", "Wall latency of LLM calls.", self.latency, ("agent", "tier"))
+            hist("orchestra_llm_ttft_seconds", "Time to first token of streamed LLM calls.", self.ttft, ("agent",))
+            head("orchestra_llm_calls_total", "counter", "LLM calls by agent, route and cache tier.")
+            for (agent, route, tier), n in sorted(self.calls.items()):
+                out.append(f"orchestra_llm_calls_total{_labels({'agent': agent, 'route': route, 'tier': tier})} {n}")
+            head("orchestra_llm_tokens_total", "counter", "Upstream tokens by agent and kind.")
+            for (agent, kind), n in sorted(self.tokens.items()):
+                out.append(f"orchestra_llm_tokens_total{_labels({'agent': agent, 'kind': kind})} {n}")
+            seen: set[str] = set()
+            for (name, labels), v in sorted(self.counters.items()):
+                if name not in seen:
+                    head(name, "counter", name.replace("_", " "))
+                    seen.add(name)
+                out.append(f"{name}{_labels(dict(labels))} {v}")
+        for fn in self._collectors:
+            for name, kind, help_, labels, v in fn():
+                if v is None:
+                    continue
+                if name not in seen:
+                    head(name, kind, help_)
+                    seen.add(name)
+                out.append(f"{name}{_labels(labels)} {v}")
+        return "\n".join(out) + "\n"
+
+def iter_records(path: str) -> Iterator[dict[str, Any]]:
+    """Records of the call log and its rotated predecessor, oldest first, read line by line."""
+    p = Path(path)
+    for f in (p.with_name(p.name + ".1"), p):
+        try:
+            fh = f.open("r", encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            continue
+        with fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crashed worker
+
+_HIT_TIERS = frozenset({"hot", "disk", "semantic", "coalesced"})
+
+def summarize_by_agent(records: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """p50/p95/p99 latency (and TTFT when streamed) per agent, plus cache hit rate and tokens.
+    `records` is consumed once; only the numbers are kept, not the records."""
+    groups: dict[str, dict[str, Any]] = {}
+    for r in records:
+        g = groups.setdefault(r.get("agent") or "-", {"lat": [], "ttft": [], "hits": 0, "prompt": 0, "completion": 0})
+        g["lat"].append(float(r["latency_s"]))
+        if r.get("ttft_s") is not None:
+            g["ttft"].append(float(r["ttft_s"]))
+        g["hits"] += r.get("tier") in _HIT_TIERS
+        g["prompt"] += int(r.get("prompt_tokens", 0))
+        g["completion"] += int(r.get("completion_tokens", 0))
+    rows = []
+    for agent, g in sorted(groups.items()):
+        lat = g["lat"]
+        rows.append({
+            "agent": agent,
+            "calls": len(lat),
+            "p50": quantile(lat, 0.50),
+            "p95": quantile(lat, 0.95),
+            "p99": quantile(lat, 0.99),
+            "ttft_p50": quantile(g["ttft"], 0.50),
+            "cache_hit_rate": g["hits"] / len(lat),
+            "prompt_tokens": g["prompt"],
+            "completion_tokens": g["completion"],
+        })
+    return rows
@@ -6,6 +6,7 @@ from typing import Any
 
 from orchestra.agents.router import Router
 from orchestra.memory.session import SessionStore
+from orchestra.metrics import route_scope
 
 @dataclass
 class StepResult:
@@ -28,7 +29,10 @@ class PipelineRunner:
             for r in results:
                 prompt = prompt.replace(f"{{{{{r.name}}}}}", r.output)
             self.sessions.append(session_id, "user", f"[{name}] {prompt}")
-            out = self.router.run(prompt).text
-            self.sessions.append(session_id, "assistant", out)
+            with route_scope("pipeline"):
+                resp = self.router.run(prompt)
+            out = resp.text
+            meta = resp.meta or {}
+            self.sessions.append(session_id, "assistant", out, {"agent": meta.get("agent"), "route_source": meta.get("route_source")})
             results.append(StepResult(name=name, output=out))
         return results
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
+import json
+import uuid
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 from orchestra.bootstrap import bootstrap
+from orchestra.memory.vector import MemoryItem
+from orchestra.metrics import route_scope
 
 app = FastAPI(title="Orchestra AI", version="0.1.0")
 ctx = bootstrap()
@@ -17,17 +23,75 @@ class ChatOut(BaseModel):
     reply: str
     meta: dict
 
+class MemoryIn(BaseModel):
+    id: str = ""
+    text: str
+    meta: dict = {}
+
 @app.get("/health")
 def health():
     return {"ok": True}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of this worker's LLM call metrics."""
+    return ctx.metrics.render_prometheus()
+
 @app.get("/tools")
 def tools():
     return [t.__dict__ for t in ctx.tools.specs()]
 
+@app.get("/sessions")
+def sessions(cursor: str = "", limit: int = 100):
+    """Sessions ordered by id; pass `next_cursor` back as `cursor` for the next page."""
+    page, nxt = ctx.sessions.list_sessions(cursor, max(1, min(limit, 1000)))
+    return {"sessions": page, "next_cursor": nxt}
+
+@app.get("/sessions/{session_id}/messages")
+def session_messages(session_id: str, cursor: str = "", limit: int = 100):
+    """A session's messages in order, a page at a time."""
+    try:
+        page, nxt = ctx.sessions.messages(session_id, cursor, max(1, min(limit, 1000)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"session_id": session_id, "messages": page, "next_cursor": nxt}
+
 @app.post("/chat", response_model=ChatOut)
 def chat(payload: ChatIn):
-    ctx.sessions.append(payload.session_id, "user", payload.message)
-    resp = ctx.router.run(payload.message)
-    ctx.sessions.append(payload.session_id, "assistant", resp.text)
-    return ChatOut(session_id=payload.session_id, reply=resp.text, meta=resp.meta or {})
+    with route_scope("/chat"):
+        history = ctx.context.build(payload.session_id)
+        ctx.sessions.append(payload.session_id, "user", payload.message)
+        resp = ctx.router.run(payload.message, history.messages)
+    meta = resp.meta or {}
+    ctx.sessions.append(payload.session_id, "assistant", resp.text, {"agent": meta.get("agent"), "route_source": meta.get("route_source")})
+    meta = meta | {"context_tokens": history.tokens, "context_saved_tokens": history.full_tokens - history.tokens}
+    return ChatOut(session_id=payload.session_id, reply=resp.text, meta=meta)
+
+@app.post("/chat/stream")
+def chat_stream(payload: ChatIn):
+    """NDJSON stream: one `meta` line, then `delta` lines, then a final `done` line."""
+    with route_scope("/chat/stream"):
+        history = ctx.context.build(payload.session_id).messages
+        ctx.sessions.append(payload.session_id, "user", payload.message)
+        d, deltas = ctx.router.stream(payload.message, history)
+
+    def lines():
+        yield json.dumps({"type": "meta", "session_id": payload.session_id, "agent": d.agent, "route_reason": d.reason}) + "\n"
+        parts: list[str] = []
+        for delta in deltas:
+            parts.append(delta)
+            yield json.dumps({"type": "delta", "text": delta}, ensure_ascii=False) + "\n"
+        ctx.sessions.append(payload.session_id, "assistant", "".join(parts), {"agent": d.agent, "route_source": d.source})
+        yield json.dumps({"type": "done"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/memory")
+def memory_add(payload: MemoryIn):
+    item_id = payload.id or uuid.uuid4().hex
+    ctx.memory.add(MemoryItem(id=item_id, text=payload.text, meta=payload.meta))
+    return {"id": item_id}
+
+@app.get("/memory/search")
+def memory_search(q: str, k: int = 5):
+    return [{"id": it.id, "text": it.text, "meta": it.meta, "score": round(s, 4)} for it, s in ctx.memory.search(q, k=k)]
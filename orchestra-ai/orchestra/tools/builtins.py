@@ -1,17 +1,42 @@
 from __future__ import annotations
 
+import codecs
 import json
 import math
 import os
 import re
 from pathlib import Path
 from typing import Any
-from urllib.request import Request, urlopen
 
+from orchestra.tools.fetcher import HttpFetcher
+from orchestra.tools.fileindex import FileIndex
 from orchestra.tools.registry import ToolRegistry, ToolSpec
-
-def install_builtin_tools(reg: ToolRegistry, data_dir: str) -> None:
+from orchestra.tools.tabular import QueryError, run_query
+
+def _decode_window(raw: bytes, max_chars: int, final: bool) -> tuple[str, int]:
+    """Up to `max_chars` chars of UTF-8 from the start of `raw` (bad bytes become U+FFFD) and
+    how many bytes of `raw` they came from, so the next read can start right after them."""
+    def decode(b: bytes) -> tuple[str, int]:
+        dec = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        txt = dec.decode(b, final)
+        return txt, len(b) - len(dec.getstate()[0])  # bytes of a char cut off at the end aren't used
+
+    txt, used = decode(raw)
+    if len(txt) <= max_chars:
+        return txt, used
+    # the longest prefix of `raw` that decodes to at most max_chars chars
+    lo, hi = max_chars, len(raw)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if len(decode(raw[:mid])[0]) <= max_chars:
+            lo = mid
+        else:
+            hi = mid - 1
+    return decode(raw[:lo])
+
+def install_builtin_tools(reg: ToolRegistry, data_dir: str, fetcher: HttpFetcher | None = None) -> None:
     base = Path(data_dir).resolve()
+    fetcher = fetcher or HttpFetcher()
     (base / "files").mkdir(parents=True, exist_ok=True)
 
     # Calculator (safe-ish)
@@ -19,6 +44,7 @@ def install_builtin_tools(reg: ToolRegistry, data_dir: str) -> None:
         name="calc",
         description="Evaluate a simple math expression (numbers, + - * / ^, parentheses).",
         schema={"type":"object","properties":{"expr":{"type":"string"}},"required":["expr"]},
+        pure=True,
     )
 
     def calc(args: dict) -> Any:
@@ -36,6 +62,38 @@ def install_builtin_tools(reg: ToolRegistry, data_dir: str) -> None:
 
     reg.register(calc_spec, calc)
 
+    # Table queries over CSV/JSONL in the sandbox (streamed; only the result goes to the model)
+    table_spec = ToolSpec(
+        name="table_query",
+        description=(
+            "Filter/group/aggregate a CSV, TSV or JSONL file under ./data/files without reading it into the prompt. "
+            "Args: path, where [{col, op (= != < <= > >= contains in), value}], group_by [cols], "
+            "aggregates [{fn (count sum avg min max), col, as}], columns [cols], order_by, desc, limit."
+        ),
+        schema={"type":"object","properties":{
+            "path":{"type":"string"},
+            "where":{"type":"array","default":[]},
+            "group_by":{"type":"array","default":[]},
+            "aggregates":{"type":"array","default":[]},
+            "columns":{"type":"array","default":[]},
+            "order_by":{"type":"string"},
+            "desc":{"type":"boolean","default":False},
+            "limit":{"type":"integer","default":20},
+        },"required":["path"]},
+        timeout_s=120.0,  # scans whole files; large exports take longer than the default
+    )
+
+    def table_query(args: dict) -> Any:
+        p = _safe_path(str(args.get("path","")))
+        if not p.is_file():
+            return {"error":"Not found"}
+        try:
+            return run_query(p, args)
+        except QueryError as e:
+            return {"error": str(e)}
+
+    reg.register(table_spec, table_query)
+
     # HTTP GET (read-only)
     http_spec = ToolSpec(
         name="http_get",
@@ -48,10 +106,18 @@ def install_builtin_tools(reg: ToolRegistry, data_dir: str) -> None:
         max_chars = int(args.get("max_chars", 2000))
         if not (url.startswith("http://") or url.startswith("https://")):
             return {"error":"URL must start with http:// or https://"}
-        req = Request(url, headers={"User-Agent":"orchestra-ai/0.1"})
-        with urlopen(req, timeout=10) as resp:
-            data = resp.read(max(0, min(max_chars, 20000)))
-        return {"status": 200, "text": data.decode("utf-8", errors="replace")}
+        # pooled keep-alive connections + HTTP-semantics cache (see orchestra/tools/fetcher.py)
+        try:
+            res = fetcher.get(url)
+        except ValueError as e:  # redirected off http(s)
+            return {"error": str(e)}
+        return {
+            "status": res.status,
+            "url": res.url,
+            "cache": res.cache,
+            "ms": round(res.total_s * 1000, 1),
+            "text": res.text(max(0, min(max_chars, 20000))),
+        }
 
     reg.register(http_spec, http_get)
 
@@ -63,14 +129,20 @@ def install_builtin_tools(reg: ToolRegistry, data_dir: str) -> None:
     )
     read_spec = ToolSpec(
         name="file_read",
-        description="Read a text file under ./data/files (sandboxed).",
-        schema={"type":"object","properties":{"path":{"type":"string"},"max_chars":{"type":"integer","default":4000}},"required":["path"]},
+        description="Read a text file under ./data/files (sandboxed). Use offset/next_offset to page through large files.",
+        schema={"type":"object","properties":{"path":{"type":"string"},"offset":{"type":"integer","default":0},"max_chars":{"type":"integer","default":4000}},"required":["path"]},
     )
     list_spec = ToolSpec(
         name="file_list",
-        description="List files under ./data/files (sandboxed).",
-        schema={"type":"object","properties":{"prefix":{"type":"string","default":""}},"required":[]},
+        description="List files under a directory (prefix) of ./data/files (sandboxed), a page at a time; pass next_cursor back as cursor.",
+        schema={"type":"object","properties":{"prefix":{"type":"string","default":""},"cursor":{"type":"string","default":""},"limit":{"type":"integer","default":200}},"required":[]},
+    )
+    search_spec = ToolSpec(
+        name="file_search",
+        description="Full-text search over text files under ./data/files (sandboxed), optionally only under directory prefix; returns paths ranked by relevance with the first matching line.",
+        schema={"type":"object","properties":{"query":{"type":"string"},"prefix":{"type":"string","default":""},"limit":{"type":"integer","default":10}},"required":["query"]},
     )
+    index = FileIndex(base / "files", base / "file_index.sqlite3")
 
     def _safe_path(rel: str) -> Path:
         rel = rel.strip().lstrip("/").replace("..","")
@@ -83,36 +155,66 @@ def install_builtin_tools(reg: ToolRegistry, data_dir: str) -> None:
         p = _safe_path(str(args.get("path","")))
         p.parent.mkdir(parents=True, exist_ok=True)
         p.write_text(str(args.get("content","")), encoding="utf-8")
+        index.update(p)
         return {"ok": True, "path": str(p)}
 
     def file_read(args: dict) -> Any:
         p = _safe_path(str(args.get("path","")))
-        if not p.exists():
+        if not p.is_file():
             return {"error":"Not found"}
-        max_chars = int(args.get("max_chars", 4000))
-        txt = p.read_text(encoding="utf-8", errors="replace")
-        return {"path": str(p), "text": txt[:max_chars]}
+        offset = max(0, int(args.get("offset", 0)))
+        max_chars = max(1, int(args.get("max_chars", 4000)))
+        size = p.stat().st_size
+        # read only the requested window: a char takes 1 to 4 bytes (a byte that isn't UTF-8
+        # becomes one U+FFFD)
+        with p.open("rb") as f:
+            f.seek(offset)
+            raw = f.read(max_chars * 4)
+        txt, used = _decode_window(raw, max_chars, final=offset + len(raw) >= size)
+        end = offset + max(used, 1)  # always move forward
+        return {
+            "path": str(p),
+            "offset": offset,
+            "size": size,
+            "next_offset": end if end < size else None,
+            "text": txt,
+        }
+
+    def _dir_prefix(raw: str) -> str:
+        """`raw` as a directory under ./data/files ("" = all of it, a file = its directory),
+        with a trailing slash, so "docs" doesn't also match "docs2/"."""
+        raw = raw.strip().lstrip("/").replace("..","")
+        if not raw:
+            return ""
+        root = (base / "files").resolve()
+        d = _safe_path(raw)
+        if d.is_file():
+            d = d.parent
+        rel = d.relative_to(root).as_posix() if d != root else ""
+        return rel + "/" if rel else ""
 
     def file_list(args: dict) -> Any:
-        prefix = str(args.get("prefix","")).strip().lstrip("/").replace("..","")
-        start = _safe_path(prefix) if prefix else (base / "files").resolve()
-        if start.is_file():
-            start = start.parent
-        out = []
-        for fp in sorted(start.rglob("*")):
-            if fp.is_file():
-                out.append(str(fp.relative_to((base / "files").resolve())))
-        return {"files": out}
+        prefix = _dir_prefix(str(args.get("prefix","")))
+        limit = max(1, min(int(args.get("limit", 200)), 1000))
+        files, cursor = index.list(prefix, str(args.get("cursor","")), limit)
+        return {"files": [f["path"] for f in files], "next_cursor": cursor}
+
+    def file_search(args: dict) -> Any:
+        prefix = _dir_prefix(str(args.get("prefix","")))
+        limit = max(1, min(int(args.get("limit", 10)), 100))
+        return {"results": index.search(str(args.get("query","")), limit, prefix)}
 
     reg.register(write_spec, file_write)
     reg.register(read_spec, file_read)
     reg.register(list_spec, file_list)
+    reg.register(search_spec, file_search)
 
     # Text utils
     summarize_spec = ToolSpec(
         name="text_stats",
         description="Return basic statistics about a text (chars, words, lines).",
         schema={"type":"object","properties":{"text":{"type":"string"}},"required":["text"]},
+        pure=True,
     )
     def text_stats(args: dict) -> Any:
         t = str(args.get("text",""))
@@ -0,0 +1,243 @@
+"""Pooled, caching HTTP GET for the `http_get` tool.
+
+- keep-alive connections pooled per (scheme, host, port), with a per-host cap on open connections
+- an on-disk response cache (DiskCache) that honours Cache-Control (no-store, no-cache, max-age),
+  Expires, and revalidates stale entries with If-None-Match / If-Modified-Since, so a repeated
+  fetch costs a 304 or nothing
+- redirects followed up to `max_redirects`, with connect / first byte / download timings per hop
+
+Responses with no freshness information are reused for `default_ttl_s` (0 = always revalidate).
+The cache ignores Vary: every request is sent with the same fixed headers.
+"""
+
+from __future__ import annotations
+
+import email.utils
+import http.client
+import json
+import ssl
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any
+from urllib.parse import urljoin, urlsplit
+
+from orchestra.llm.cache import DiskCache
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+_SCHEMES = ("http", "https")
+_USER_AGENT = "orchestra-ai/0.1"
+
+@dataclass
+class Hop:
+    url: str
+    status: int
+    reused: bool  # went over a pooled keep-alive connection
+    connect_s: float
+    ttfb_s: float
+    download_s: float
+
+@dataclass
+class FetchResult:
+    url: str  # final URL after redirects
+    status: int
+    body: bytes
+    headers: dict[str, str]
+    cache: str  # miss | hit | revalidated
+    hops: list[Hop] = field(default_factory=list)
+    total_s: float = 0.0
+
+    def text(self, max_chars: int | None = None) -> str:
+        t = self.body.decode("utf-8", errors="replace")
+        return t if max_chars is None else t[:max_chars]
+
+    def timings(self) -> dict[str, Any]:
+        return {"total_s": round(self.total_s, 4), "hops": [asdict(h) for h in self.hops]}
+
+def _cache_control(headers: dict[str, str]) -> dict[str, str | None]:
+    out: dict[str, str | None] = {}
+    for part in headers.get("cache-control", "").split(","):
+        k, _, v = part.strip().partition("=")
+        if k:
+            out[k.lower()] = v.strip('"') or None
+    return out
+
+def _http_date(v: str | None) -> float | None:
+    if not v:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(v).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+class _HostPool:
+    def __init__(self, limit: int) -> None:
+        self.slots = threading.BoundedSemaphore(limit)
+        self.idle: list[http.client.HTTPConnection] = []
+        self.lock = threading.Lock()
+
+class HttpFetcher:
+    def __init__(
+        self,
+        cache: DiskCache | None = None,
+        per_host: int = 4,
+        max_redirects: int = 5,
+        timeout_s: float = 10.0,
+        max_bytes: int = 1 << 20,
+        default_ttl_s: float = 300.0,
+    ) -> None:
+        self.cache = cache
+        self.per_host = per_host
+        self.max_redirects = max_redirects
+        self.timeout_s = timeout_s
+        self.max_bytes = max_bytes
+        self.default_ttl_s = default_ttl_s
+        self._pools: dict[tuple[str, str, int], _HostPool] = {}
+        self._lock = threading.Lock()
+        self._ssl = ssl.create_default_context()
+
+    # -- connections -------------------------------------------------------
+
+    def _pool(self, key: tuple[str, str, int]) -> _HostPool:
+        with self._lock:
+            p = self._pools.get(key)
+            if p is None:
+                p = self._pools[key] = _HostPool(self.per_host)
+            return p
+
+    def _connect(self, key: tuple[str, str, int]) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout_s, context=self._ssl)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout_s)
+
+    def _request(self, url: str, headers: dict[str, str]) -> tuple[int, dict[str, str], bytes, Hop]:
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        key = (scheme, parts.hostname or "", parts.port or (443 if scheme == "https" else 80))
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        pool = self._pool(key)
+        if not pool.slots.acquire(timeout=self.timeout_s):
+            raise TimeoutError(f"no free connection to {key[1]} within {self.timeout_s:g}s")
+        try:
+            for attempt in range(2):
+                with pool.lock:
+                    conn = pool.idle.pop() if pool.idle else None
+                reused = conn is not None
+                t0 = time.perf_counter()
+                try:
+                    if conn is None:
+                        conn = self._connect(key)
+                        conn.connect()
+                    t1 = time.perf_counter()
+                    conn.request("GET", path, headers=headers)
+                    resp = conn.getresponse()
+                    t2 = time.perf_counter()
+                    body = resp.read(self.max_bytes + 1)
+                    t3 = time.perf_counter()
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    conn.close()
+                    if reused and attempt == 0:
+                        continue  # the server dropped an idle keep-alive connection; redial once
+                    raise
+                except BaseException:
+                    conn.close()
+                    raise
+                truncated = len(body) > self.max_bytes
+                if truncated or resp.will_close or not resp.isclosed():
+                    conn.close()  # unread body or server-side close: not reusable
+                else:
+                    with pool.lock:
+                        pool.idle.append(conn)
+                hdrs = {k.lower(): v for k, v in resp.getheaders()}
+                if truncated:
+                    hdrs["x-orchestra-truncated"] = "1"
+                hop = Hop(url, resp.status, reused, t1 - t0, t2 - t1, t3 - t2)
+                return resp.status, hdrs, body[: self.max_bytes], hop
+            raise RuntimeError("unreachable")
+        finally:
+            pool.slots.release()
+
+    # -- cache -------------------------------------------------------------
+
+    def _fresh_until(self, headers: dict[str, str], now: float) -> float:
+        cc = _cache_control(headers)
+        if "no-cache" in cc:
+            return now
+        if cc.get("max-age") is not None:
+            try:
+                return now + max(0.0, float(cc["max-age"]) - float(headers.get("age", "0") or 0))
+            except ValueError:
+                return now
+        expires = _http_date(headers.get("expires"))
+        if expires is not None:
+            date = _http_date(headers.get("date")) or now
+            return now + max(0.0, expires - date)
+        return now + self.default_ttl_s
+
+    def _store(self, url: str, status: int, headers: dict[str, str], body: bytes) -> None:
+        if self.cache is None or status != 200 or "x-orchestra-truncated" in headers:
+            return
+        cc = _cache_control(headers)
+        if "no-store" in cc or "private" in cc:
+            return
+        now = time.time()
+        entry = {
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k in ("content-type", "etag", "last-modified", "cache-control")},
+            "body": body.decode("latin-1"),  # lossless bytes <-> str
+            "fresh_until": self._fresh_until(headers, now),
+        }
+        self.cache.set({"url": url}, json.dumps(entry))
+
+    def _cached(self, url: str) -> dict[str, Any] | None:
+        if self.cache is None:
+            return None
+        raw = self.cache.get({"url": url})
+        return json.loads(raw) if raw is not None else None
+
+    # -- public ------------------------------------------------------------
+
+    def get(self, url: str) -> FetchResult:
+        t0 = time.perf_counter()
+        hops: list[Hop] = []
+        for _ in range(self.max_redirects + 1):
+            # checked on every hop: a redirect must not lead to file:, ftp:, ... either
+            if urlsplit(url).scheme.lower() not in _SCHEMES:
+                raise ValueError(f"unsupported URL scheme in {url!r} (http, https)")
+            entry = self._cached(url)
+            headers = {"User-Agent": _USER_AGENT, "Accept-Encoding": "identity"}
+            if entry is not None:
+                if time.time() < entry["fresh_until"]:
+                    body = entry["body"].encode("latin-1")
+                    return FetchResult(url, entry["status"], body, entry["headers"], "hit", hops, time.perf_counter() - t0)
+                if "etag" in entry["headers"]:
+                    headers["If-None-Match"] = entry["headers"]["etag"]
+                if "last-modified" in entry["headers"]:
+                    headers["If-Modified-Since"] = entry["headers"]["last-modified"]
+
+            status, resp_headers, body, hop = self._request(url, headers)
+            hops.append(hop)
+            if status == 304 and entry is not None:
+                # refresh stored validators/freshness from the 304, keep the stored body
+                fresh = ("etag", "last-modified", "cache-control", "expires", "date", "age")
+                merged = entry["headers"] | {k: v for k, v in resp_headers.items() if k in fresh}
+                body = entry["body"].encode("latin-1")
+                self._store(url, 200, merged, body)
+                return FetchResult(url, 200, body, merged, "revalidated", hops, time.perf_counter() - t0)
+            if status in _REDIRECTS and "location" in resp_headers:
+                url = urljoin(url, resp_headers["location"])
+                continue
+            self._store(url, status, resp_headers, body)
+            return FetchResult(url, status, body, resp_headers, "miss", hops, time.perf_counter() - t0)
+        raise RuntimeError(f"more than {self.max_redirects} redirects")
+
+    def close(self) -> None:
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for p in pools:
+            with p.lock:
+                for c in p.idle:
+                    c.close()
+                p.idle.clear()
@@ -0,0 +1,275 @@
+"""Index of the file sandbox (one SQLite file, WAL mode).
+
+- files: every file under the root, keyed by relative POSIX path, so listings are a keyset
+  page over the primary key instead of a sorted rglob of the whole tree
+- dirs: directory mtimes; `refresh` only re-lists directories whose mtime moved (an entry was
+  added or removed), so a rescan costs one stat per directory rather than one per file
+- postings: an inverted index (term -> path, term frequency) over text files for `search`
+
+`refresh` only records path, size and mtime, so listing a cold multi-GB tree costs a stat per
+file, not a read. New or changed files are marked pending (`terms` = -1) and their content is
+indexed by the next `search` that covers them, in batches committed as they go, so a search
+cut off by its timeout keeps the progress it made.
+
+`file_write` calls `update` directly; changes made outside the tools are picked up by the next
+`refresh`. In-place edits that don't touch the directory are re-indexed on their next write.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from orchestra.memory.vector import _tokenize
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, dir TEXT NOT NULL, size INTEGER NOT NULL, mtime REAL NOT NULL, terms INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, parent TEXT, mtime REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, path TEXT NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (term, path)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_path ON postings(path);
+"""
+
+# upper bound for "starts with" range scans
+_HI = "\U0010ffff"
+# files whose content is indexed per transaction by `search`
+_INDEX_BATCH = 64
+# files.terms of a file whose content isn't indexed yet
+_PENDING = -1
+
+def _dir_key(rel: str) -> str:
+    return "" if rel == "." else rel
+
+class FileIndex:
+    def __init__(
+        self,
+        root: Path,
+        db_path: Path,
+        max_index_bytes: int = 8 * 1024 * 1024,
+        refresh_interval_s: float = 2.0,
+    ) -> None:
+        self.root = Path(root).resolve()
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_index_bytes = max_index_bytes
+        self.refresh_interval_s = refresh_interval_s
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _rel(self, p: Path) -> str:
+        return p.resolve().relative_to(self.root).as_posix()
+
+    # -- content -----------------------------------------------------------
+
+    def _index_content(self, conn: sqlite3.Connection, rel: str, p: Path, size: int) -> int:
+        conn.execute("DELETE FROM postings WHERE path = ?", (rel,))
+        if size > self.max_index_bytes:
+            return 0
+        with p.open("rb") as f:
+            data = f.read(self.max_index_bytes)
+        if b"\x00" in data[:8192]:
+            return 0  # binary
+        tf: dict[str, int] = {}
+        for t in _tokenize(data.decode("utf-8", errors="replace")):
+            if len(t) <= 64:
+                tf[t] = tf.get(t, 0) + 1
+        conn.executemany("INSERT INTO postings(term, path, tf) VALUES (?, ?, ?)", [(t, rel, n) for t, n in tf.items()])
+        return len(tf)
+
+    def update(self, p: Path) -> None:
+        """(Re)index one file after it was written."""
+        rel = self._rel(p)
+        st = p.stat()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            terms = self._index_content(conn, rel, p, st.st_size)
+            conn.execute(
+                "INSERT OR REPLACE INTO files(path, dir, size, mtime, terms) VALUES (?, ?, ?, ?, ?)",
+                (rel, rel.rpartition("/")[0], st.st_size, st.st_mtime, terms),
+            )
+            self._note_dirs(conn, p.parent)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _note_dirs(self, conn: sqlite3.Connection, d: Path) -> None:
+        # make sure a freshly created directory chain is known; mtime 0 forces the next
+        # refresh to list it once
+        while True:
+            rel = _dir_key(self._rel(d)) if d != self.root else ""
+            parent = None if d == self.root else (_dir_key(self._rel(d.parent)) if d.parent != self.root else "")
+            if conn.execute("SELECT 1 FROM dirs WHERE path = ?", (rel,)).fetchone():
+                return
+            conn.execute("INSERT INTO dirs(path, parent, mtime) VALUES (?, ?, 0)", (rel, parent))
+            if d == self.root:
+                return
+            d = d.parent
+
+    # -- directory scan ----------------------------------------------------
+
+    def refresh(self, force: bool = False) -> None:
+        """Bring the index in line with the disk, re-listing only directories that changed."""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval_s:
+            return
+        with self._refresh_lock:
+            if not force and time.monotonic() - self._refreshed_at < self.refresh_interval_s:
+                return
+            conn = self._conn()
+            stack = [self.root]
+            while stack:
+                d = stack.pop()
+                rel = _dir_key(self._rel(d)) if d != self.root else ""
+                try:
+                    mtime = d.stat().st_mtime
+                except FileNotFoundError:
+                    self._drop_dir(conn, rel)
+                    continue
+                row = conn.execute("SELECT mtime FROM dirs WHERE path = ?", (rel,)).fetchone()
+                if row is not None and row[0] == mtime:
+                    stack.extend(self.root / c for (c,) in conn.execute("SELECT path FROM dirs WHERE parent = ?", (rel,)))
+                    continue
+                stack.extend(self._rescan_dir(conn, d, rel, mtime))
+            self._refreshed_at = time.monotonic()
+
+    def _rescan_dir(self, conn: sqlite3.Connection, d: Path, rel: str, mtime: float) -> list[Path]:
+        prefix = f"{rel}/" if rel else ""
+        subdirs: list[Path] = []
+        seen: dict[str, os.stat_result] = {}
+        with os.scandir(d) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    subdirs.append(Path(e.path))
+                elif e.is_file(follow_symlinks=False):
+                    seen[prefix + e.name] = e.stat()
+        known = {
+            p: (size, mt)
+            for p, size, mt in conn.execute("SELECT path, size, mtime FROM files WHERE dir = ?", (rel,))
+        }
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for p in known.keys() - seen.keys():
+                conn.execute("DELETE FROM files WHERE path = ?", (p,))
+                conn.execute("DELETE FROM postings WHERE path = ?", (p,))
+            for p, st in seen.items():
+                if known.get(p) == (st.st_size, st.st_mtime):
+                    continue
+                conn.execute("DELETE FROM postings WHERE path = ?", (p,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO files(path, dir, size, mtime, terms) VALUES (?, ?, ?, ?, ?)",
+                    (p, rel, st.st_size, st.st_mtime, _PENDING),
+                )
+            sub_rels = {prefix + s.name for s in subdirs}
+            for (old,) in conn.execute("SELECT path FROM dirs WHERE parent = ?", (rel,)).fetchall():
+                if old not in sub_rels:
+                    self._drop_dir(conn, old)
+            for s in sub_rels:
+                conn.execute("INSERT OR IGNORE INTO dirs(path, parent, mtime) VALUES (?, ?, -1)", (s, rel))
+            conn.execute(
+                "INSERT OR REPLACE INTO dirs(path, parent, mtime) VALUES (?, (SELECT parent FROM dirs WHERE path = ?), ?)",
+                (rel, rel, mtime),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return subdirs
+
+    def _index_pending(self, prefix: str = "") -> None:
+        """Index the content of pending files under `prefix`."""
+        conn = self._conn()
+        while True:
+            rows = conn.execute(
+                "SELECT path, size, mtime FROM files WHERE terms = ? AND path >= ? AND path < ? ORDER BY path LIMIT ?",
+                (_PENDING, prefix, prefix + _HI, _INDEX_BATCH),
+            ).fetchall()
+            if not rows:
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for rel, size, mtime in rows:
+                    try:
+                        terms = self._index_content(conn, rel, self.root / rel, size)
+                    except OSError:
+                        terms = 0  # gone or unreadable; the next refresh sorts it out
+                    # unless a refresh saw it change meanwhile (then it is pending again)
+                    conn.execute("UPDATE files SET terms = ? WHERE path = ? AND mtime = ?", (terms, rel, mtime))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _drop_dir(self, conn: sqlite3.Connection, rel: str) -> None:
+        lo, hi = f"{rel}/", f"{rel}/" + _HI
+        conn.execute("DELETE FROM postings WHERE path IN (SELECT path FROM files WHERE path >= ? AND path < ?)", (lo, hi))
+        conn.execute("DELETE FROM files WHERE path >= ? AND path < ?", (lo, hi))
+        conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (rel, lo, hi))
+
+    # -- queries -----------------------------------------------------------
+
+    def list(self, prefix: str = "", cursor: str = "", limit: int = 200) -> tuple[list[dict[str, Any]], str | None]:
+        """One page of files whose relative path starts with `prefix`, after `cursor`."""
+        self.refresh()
+        lo = max(prefix, cursor)
+        op = ">" if cursor and cursor >= prefix else ">="
+        rows = self._conn().execute(
+            f"SELECT path, size FROM files WHERE path {op} ? AND path < ? ORDER BY path LIMIT ?",
+            (lo, prefix + _HI, limit + 1),
+        ).fetchall()
+        page = [{"path": p, "size": s} for p, s in rows[:limit]]
+        return page, (page[-1]["path"] if len(rows) > limit else None)
+
+    def search(self, query: str, limit: int = 10, prefix: str = "") -> list[dict[str, Any]]:
+        """Files ranked by tf-idf over the query terms."""
+        self.refresh()
+        terms = sorted(set(_tokenize(query)))
+        if not terms:
+            return []
+        self._index_pending(prefix)
+        conn = self._conn()
+        n_docs = conn.execute("SELECT COUNT(*) FROM files WHERE terms > 0").fetchone()[0] or 1
+        scores: dict[str, float] = {}
+        for t in terms:
+            rows = conn.execute(
+                "SELECT path, tf FROM postings WHERE term = ? AND path >= ? AND path < ?",
+                (t, prefix, prefix + _HI),
+            ).fetchall()
+            if not rows:
+                continue
+            idf = math.log(1.0 + n_docs / len(rows))
+            for p, tf in rows:
+                scores[p] = scores.get(p, 0.0) + (1.0 + math.log(tf)) * idf
+        best = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+        return [{"path": p, "score": round(s, 4)} | self._snippet(p, terms) for p, s in best]
+
+    def _snippet(self, rel: str, terms: list[str], max_lines: int = 100_000) -> dict[str, Any]:
+        want = set(terms)
+        try:
+            with (self.root / rel).open("r", encoding="utf-8", errors="replace") as f:
+                for i, line in enumerate(f, 1):
+                    if i > max_lines:
+                        break
+                    if want.intersection(_tokenize(line)):
+                        return {"line": i, "snippet": line.strip()[:200]}
+        except OSError:
+            pass
+        return {}
@@ -1,27 +1,279 @@
+"""Tool registry.
+
+Tools may be plain functions or coroutines. Every call runs on one background event loop:
+async tools run there directly, sync tools on a bounded thread pool. Per tool the registry keeps
+
+- an argument validator compiled from the spec's schema at registration
+- a timeout and a concurrency limit, so one slow tool (say `http_get` against a dead host)
+  can't take every worker from fast ones like `calc`; the timeout covers waiting for one of
+  the tool's slots as well as the run
+- call/error/timeout counts and a latency histogram (exported through `samples`)
+
+Successful results of pure or TTL'd tools are memoized in an optional DiskCache, read and
+written on the loop's default executor so a slow SQLite lock never stalls the loop itself.
+"""
+
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Callable, Any
+import asyncio
+import inspect
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable
+
+from orchestra.llm.cache import DiskCache
+from orchestra.llm.tool_parser import compile_args
+from orchestra.metrics import Histogram, Sample
 
 @dataclass(frozen=True)
 class ToolSpec:
     name: str
     description: str
     schema: dict
+    # memoization: pure tools are cached forever, others for cache_ttl seconds (None = never)
+    pure: bool = False
+    cache_ttl: float | None = None
+    # None = the registry-wide defaults
+    timeout_s: float | None = None
+    max_concurrency: int | None = None
+
+@dataclass
+class ToolStats:
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    invalid: int = 0
+    cache_hits: int = 0
+    in_flight: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+
+@dataclass
+class _Tool:
+    spec: ToolSpec
+    fn: Callable[[dict], Any]
+    is_async: bool
+    validate: Callable[[dict], tuple[dict, list[str]]]
+    timeout_s: float
+    max_concurrency: int
+    stats: ToolStats = field(default_factory=ToolStats)
+    sem: asyncio.Semaphore | None = None  # created on the registry loop
+
+@dataclass
+class ToolJob:
+    """A submitted tool call; pass it to `ToolRegistry.wait` for the result."""
+    name: str
+    future: Future
+
+# extra time `call` / `wait` give a job past its tool's timeout (cache lookups, scheduling)
+# before giving up on it
+_RESULT_MARGIN_S = 5.0
+
+def _ok(res: Any) -> bool:
+    return not (isinstance(res, dict) and "error" in res)
+
+def _consume(f: asyncio.Future) -> None:
+    # a sync tool that outlived its timeout (or a background cache write) may fail later;
+    # mark the exception retrieved
+    if not f.cancelled():
+        f.exception()
 
 class ToolRegistry:
-    def __init__(self) -> None:
-        self._tools: dict[str, tuple[ToolSpec, Callable[[dict], Any]]] = {}
+    def __init__(
+        self,
+        max_workers: int = 8,
+        timeout_s: float = 15.0,
+        cache: DiskCache | None = None,
+        per_tool_concurrency: int = 4,
+    ) -> None:
+        self._tools: dict[str, _Tool] = {}
+        self.cache = cache
+        self.max_workers = max_workers
+        self.timeout_s = timeout_s
+        self.per_tool_concurrency = per_tool_concurrency
+        self._pool: ThreadPoolExecutor | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._start_lock = threading.Lock()
 
-    def register(self, spec: ToolSpec, fn: Callable[[dict], Any]) -> None:
+    def register(self, spec: ToolSpec, fn: Callable[[dict], Any] | Callable[[dict], Awaitable[Any]]) -> None:
         if spec.name in self._tools:
             raise ValueError(f"Tool already registered: {spec.name}")
-        self._tools[spec.name] = (spec, fn)
+        self._tools[spec.name] = _Tool(
+            spec=spec,
+            fn=fn,
+            is_async=inspect.iscoroutinefunction(fn),
+            validate=compile_args(spec.schema or {}),
+            timeout_s=spec.timeout_s if spec.timeout_s is not None else self.timeout_s,
+            max_concurrency=max(1, spec.max_concurrency or self.per_tool_concurrency),
+        )
 
     def specs(self) -> list[ToolSpec]:
-        return [v[0] for v in self._tools.values()]
+        return [t.spec for t in self._tools.values()]
 
-    def call(self, name: str, args: dict) -> Any:
-        if name not in self._tools:
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="tool-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def close(self) -> None:
+        with self._start_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+    async def _run(self, tool: _Tool, args: dict) -> Any:
+        """Runs on the registry loop, inside the caller's timeout (which covers the wait for
+        a slot as well as the run)."""
+        loop = asyncio.get_running_loop()
+        if tool.sem is None:
+            tool.sem = asyncio.Semaphore(tool.max_concurrency)
+        await tool.sem.acquire()
+        tool.stats.in_flight += 1
+
+        def release(_: Any = None) -> None:
+            tool.stats.in_flight -= 1
+            tool.sem.release()
+
+        t0 = time.perf_counter()
+        if tool.is_async:
+            try:
+                return await tool.fn(args)
+            finally:
+                tool.stats.latency.observe(time.perf_counter() - t0)
+                release()
+        # a thread can't be interrupted: on timeout the caller gets an error right away, but
+        # the tool keeps its concurrency slot until the thread really returns; later calls then
+        # time out waiting for a slot instead of queueing forever
+        fut = loop.run_in_executor(self._pool, tool.fn, args)
+        fut.add_done_callback(release)
+        fut.add_done_callback(_consume)
+        try:
+            return await asyncio.shield(fut)
+        finally:
+            tool.stats.latency.observe(time.perf_counter() - t0)
+
+    async def _acall(self, name: str, args: dict) -> Any:
+        tool = self._tools.get(name)
+        if tool is None:
             raise KeyError(f"Unknown tool: {name}")
-        return self._tools[name][1](args)
+        st = tool.stats
+        st.calls += 1
+        args, errors = tool.validate(args)
+        if errors:
+            st.invalid += 1
+            return {"error": f"invalid args for {name}: " + "; ".join(errors)}
+
+        spec = tool.spec
+        cacheable = self.cache is not None and (spec.pure or bool(spec.cache_ttl))
+        # the cache key hashes sorted-key JSON of the coerced args, so equivalent calls share it
+        key = {"tool": name, "args": args}
+        loop = asyncio.get_running_loop()
+        if cacheable:
+            hit = await loop.run_in_executor(None, self.cache.get, key)
+            if hit is not None:
+                st.cache_hits += 1
+                return json.loads(hit)
+        try:
+            res = await asyncio.wait_for(self._run(tool, args), tool.timeout_s)
+        except asyncio.TimeoutError:
+            st.timeouts += 1
+            return {"error": f"{name} timed out after {tool.timeout_s:g}s"}
+        except Exception:
+            st.errors += 1
+            raise
+        if not _ok(res):
+            st.errors += 1
+        elif cacheable:  # errors may be transient (e.g. network); always retry them
+            try:
+                raw = json.dumps(res)
+            except (TypeError, ValueError):
+                return res  # not JSON-serializable; just don't memoize
+            # written in the background: the caller doesn't wait for the SQLite commit
+            done = loop.run_in_executor(None, lambda: self.cache.set(key, raw, ttl=0 if spec.pure else spec.cache_ttl))
+            done.add_done_callback(_consume)
+        return res
+
+    async def acall(self, name: str, args: dict) -> Any:
+        """Call a tool from any event loop."""
+        fut = asyncio.run_coroutine_threadsafe(self._acall(name, args), self._ensure_loop())
+        return await asyncio.wrap_future(fut)
+
+    def call(self, name: str, args: dict) -> Any:
+        """Blocking call; raises concurrent.futures.TimeoutError if the job outlives its tool's timeout."""
+        job = self.submit(name, args)
+        try:
+            return job.future.result(timeout=self._result_timeout(name))
+        except FutureTimeoutError:  # not the builtin TimeoutError before 3.11
+            job.future.cancel()
+            raise
+
+    def _result_timeout(self, name: str) -> float:
+        tool = self._tools.get(name)
+        return (tool.timeout_s if tool is not None else self.timeout_s) + _RESULT_MARGIN_S
+
+    def submit(self, name: str, args: dict) -> ToolJob:
+        """Start a tool call without waiting for it."""
+        return ToolJob(name, asyncio.run_coroutine_threadsafe(self._acall(name, args), self._ensure_loop()))
+
+    def wait(self, job: ToolJob) -> Any:
+        """Result of a submitted call. Failures and timeouts come back as {"error": ...} instead
+        of raising, like the built-in tools report their own errors."""
+        try:
+            return job.future.result(timeout=self._result_timeout(job.name))
+        except FutureTimeoutError:  # not the builtin TimeoutError before 3.11
+            job.future.cancel()
+            return {"error": f"{job.name} timed out"}
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    def call_many(self, calls: list[tuple[str, dict]]) -> list[Any]:
+        """Run several tool calls concurrently and return their results in call order."""
+        jobs = [self.submit(name, args) for name, args in calls]
+        return [self.wait(j) for j in jobs]
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        out = {}
+        for name, t in self._tools.items():
+            st = t.stats
+            out[name] = {
+                "calls": st.calls,
+                "errors": st.errors,
+                "timeouts": st.timeouts,
+                "invalid": st.invalid,
+                "cache_hits": st.cache_hits,
+                "in_flight": st.in_flight,
+                "p50_s": st.latency.quantile(0.50),
+                "p95_s": st.latency.quantile(0.95),
+            }
+        return out
+
+    def samples(self) -> Iterable[Sample]:
+        """Metrics collector (see `Metrics.add_collector`)."""
+        stats = self.stats()
+        for name, s in stats.items():
+            yield ("orchestra_tool_calls_total", "counter", "Tool calls.", {"tool": name}, s["calls"])
+        for name, s in stats.items():
+            for outcome in ("errors", "timeouts", "invalid", "cache_hits"):
+                yield (
+                    "orchestra_tool_outcomes_total", "counter",
+                    "Tool calls that failed, timed out, had invalid args or hit the cache.",
+                    {"tool": name, "outcome": outcome}, s[outcome],
+                )
+        for name, s in stats.items():
+            yield ("orchestra_tool_in_flight", "gauge", "Tool calls running now.", {"tool": name}, s["in_flight"])
+        for name, s in stats.items():
+            for q in ("p50", "p95"):
+                yield (
+                    "orchestra_tool_latency_seconds", "gauge", "Tool run time quantiles.",
+                    {"tool": name, "quantile": q}, s[f"{q}_s"],
+                )
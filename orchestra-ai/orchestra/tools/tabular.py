@@ -0,0 +1,235 @@
+"""Streaming queries over CSV / JSONL files for the `table_query` tool.
+
+Rows are read one at a time and folded into the result, so memory is bounded by the number of
+groups (or by `limit` for top-k), not by file size. Only the small result table goes back to the
+model.
+
+Query shape (all keys optional except `path`):
+
+    {"where": [{"col": "region", "op": "=", "value": "EU"}],
+     "group_by": ["country"],
+     "aggregates": [{"fn": "sum", "col": "revenue"}, {"fn": "count"}],
+     "columns": ["name", "revenue"],          # plain selects when there's no aggregate
+     "order_by": "sum_revenue", "desc": true, "limit": 20}
+"""
+
+from __future__ import annotations
+
+import csv
+import heapq
+import json
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+_AGGS = ("count", "sum", "avg", "min", "max")
+_OPS = ("=", "!=", "<", "<=", ">", ">=", "contains", "in")
+MAX_LIMIT = 1000
+
+class QueryError(ValueError):
+    pass
+
+def _num(v: Any) -> float | None:
+    if isinstance(v, bool):
+        return float(v)
+    if isinstance(v, (int, float)):
+        return float(v)
+    if isinstance(v, str):
+        try:
+            f = float(v.replace(",", "")) if v.strip() else None
+        except ValueError:
+            return None
+        return f if f is not None and math.isfinite(f) else None
+    return None
+
+def iter_rows(path: Path) -> Iterator[dict[str, Any]]:
+    suffix = path.suffix.lower()
+    with path.open("r", encoding="utf-8", errors="replace", newline="") as f:
+        if suffix in (".jsonl", ".ndjson"):
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    obj = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(obj, dict):
+                    yield obj
+        else:
+            dialect = csv.excel_tab if suffix == ".tsv" else csv.excel
+            yield from csv.DictReader(f, dialect=dialect)
+
+def _predicate(cond: dict[str, Any]) -> Callable[[dict[str, Any]], bool]:
+    col, op, value = cond.get("col"), cond.get("op", "="), cond.get("value")
+    if not isinstance(col, str) or op not in _OPS:
+        raise QueryError(f"bad where clause {cond!r}; op must be one of {', '.join(_OPS)}")
+    if op == "contains":
+        needle = str(value).lower()
+        return lambda r: needle in str(r.get(col, "")).lower()
+    if op == "in":
+        if not isinstance(value, list):
+            raise QueryError("'in' needs a list value")
+        wanted = {str(v) for v in value}
+        return lambda r: str(r.get(col)) in wanted
+    target = _num(value)
+    if target is None:
+        # string comparison
+        s = str(value)
+        cmp: dict[str, Callable[[str], bool]] = {
+            "=": lambda x: x == s, "!=": lambda x: x != s,
+            "<": lambda x: x < s, "<=": lambda x: x <= s, ">": lambda x: x > s, ">=": lambda x: x >= s,
+        }
+        f = cmp[op]
+        return lambda r: r.get(col) is not None and f(str(r.get(col)))
+    ncmp: dict[str, Callable[[float], bool]] = {
+        "=": lambda x: x == target, "!=": lambda x: x != target,
+        "<": lambda x: x < target, "<=": lambda x: x <= target, ">": lambda x: x > target, ">=": lambda x: x >= target,
+    }
+    g = ncmp[op]
+
+    def numeric(r: dict[str, Any]) -> bool:
+        x = _num(r.get(col))
+        return (op == "!=") if x is None else g(x)
+
+    return numeric
+
+@dataclass
+class _Acc:
+    count: int = 0
+    sums: list[float] = field(default_factory=list)
+    ns: list[int] = field(default_factory=list)
+    mins: list[float | None] = field(default_factory=list)
+    maxs: list[float | None] = field(default_factory=list)
+
+def _sort_key(v: Any) -> tuple[int, Any]:
+    # numbers before strings before missing, so mixed columns still order deterministically
+    n = _num(v)
+    if n is not None:
+        return (0, n)
+    return (1, str(v)) if v is not None else (2, "")
+
+def _group_value(v: Any) -> Any:
+    # JSONL cells can be lists or objects; key those by their canonical JSON
+    return json.dumps(v, sort_keys=True) if isinstance(v, (list, dict)) else v
+
+def run_query(path: Path, q: dict[str, Any]) -> dict[str, Any]:
+    where = [_predicate(c) for c in (q.get("where") or [])]
+    group_by = list(q.get("group_by") or [])
+    aggs = list(q.get("aggregates") or [])
+    for a in aggs:
+        if a.get("fn") not in _AGGS:
+            raise QueryError(f"aggregate fn must be one of {', '.join(_AGGS)}")
+        if a["fn"] != "count" and not a.get("col"):
+            raise QueryError(f"{a['fn']} needs a col")
+    names = [a.get("as") or (a["fn"] if a["fn"] == "count" and not a.get("col") else f"{a['fn']}_{a['col']}") for a in aggs]
+    limit = max(1, min(int(q.get("limit") or 20), MAX_LIMIT))
+    order_by = q.get("order_by")
+    desc = bool(q.get("desc", False))
+
+    scanned = matched = 0
+    if group_by or aggs:
+        if not aggs:
+            aggs, names = [{"fn": "count"}], ["count"]
+        groups: dict[tuple, _Acc] = {}
+        n_aggs = len(aggs)
+        for row in iter_rows(path):
+            scanned += 1
+            if not all(p(row) for p in where):
+                continue
+            matched += 1
+            key = tuple(_group_value(row.get(c)) for c in group_by)
+            acc = groups.get(key)
+            if acc is None:
+                acc = groups[key] = _Acc(0, [0.0] * n_aggs, [0] * n_aggs, [None] * n_aggs, [None] * n_aggs)
+            acc.count += 1
+            for i, a in enumerate(aggs):
+                if a["fn"] == "count" and not a.get("col"):
+                    continue
+                x = _num(row.get(a["col"]))
+                if x is None:
+                    continue
+                acc.ns[i] += 1
+                acc.sums[i] += x
+                acc.mins[i] = x if acc.mins[i] is None or x < acc.mins[i] else acc.mins[i]
+                acc.maxs[i] = x if acc.maxs[i] is None or x > acc.maxs[i] else acc.maxs[i]
+        columns = group_by + names
+        rows = []
+        for key, acc in groups.items():
+            vals: list[Any] = []
+            for i, a in enumerate(aggs):
+                fn = a["fn"]
+                if fn == "count":
+                    vals.append(acc.count if not a.get("col") else acc.ns[i])
+                elif fn == "sum":
+                    vals.append(acc.sums[i])
+                elif fn == "avg":
+                    vals.append(acc.sums[i] / acc.ns[i] if acc.ns[i] else None)
+                elif fn == "min":
+                    vals.append(acc.mins[i])
+                else:
+                    vals.append(acc.maxs[i])
+            rows.append(list(key) + vals)
+        total = len(rows)
+        if order_by is not None:
+            if order_by not in columns:
+                raise QueryError(f"order_by must be one of {columns}")
+            idx = columns.index(order_by)
+            pick = heapq.nlargest if desc else heapq.nsmallest
+            rows = pick(limit, rows, key=lambda r: _sort_key(r[idx]))
+        else:
+            rows = rows[:limit]
+    else:
+        cols = q.get("columns")
+        heap: list[tuple[Any, int, list[Any]]] = []
+        rows = []
+        columns: list[str] = list(cols) if cols else []
+        row_columns: list[str] = []
+        order_seen = False
+        for row in iter_rows(path):
+            scanned += 1
+            if not all(p(row) for p in where):
+                continue
+            matched += 1
+            if not row_columns:
+                row_columns = list(row.keys())
+            if not columns:
+                columns = row_columns
+            order_seen = order_seen or order_by in row
+            vals = [row.get(c) for c in columns]
+            if order_by is None:
+                if len(rows) < limit:
+                    rows.append(vals)
+                continue
+            # bounded heap for top-k: keep the `limit` best rows seen so far
+            k = _sort_key(row.get(order_by))
+            item = (k if desc else _Neg(k), -matched, vals)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        if order_by is not None:
+            if matched and not order_seen:
+                raise QueryError(f"order_by must be one of {row_columns}")
+            rows = [v for _, _, v in sorted(heap, reverse=True)]
+        total = matched
+    return {
+        "columns": columns,
+        "rows": rows,
+        "rows_scanned": scanned,
+        "rows_matched": matched,
+        "truncated": total > len(rows),
+    }
+
+class _Neg:
+    """Reverses ordering so one min-heap serves both ascending and descending top-k."""
+    __slots__ = ("v",)
+    def __init__(self, v: Any) -> None:
+        self.v = v
+    def __lt__(self, other: "_Neg") -> bool:
+        return other.v < self.v
+    def __gt__(self, other: "_Neg") -> bool:
+        return other.v > self.v
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Neg) and other.v == self.v
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import itertools
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from orchestra.memory.ann import IVFIndex
+from orchestra.memory.sparse import SparseVectorIndex
+from orchestra.memory.vector import MemoryItem
+
+class _Corpus:
+    """Topic words mixed with a Zipf-distributed shared vocabulary, so items form loose clusters."""
+    def __init__(self, seed: int) -> None:
+        self.rng = random.Random(seed)
+        self.topics = [[f"t{t}w{i}" for i in range(30)] for t in range(40)]
+        self.words = [f"g{i}" for i in range(2000)]
+        self.cum = list(itertools.accumulate(1.0 / (i + 1) for i in range(2000)))
+
+    def text(self, n: int) -> str:
+        k = int(n * 0.6)
+        words = self.rng.choices(self.rng.choice(self.topics), k=k) + self.rng.choices(self.words, cum_weights=self.cum, k=n - k)
+        self.rng.shuffle(words)
+        return " ".join(words)
+
+@pytest.fixture(scope="module")
+def corpus():
+    c = _Corpus(7)
+    items = [MemoryItem(id=str(i), text=c.text(12), meta={}) for i in range(4000)]
+    queries = [c.text(c.rng.randint(3, 6)) for _ in range(50)]
+    return items, queries
+
+def _build(items: list[MemoryItem], **kw) -> IVFIndex:
+    index = IVFIndex(min_train=0, nlist=32, **kw)
+    for it in items:
+        index.add(it)
+    return index
+
+def _recall(truth, got) -> float:
+    # compare scores rather than ids: tied items count whichever comes back
+    hits = total = 0
+    for want, have in zip(truth, got):
+        a = [round(s, 5) for _, s in want]
+        b = [round(s, 5) for _, s in have]
+        for s in a:
+            total += 1
+            if s in b:
+                b.remove(s)
+                hits += 1
+    return hits / total
+
+def test_probing_every_cluster_is_exact(corpus):
+    items, queries = corpus
+    index = _build(items, nprobe=32)
+    truth = SparseVectorIndex.search_many(index, queries, k=10)
+    assert _recall(truth, index.search_many(queries, k=10)) == 1.0
+
+def test_recall_against_exact_search(corpus):
+    items, queries = corpus
+    index = _build(items, nprobe=1)
+    truth = SparseVectorIndex.search_many(index, queries, k=10)
+    assert _recall(truth, index.search_many(queries, k=10)) < 0.8  # one cluster really is approximate
+    index.nprobe = 16
+    got = index.search_many(queries, k=10)
+    assert _recall(truth, got) >= 0.9
+    # what comes back is scored exactly, whichever clusters it was found in
+    for res, full in zip(got, SparseVectorIndex.search_many(index, queries, k=len(items))):
+        exact = {it.id: s for it, s in full}
+        for it, s in res:
+            assert s == pytest.approx(exact[it.id], abs=1e-5)
+
+def test_items_added_after_training_are_found(corpus):
+    items, queries = corpus
+    index = _build(items[:3000], nprobe=16)
+    index.search("warm up")  # trains and files the first 3000
+    for it in items[3000:]:
+        index.add(it)
+    truth = SparseVectorIndex.search_many(index, queries, k=10)
+    assert _recall(truth, index.search_many(queries, k=10)) >= 0.9
+    assert index.search(items[-1].text, k=1)[0][0].text == items[-1].text
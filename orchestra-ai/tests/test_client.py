@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import gc
+
+import pytest
+
+from orchestra.config import load_settings
+from orchestra.llm.client import LLMClient
+from orchestra.llm.providers import MockProvider, OpenAIProvider
+
+pytest.importorskip("openai")
+
+def test_async_client_is_per_loop_and_closed_with_it():
+    p = OpenAIProvider("openai", api_key="test")
+
+    async def use():
+        c = p._async_client()
+        assert p._async_client() is c  # reused within the loop
+        await p.aclose()
+        return c
+
+    first = asyncio.run(use())
+    second = asyncio.run(use())
+    assert first is not second
+    assert first.is_closed() and second.is_closed()
+    assert len(p._aclients) == 0
+
+def test_a_dead_loops_client_is_not_reused():
+    p = OpenAIProvider("openai", api_key="test")
+
+    async def use():
+        return p._async_client()
+
+    first = asyncio.run(use())  # never closed: dropped with its loop
+    gc.collect()
+    assert len(p._aclients) == 0
+    assert asyncio.run(use()) is not first
+
+class _Tracking(MockProvider):
+    closed = 0
+
+    async def aclose(self) -> None:
+        self.closed += 1
+
+def test_chat_many_closes_the_providers_loop_resources(tmp_path):
+    provider = _Tracking()
+    llm = LLMClient(dataclasses.replace(load_settings(), cache_dir=str(tmp_path)), provider=provider)
+    msgs = [[{"role": "user", "content": f"q{i}"}] for i in range(3)]
+    assert len(llm.chat_many(msgs)) == 3
+    llm.chat_many(msgs[:1])
+    assert provider.closed == 2
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import dataclasses
+
+import pytest
+
+from orchestra.config import load_settings
+from orchestra.llm.client import LLMClient
+from orchestra.llm.providers import MockProvider
+from orchestra.memory.context import ContextAssembler
+from orchestra.memory.session import SessionStore
+
+@pytest.fixture
+def sessions(tmp_path):
+    s = SessionStore(str(tmp_path / "data"), fsync="never", compact_interval_s=3600)
+    yield s
+    s.close()
+
+@pytest.fixture
+def llm(tmp_path):
+    return LLMClient(dataclasses.replace(load_settings(), cache_dir=str(tmp_path / "cache")), provider=MockProvider())
+
+def _assembler(sessions, llm, tmp_path, **kw) -> ContextAssembler:
+    return ContextAssembler(sessions, llm, str(tmp_path / "cache"), **kw)
+
+def _turn(sessions, i: int, words: int = 20) -> None:
+    sessions.append("s", "user", f"question {i} " + "word " * words)
+    sessions.append("s", "assistant", f"answer {i} " + "word " * words)
+
+def _summaries(llm: LLMClient) -> float:
+    return llm.metrics.counter("orchestra_context_summaries_total")
+
+def test_short_history_is_sent_whole(sessions, llm, tmp_path):
+    ctx = _assembler(sessions, llm, tmp_path, budget_tokens=2000)
+    for i in range(3):
+        _turn(sessions, i)
+    c = ctx.build("s")
+    assert [m["content"] for m in c.messages] == [m["content"] for m in sessions.messages("s", "", 100)[0]]
+    assert c.tokens == c.full_tokens and c.summarized == 0
+    assert _summaries(llm) == 0
+
+def test_long_history_fits_the_budget(sessions, llm, tmp_path):
+    budget = 300
+    ctx = _assembler(sessions, llm, tmp_path, budget_tokens=budget, summary_tokens=60)
+    for i in range(30):
+        _turn(sessions, i)
+        c = ctx.build("s")
+        assert c.tokens <= budget
+    assert c.messages[0]["role"] == "system" and c.messages[0]["content"].startswith("Summary of the earlier conversation")
+    # what follows the summary is the newest turns, verbatim and in order
+    assert c.messages[-1]["content"].startswith("answer 29")
+    kept = [m["content"] for m in c.messages[1:]]
+    everything = [m["content"] for m in sessions.messages("s", "", 100)[0]]
+    assert everything[-len(kept):] == kept and everything[c.summarized:] == kept
+    assert c.full_tokens > 5 * c.tokens
+
+def test_summary_is_refreshed_every_few_turns(sessions, llm, tmp_path):
+    ctx = _assembler(sessions, llm, tmp_path, budget_tokens=300, summary_tokens=60)
+    calls = []
+    for i in range(40):
+        _turn(sessions, i)
+        ctx.build("s")
+        calls.append(_summaries(llm))
+    refreshes = [i for i in range(len(calls)) if calls[i] > (calls[i - 1] if i else 0)]
+    # the first fold once the turns outgrow the budget; after that each fold frees half the
+    # budget, so the next one is due a few turns later rather than on every turn
+    assert refreshes == list(range(4, 40, 3))
+    assert calls[-1] == len(refreshes)  # one summarizer call per refresh
+
+def test_summary_state_is_shared_across_instances(sessions, llm, tmp_path):
+    ctx = _assembler(sessions, llm, tmp_path, budget_tokens=300, summary_tokens=60)
+    for i in range(12):
+        _turn(sessions, i)
+    before = ctx.build("s")
+    assert before.summarized > 0
+    n = _summaries(llm)
+    # a new process (or another worker) reads the same state and doesn't summarize again
+    again = _assembler(sessions, llm, tmp_path, budget_tokens=300, summary_tokens=60).build("s")
+    assert again.messages == before.messages and _summaries(llm) == n
+
+def test_zero_budget_sends_nothing(sessions, llm, tmp_path):
+    _turn(sessions, 0)
+    assert _assembler(sessions, llm, tmp_path, budget_tokens=0).build("s").messages == []
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from orchestra.llm.cache import DiskCache
+from orchestra.tools.fetcher import HttpFetcher
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    hits: dict[str, int] = {}
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, headers: dict[str, str], body: bytes = b"") -> None:
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        if self.path == "/plain":
+            self._send(200, {"Cache-Control": "no-store"}, f"port {self.client_address[1]}".encode())
+        elif self.path == "/short":
+            self._send(200, {"Cache-Control": "max-age=1"}, b"short-lived")
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, {"ETag": '"v1"', "Cache-Control": "max-age=60"})
+            else:
+                self._send(200, {"ETag": '"v1"', "Cache-Control": "no-cache", "Content-Type": "text/plain"}, b"tagged")
+        elif self.path == "/old":
+            self._send(302, {"Location": "/new"})
+        elif self.path == "/to-file":
+            self._send(302, {"Location": "file:///etc/passwd"})
+        elif self.path == "/new":
+            self._send(200, {"Cache-Control": "no-store"}, b"moved here")
+        else:
+            self._send(404, {}, b"")
+
+@pytest.fixture
+def server():
+    _Handler.hits = {}
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+@pytest.fixture
+def fetcher(tmp_path):
+    f = HttpFetcher(cache=DiskCache(str(tmp_path), 1 << 20, filename="http.sqlite3"), default_ttl_s=0)
+    yield f
+    f.close()
+
+def test_keep_alive_reuses_the_connection(server, fetcher):
+    first = fetcher.get(f"{server}/plain")
+    second = fetcher.get(f"{server}/plain")
+    assert first.hops[0].reused is False
+    assert second.hops[0].reused is True
+    assert first.body == second.body  # same client port: the same TCP connection
+    assert _Handler.hits["/plain"] == 2
+
+def test_max_age_hit_then_expiry(server, fetcher):
+    assert fetcher.get(f"{server}/short").cache == "miss"
+    hit = fetcher.get(f"{server}/short")
+    assert hit.cache == "hit" and hit.body == b"short-lived" and not hit.hops
+    assert _Handler.hits["/short"] == 1
+    time.sleep(1.1)
+    assert fetcher.get(f"{server}/short").cache == "miss"
+    assert _Handler.hits["/short"] == 2
+
+def test_etag_revalidation_uses_the_304_headers(server, fetcher):
+    assert fetcher.get(f"{server}/etag").cache == "miss"
+    r = fetcher.get(f"{server}/etag")
+    assert r.cache == "revalidated"
+    assert r.status == 200 and r.body == b"tagged"
+    assert r.headers["cache-control"] == "max-age=60"  # from the 304, not the stored no-cache
+    assert r.headers["content-type"] == "text/plain"
+    # the 304 made the entry fresh for a minute
+    assert fetcher.get(f"{server}/etag").cache == "hit"
+    assert _Handler.hits["/etag"] == 2
+
+def test_redirect_is_followed(server, fetcher):
+    r = fetcher.get(f"{server}/old")
+    assert r.status == 200 and r.body == b"moved here"
+    assert r.url == f"{server}/new"
+    assert [h.status for h in r.hops] == [302, 200]
+    assert r.hops[1].reused is True
+
+def test_too_many_redirects(server):
+    f = HttpFetcher(max_redirects=0)
+    with pytest.raises(RuntimeError, match="redirects"):
+        f.get(f"{server}/old")
+    f.close()
+
+@pytest.mark.parametrize("url", ["file:///etc/passwd", "ftp://example.com/x", "//example.com/x", "gopher://h/"])
+def test_non_http_url_is_rejected(fetcher, url):
+    with pytest.raises(ValueError, match="scheme"):
+        fetcher.get(url)
+
+def test_redirect_to_another_scheme_is_rejected(server, fetcher):
+    with pytest.raises(ValueError, match="file:///etc/passwd"):
+        fetcher.get(f"{server}/to-file")
+    assert _Handler.hits == {"/to-file": 1}
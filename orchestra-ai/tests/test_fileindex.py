@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import pytest
+
+from orchestra.tools.builtins import _decode_window
+from orchestra.tools.fileindex import FileIndex
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "files"
+    for rel in ["a.txt", "docs/x.md", "docs/y.md", "docs/sub/z.md", "docs2/w.md", "zz.bin"]:
+        p = root / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(f"{rel} alpha beta\n" + ("gamma\n" if "docs/" in rel else ""), encoding="utf-8")
+    (root / "zz.bin").write_bytes(b"\x00\x01 gamma")
+    return root
+
+@pytest.fixture
+def index(tree, tmp_path):
+    return FileIndex(tree, tmp_path / "index.sqlite3", refresh_interval_s=0)
+
+def _paths(index: FileIndex, prefix: str = "", limit: int = 2) -> list[list[str]]:
+    pages, cursor = [], ""
+    while True:
+        page, cursor = index.list(prefix, cursor, limit)
+        pages.append([f["path"] for f in page])
+        if cursor is None:
+            return pages
+
+def test_list_pages_with_cursor(index):
+    assert _paths(index) == [["a.txt", "docs/sub/z.md"], ["docs/x.md", "docs/y.md"], ["docs2/w.md", "zz.bin"]]
+
+def test_list_prefix_is_a_directory(index):
+    assert sum(_paths(index, "docs/"), []) == ["docs/sub/z.md", "docs/x.md", "docs/y.md"]
+    assert sum(_paths(index, "docs2/", limit=10), []) == ["docs2/w.md"]
+    # a cursor from before the prefix starts at the prefix
+    page, _ = index.list("docs/", "a.txt", 10)
+    assert page[0]["path"] == "docs/sub/z.md"
+
+def test_list_does_not_read_content(index):
+    index.list()
+    conn = index._conn()
+    assert conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0] == 0
+    assert {t for (t,) in conn.execute("SELECT terms FROM files")} == {-1}
+
+def test_search_indexes_what_it_covers(index):
+    hits = index.search("gamma", prefix="docs/")
+    assert sorted(h["path"] for h in hits) == ["docs/sub/z.md", "docs/x.md", "docs/y.md"]
+    assert hits[0]["snippet"] == "gamma"
+    pending = {p for (p,) in index._conn().execute("SELECT path FROM files WHERE terms = -1")}
+    assert pending == {"a.txt", "docs2/w.md", "zz.bin"}  # outside the prefix: still not read
+    assert {h["path"] for h in index.search("alpha")} == {"a.txt", "docs/sub/z.md", "docs/x.md", "docs/y.md", "docs2/w.md"}
+    assert index.search("gamma", prefix="zz") == []  # binary files aren't indexed
+
+def test_added_changed_and_removed_files_are_picked_up(index, tree):
+    index.list()
+    (tree / "docs" / "new.md").write_text("delta", encoding="utf-8")
+    (tree / "docs" / "x.md").unlink()
+    index.refresh(force=True)
+    assert sum(_paths(index, "docs/", 10), []) == ["docs/new.md", "docs/sub/z.md", "docs/y.md"]
+    assert [h["path"] for h in index.search("delta")] == ["docs/new.md"]
+    (tree / "docs" / "sub" / "z.md").unlink()
+    (tree / "docs" / "sub").rmdir()
+    assert "docs/sub/z.md" not in sum(_paths(index, "", 10), [])
+    assert [h["path"] for h in index.search("gamma")] == ["docs/y.md"]
+
+def test_update_indexes_a_written_file_at_once(index, tree):
+    index.list()
+    p = tree / "docs" / "written.md"
+    p.write_text("zeta", encoding="utf-8")
+    index.update(p)
+    assert [h["path"] for h in index.search("zeta")] == ["docs/written.md"]
+
+@pytest.mark.parametrize("text", ["héllo wörld", "日本語のテキスト", "emoji 😀😀 end", "mixed ü😀日a"])
+def test_decode_window_pages_back_the_exact_text(text):
+    raw = text.encode("utf-8")
+    for max_chars in (1, 2, 3, 5):
+        out, offset = [], 0
+        while offset < len(raw):
+            chunk = raw[offset:offset + max_chars * 4]
+            txt, used = _decode_window(chunk, max_chars, final=offset + len(chunk) >= len(raw))
+            assert 0 < len(txt) <= max_chars
+            out.append(txt)
+            offset += used
+        assert "".join(out) == text
+
+def test_decode_window_cut_mid_character():
+    raw = "aé".encode("utf-8")  # b"a\xc3\xa9"
+    assert _decode_window(raw[:2], 5, final=False) == ("a", 1)  # the half é is left for later
+    assert _decode_window(raw[:2], 5, final=True) == ("a�", 2)  # end of file: replaced
+
+def test_decode_window_invalid_bytes_become_replacement_chars():
+    raw = b"ok\xff\xfeok"
+    txt, used = _decode_window(raw, 3, final=True)
+    assert (txt, used) == ("ok�", 3)
+    assert _decode_window(raw[used:], 10, final=True) == ("�ok", 3)
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from orchestra.memory.persistent import IndexLockedError, PersistentVectorIndex
+from orchestra.memory.vector import MemoryItem
+
+def _item(i: int) -> MemoryItem:
+    return MemoryItem(id=f"i{i}", text=f"note {i} about topic{i % 3}", meta={"n": i})
+
+def test_reopen_keeps_segments_and_log(tmp_path):
+    idx = PersistentVectorIndex(tmp_path, flush_items=4, fsync=False)
+    for i in range(10):
+        idx.add(_item(i))
+    idx.close()
+    idx = PersistentVectorIndex(tmp_path, flush_items=4, fsync=False)
+    assert len(idx) == 10
+    assert len(json.loads((tmp_path / "manifest.json").read_text())["segments"]) == 2
+    assert idx.search("topic1", k=1)[0][0].id in {"i1", "i4", "i7"}
+    idx.close()
+
+def test_crash_leftovers_are_cleaned_up_on_open(tmp_path):
+    idx = PersistentVectorIndex(tmp_path, flush_items=4, fsync=False)
+    for i in range(6):
+        idx.add(_item(i))
+    log = tmp_path / f"log-{idx._m['log']:06d}.jsonl"
+    idx.close()
+    # a crash mid-add (torn log line) and mid-flush (segment the manifest never got)
+    with log.open("ab") as f:
+        f.write(b'{"id": "torn", "text": "half a li')
+    (tmp_path / "seg-000099").mkdir()
+    (tmp_path / "seg-000099" / "rows.npy").write_bytes(b"partial")
+
+    idx = PersistentVectorIndex(tmp_path, flush_items=4, fsync=False)
+    assert len(idx) == 6
+    assert not (tmp_path / "seg-000099").exists()
+    assert not log.read_bytes().endswith(b"half a li")
+    idx.add(_item(6))  # the log continues cleanly after the dropped line
+    idx.close()
+    idx = PersistentVectorIndex(tmp_path, flush_items=4, fsync=False)
+    assert sorted(it.id for it, _ in idx.search("note", k=10)) == sorted(f"i{i}" for i in range(7))
+    idx.close()
+
+def test_compact_merges_into_one_segment(tmp_path):
+    idx = PersistentVectorIndex(tmp_path, flush_items=3, fsync=False)
+    for i in range(10):
+        idx.add(_item(i))
+    before = idx.search("topic2", k=5)
+    idx.compact()
+    assert len(idx._segments) == 1 and len(idx) == 10
+    assert [it.id for it, _ in idx.search("topic2", k=5)] == [it.id for it, _ in before]
+    idx.close()
+
+def test_second_opener_is_refused(tmp_path):
+    idx = PersistentVectorIndex(tmp_path, fsync=False)
+    with pytest.raises(IndexLockedError):
+        PersistentVectorIndex(tmp_path, fsync=False)
+    idx.close()
+    PersistentVectorIndex(tmp_path, fsync=False).close()
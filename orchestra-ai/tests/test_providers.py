@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from orchestra.llm.providers import HedgedProvider, MockAPIError, MockProvider
+from orchestra.metrics import Metrics
+
+_PAYLOAD = {"model": "m", "messages": [{"role": "user", "content": "hello"}], "temperature": 0.0}
+
+def _hedged(primary: MockProvider, secondary: MockProvider) -> tuple[HedgedProvider, Metrics]:
+    metrics = Metrics()
+    # fewer than 20 samples: hedge after the initial delay
+    return HedgedProvider(primary, secondary, initial_delay_s=0.05, metrics=metrics), metrics
+
+def _outcomes(metrics: Metrics) -> dict[str, float]:
+    names = ("fired", "fallback", "primary_won", "secondary_won")
+    return {n: metrics.counter("orchestra_llm_hedge_total", outcome=n) for n in names if metrics.counter("orchestra_llm_hedge_total", outcome=n)}
+
+def _run(h: HedgedProvider, sync: bool):
+    return h.complete(_PAYLOAD) if sync else asyncio.run(h.acomplete(_PAYLOAD))
+
+@pytest.mark.parametrize("sync", [True, False])
+def test_fast_primary_is_not_hedged(sync):
+    h, metrics = _hedged(MockProvider("p"), MockProvider("s"))
+    assert _run(h, sync).provider == "p"
+    assert _outcomes(metrics) == {}
+
+@pytest.mark.parametrize("sync", [True, False])
+def test_slow_primary_fires_and_secondary_wins(sync):
+    h, metrics = _hedged(MockProvider("p", ttft_s=1.0), MockProvider("s"))
+    assert _run(h, sync).provider == "s"
+    assert _outcomes(metrics) == {"fired": 1, "secondary_won": 1}
+
+@pytest.mark.parametrize("sync", [True, False])
+def test_fired_but_primary_still_wins(sync):
+    h, metrics = _hedged(MockProvider("p", ttft_s=0.1), MockProvider("s", ttft_s=1.0))
+    assert _run(h, sync).provider == "p"
+    assert _outcomes(metrics) == {"fired": 1, "primary_won": 1}
+
+@pytest.mark.parametrize("sync", [True, False])
+def test_primary_error_falls_back(sync):
+    h, metrics = _hedged(MockProvider("p", error_rate=1.0), MockProvider("s"))
+    assert _run(h, sync).provider == "s"
+    assert _outcomes(metrics) == {"fallback": 1}
+
+def test_both_failing_raises():
+    h, _ = _hedged(MockProvider("p", ttft_s=0.1, error_rate=1.0), MockProvider("s", ttft_s=0.2, error_rate=1.0))
+    with pytest.raises(MockAPIError):
+        asyncio.run(h.acomplete(_PAYLOAD))
+
+@pytest.mark.parametrize("timeout", [0.02, 0.1])  # during the hedge delay / after firing
+def test_cancelled_caller_leaves_no_call_running(timeout):
+    h, _ = _hedged(MockProvider("p", ttft_s=5.0), MockProvider("s", ttft_s=5.0))
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(h.acomplete(_PAYLOAD), timeout)
+        await asyncio.sleep(0)  # let the cancellations land
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(main()) == []
+
+def test_cancelled_during_fallback_cancels_the_secondary():
+    h, _ = _hedged(MockProvider("p", error_rate=1.0), MockProvider("s", ttft_s=5.0))
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(h.acomplete(_PAYLOAD), 0.1)
+        await asyncio.sleep(0)
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(main()) == []
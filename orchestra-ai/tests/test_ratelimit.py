@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import random
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import orchestra.llm.client as client_mod
+from orchestra.config import load_settings
+from orchestra.llm.client import LLMClient
+from orchestra.llm.providers import MockAPIError, MockProvider
+from orchestra.llm.ratelimit import TokenBucket, estimate_tokens, is_retryable, retry_delay
+
+def test_bucket_bursts_then_waits_for_refill():
+    async def main():
+        b = TokenBucket(600, burst=2)  # 10 per second
+        t0 = time.perf_counter()
+        await b.acquire()
+        await b.acquire()
+        burst = time.perf_counter() - t0
+        await b.acquire()
+        return burst, time.perf_counter() - t0
+
+    burst, total = asyncio.run(main())
+    assert burst < 0.05
+    assert 0.08 <= total < 0.5  # the third waited about 1/10 s for a token
+
+def test_refill_is_capped_and_refund_charges_or_credits():
+    b = TokenBucket(60, burst=5)
+    b.tokens, b.updated = 0.0, time.monotonic() - 2.0
+    b._refill()
+    assert b.tokens == pytest.approx(2.0, abs=0.05)  # 1 per second
+    b.updated = time.monotonic() - 3600
+    b._refill()
+    assert b.tokens == 5.0  # never more than the burst
+    b.refund(-3)
+    assert b.tokens == pytest.approx(2.0, abs=0.05)
+    b.refund(100)
+    assert b.tokens == 5.0
+
+def test_oversized_request_takes_the_whole_bucket_instead_of_waiting_forever():
+    async def main():
+        b = TokenBucket(60, burst=5)
+        await asyncio.wait_for(b.acquire(50), 1.0)
+        return b.tokens
+
+    assert asyncio.run(main()) == pytest.approx(0.0, abs=0.01)
+
+def test_estimate_tokens():
+    assert estimate_tokens([{"role": "user", "content": "x" * 40}, {"role": "system"}]) == 10 + 4 + 4
+
+def _err(status: int | None = None, retry_after: str | None = None) -> Exception:
+    e = MockAPIError(status or 500, "boom")
+    if retry_after is not None:
+        e.response = SimpleNamespace(headers={"retry-after": retry_after})
+    return e
+
+@pytest.mark.parametrize("retry_after, expected", [("2", 2.0), ("0.25", 0.25), ("-5", 0.0), ("120", 30.0)])
+def test_retry_after_wins_over_backoff(retry_after, expected):
+    assert retry_delay(_err(429, retry_after), attempt=4) == expected
+
+@pytest.mark.parametrize("headers", [None, "soon", ""])
+def test_backoff_is_full_jitter_within_the_cap(headers):
+    random.seed(1)
+    for attempt, ceiling in [(0, 0.5), (1, 1.0), (3, 4.0), (10, 30.0)]:
+        delays = [retry_delay(_err(503, headers), attempt) for _ in range(200)]
+        assert all(0.0 <= d <= ceiling for d in delays)
+        assert max(delays) > ceiling * 0.8 and min(delays) < ceiling * 0.2  # spread over the range
+
+def test_is_retryable():
+    assert is_retryable(_err(429)) and is_retryable(_err(500)) and is_retryable(_err(503))
+    assert not is_retryable(_err(400)) and not is_retryable(_err(404))
+    for name in ("APIConnectionError", "APITimeoutError"):
+        assert is_retryable(type(name, (Exception,), {})())
+    assert not is_retryable(ValueError("bad"))
+
+class _Counting(MockProvider):
+    calls = 0
+
+    async def acomplete(self, payload):
+        self.calls += 1
+        return await super().acomplete(payload)
+
+def _llm(tmp_path, provider: MockProvider, **settings) -> LLMClient:
+    return LLMClient(dataclasses.replace(load_settings(), cache_dir=str(tmp_path), **settings), provider=provider)
+
+def test_chat_many_retries_rate_limits(tmp_path, monkeypatch):
+    delays: list[float] = []
+    monkeypatch.setattr(client_mod, "retry_delay", lambda e, attempt: delays.append(attempt) or 0.0)
+    provider = _Counting(rate_limit_rate=0.3, seed=3)
+    llm = _llm(tmp_path, provider, llm_max_retries=10)
+    msgs = [[{"role": "user", "content": f"q{i}"}] for i in range(20)]
+    results = llm.chat_many(msgs, agent="writer")
+    assert [r.text for r in results] == [MockProvider().complete({"messages": m}).text for m in msgs]
+    assert delays and provider.calls == len(msgs) + len(delays)  # every 429 was retried once more
+
+def test_chat_many_gives_up_after_max_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(client_mod, "retry_delay", lambda e, attempt: 0.0)
+    provider = _Counting(rate_limit_rate=1.0)
+    llm = _llm(tmp_path, provider, llm_max_retries=2)
+    results = llm.chat_many([[{"role": "user", "content": "q"}], [{"role": "user", "content": "r"}]], return_exceptions=True)
+    assert all(isinstance(r, MockAPIError) and r.status_code == 429 for r in results)
+    assert provider.calls == 2 * 3
+    with pytest.raises(MockAPIError):
+        llm.chat_many([[{"role": "user", "content": "s"}]])
+
+def test_chat_many_does_not_retry_client_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(client_mod, "retry_delay", lambda e, attempt: 0.0)
+    provider = _Counting(error_rate=1.0)  # 500s are retried ...
+    _llm(tmp_path, provider, llm_max_retries=1).chat_many([[{"role": "user", "content": "q"}]], return_exceptions=True)
+    assert provider.calls == 2
+
+    class _BadRequest(_Counting):
+        async def acomplete(self, payload):
+            self.calls += 1
+            raise MockAPIError(400, "bad request")
+
+    provider = _BadRequest()  # ... 400s are not
+    _llm(tmp_path, provider, llm_max_retries=5).chat_many([[{"role": "user", "content": "q"}]], return_exceptions=True)
+    assert provider.calls == 1
+
+def test_chat_many_spends_the_rpm_budget(tmp_path):
+    llm = _llm(tmp_path, MockProvider(), llm_rpm=600.0)  # a burst of 600, then 10 per second
+
+    async def main():
+        await llm.achat_many([[{"role": "user", "content": f"q{i}"}] for i in range(5)])
+        return llm._async_state().rpm.tokens
+
+    assert asyncio.run(main()) == pytest.approx(595, abs=0.5)
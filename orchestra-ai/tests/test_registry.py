@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from orchestra.llm.cache import DiskCache
+from orchestra.tools.registry import ToolRegistry, ToolSpec
+
+_ARGS = {"type": "object", "properties": {"x": {"type": "integer"}}, "required": ["x"]}
+
+@pytest.fixture
+def registry(tmp_path):
+    r = ToolRegistry(timeout_s=0.3, cache=DiskCache(str(tmp_path), 1 << 20, filename="tools.sqlite3"))
+    yield r
+    r.close()
+
+@pytest.fixture
+def release():
+    ev = threading.Event()
+    yield ev
+    ev.set()  # let hung tool threads finish
+
+def test_hung_sync_tool_times_out(registry, release):
+    registry.register(ToolSpec("hang", "", _ARGS), lambda args: release.wait())
+    t0 = time.perf_counter()
+    res = registry.call("hang", {"x": 1})
+    assert res == {"error": "hang timed out after 0.3s"}
+    assert time.perf_counter() - t0 < 1.0
+    assert registry.stats()["hang"]["timeouts"] == 1
+
+def test_hung_async_tool_times_out(registry):
+    async def hang(args):
+        await asyncio.sleep(60)
+
+    registry.register(ToolSpec("ahang", "", _ARGS, timeout_s=0.2), hang)
+    assert registry.call("ahang", {"x": 1}) == {"error": "ahang timed out after 0.2s"}
+    assert registry.stats()["ahang"]["in_flight"] == 0  # the cancelled coroutine gave its slot back
+
+def test_waiting_for_a_slot_counts_against_the_timeout(registry, release):
+    registry.register(ToolSpec("one", "", _ARGS, max_concurrency=1), lambda args: release.wait())
+    first = registry.submit("one", {"x": 1})
+    t0 = time.perf_counter()
+    # queued behind the hung call: it gets its own timeout, not the first call's plus its own
+    assert registry.call("one", {"x": 2}) == {"error": "one timed out after 0.3s"}
+    assert time.perf_counter() - t0 < 0.6
+    assert "timed out" in registry.wait(first)["error"]
+
+def test_call_many_keeps_order_and_overlaps(registry):
+    def slow(args):
+        time.sleep(0.1)
+        return {"x": args["x"]}
+
+    registry.register(ToolSpec("slow", "", _ARGS, max_concurrency=4), slow)
+    t0 = time.perf_counter()
+    assert registry.call_many([("slow", {"x": i}) for i in range(4)]) == [{"x": i} for i in range(4)]
+    assert time.perf_counter() - t0 < 0.3
+
+def test_invalid_args_and_unknown_tool(registry):
+    registry.register(ToolSpec("echo", "", _ARGS), lambda args: args)
+    assert "invalid args" in registry.call("echo", {})["error"]
+    assert registry.wait(registry.submit("nope", {}))["error"].startswith("KeyError")
+
+def test_pure_results_are_cached(registry):
+    runs: list[int] = []
+    registry.register(ToolSpec("sq", "", _ARGS, pure=True), lambda args: runs.append(1) or {"y": args["x"] ** 2})
+    assert registry.call("sq", {"x": 3}) == {"y": 9}
+    deadline = time.time() + 2
+    while registry.cache.get({"tool": "sq", "args": {"x": 3}}) is None and time.time() < deadline:
+        time.sleep(0.01)  # the cache write happens in the background
+    assert registry.call("sq", {"x": "3"}) == {"y": 9}  # coerced args share the entry
+    assert len(runs) == 1 and registry.stats()["sq"]["cache_hits"] == 1
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import dataclasses
+import threading
+import time
+
+import pytest
+
+from orchestra.agents.router import Router, _Speculation
+from orchestra.config import load_settings
+from orchestra.llm.client import LLMClient
+from orchestra.llm.providers import MockProvider
+from orchestra.tools.registry import ToolRegistry
+
+_INSTANT = MockProvider()
+
+class _SlowStreams(MockProvider):
+    """Routing (`complete`) answers at once; streamed answers wait `ttft_s` for their first token."""
+    streams = 0
+
+    def complete(self, payload):
+        return _INSTANT.complete(payload)
+
+    def stream(self, payload):
+        self.streams += 1
+        return super().stream(payload)
+
+def _speculating() -> list[threading.Thread]:
+    return [t for t in threading.enumerate() if t.name == "router-speculate"]
+
+def _drained(timeout: float = 1.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while _speculating() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return not _speculating()
+
+@pytest.fixture
+def router(tmp_path):
+    def make(ttft_s: float) -> Router:
+        provider = _SlowStreams(ttft_s=ttft_s)
+        llm = LLMClient(dataclasses.replace(load_settings(), cache_dir=str(tmp_path)), provider=provider)
+        tools = ToolRegistry()
+        made.append(tools)
+        # the mock's routing answer isn't JSON: decide() falls back to keyword heuristics
+        return Router(llm, tools, speculate_agent="writer")
+
+    made: list[ToolRegistry] = []
+    yield make
+    for tools in made:
+        tools.close()
+
+def _outcome(r: Router, outcome: str) -> float:
+    return r.llm.metrics.counter("orchestra_router_speculation_total", outcome=outcome)
+
+def test_speculation_is_kept_when_routing_agrees(router):
+    r = router(0.2)
+    resp = r.run("a short poem about the sea")
+    assert resp.meta["speculative"] and resp.meta["agent"] == "writer"
+    assert resp.text.startswith("MOCK_MODE RESPONSE")
+    assert (_outcome(r, "hit"), _outcome(r, "miss")) == (1, 0)
+    assert r.llm.provider.streams == 1  # the speculative stream was the answer; nothing re-asked
+    assert _drained()
+
+def test_speculation_is_cancelled_when_routing_disagrees(router):
+    r = router(5.0)  # the speculative stream is still waiting for its first token
+    t0 = time.perf_counter()
+    d, deltas = r.stream("plan the roadmap steps")
+    assert d.agent == "planner" and _outcome(r, "miss") == 1
+    assert _drained()  # the stalled speculation was aborted, not left to run out
+    assert time.perf_counter() - t0 < 2.0
+    deltas.close()
+
+def test_closing_the_stream_aborts_the_speculation(router):
+    r = router(5.0)
+    d, deltas = r.stream("a short poem about the sea")
+    assert d.agent == "writer" and _outcome(r, "hit") == 1
+    assert _speculating()
+    deltas.close()  # e.g. the client disconnected before the first token
+    assert _drained()
+
+def test_drain_thread_exits_on_abort(tmp_path):
+    llm = LLMClient(dataclasses.replace(load_settings(), cache_dir=str(tmp_path)), provider=MockProvider(ttft_s=5.0))
+    spec = _Speculation(llm.stream([{"role": "user", "content": "hello"}], agent="writer"))
+    assert _speculating()
+    spec.cancel()
+    assert _drained()
+    with pytest.raises(Exception, match="aborted"):
+        spec.result()
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import dataclasses
+
+import pytest
+
+from orchestra.config import load_settings
+from orchestra.llm.client import LLMClient
+from orchestra.llm.providers import MockProvider
+from orchestra.llm.semantic_cache import SemanticCache
+
+def _payload(text: str, model: str = "m", temperature: float = 0.0, history: list[dict] | None = None) -> dict:
+    messages = [{"role": "system", "content": "be brief"}, *(history or []), {"role": "user", "content": text}]
+    return {"model": model, "messages": messages, "temperature": temperature}
+
+def test_normalized_duplicate_is_a_hit():
+    sc = SemanticCache()
+    sc.add(_payload("Summarize this report, please!"), "a summary")
+    m = sc.lookup(_payload("summarize  this report please"))
+    assert (m.answer, m.score, m.hit) == ("a summary", 1.0, True)
+
+@pytest.mark.parametrize("change", [
+    {"model": "other"},
+    {"temperature": 0.7},
+    {"history": [{"role": "user", "content": "earlier"}, {"role": "assistant", "content": "ok"}]},
+])
+def test_partitioned_by_model_temperature_and_history(change):
+    sc = SemanticCache()
+    sc.add(_payload("summarize this report"), "a summary")
+    assert sc.lookup(_payload("summarize this report", **change)) is None
+    assert sc.lookup(_payload("summarize this report")).hit
+    assert sc.stats()["partitions"] == 1
+
+def test_threshold():
+    sc = SemanticCache(threshold=0.9)
+    sc.add(_payload("what is the capital of france"), "Paris")
+    near = sc.lookup(_payload("what is the capital of france today"))
+    assert near.answer == "Paris" and 0.9 <= near.score < 1.0 and near.hit
+    far = sc.lookup(_payload("what is the capital of spain"))
+    assert far.score < 0.9 and not far.hit
+    assert sc.lookup(_payload("unrelated words entirely")) is None  # no shared terms
+    assert sc.stats()["hits"] == 1 and sc.stats()["misses"] == 2
+    sc.threshold = near.score + 1e-9
+    assert not sc.lookup(_payload("what is the capital of france today")).hit
+
+def test_verify_and_missed_hit_accounting():
+    sc = SemanticCache(threshold=0.9)
+    sc.record_verification("Paris", "Paris")
+    sc.record_verification("Paris", "The answer is Lyon, not what you think")
+    assert sc.lookup(_payload("what is the capital of spain")) is None  # empty partition
+    sc.add(_payload("what is the capital of france"), "Paris")
+    far = sc.lookup(_payload("what is the capital of spain"))
+    sc.record_miss(far, "Paris")  # the rejected neighbour would have been right
+    sc.record_miss(far, "Madrid")
+    st = sc.stats()
+    assert (st["verified"], st["verified_ok"], st["missed_hits"]) == (2, 1, 1)
+    assert st["precision"] == 0.5
+    assert st["recall"] == 0.0  # no hits yet, one missed
+
+def test_should_verify():
+    assert not SemanticCache(verify_rate=0.0).should_verify()
+    assert SemanticCache(verify_rate=1.0).should_verify()
+
+def _client(tmp_path, verify_rate: float) -> LLMClient:
+    settings = dataclasses.replace(
+        load_settings(),
+        cache_dir=str(tmp_path),
+        semantic_cache_agents=("qa",),
+        semantic_cache_threshold=0.9,
+        semantic_cache_verify_rate=verify_rate,
+    )
+    return LLMClient(settings, provider=MockProvider())
+
+@pytest.mark.parametrize("verify_rate", [0.0, 1.0])
+@pytest.mark.parametrize("mode", ["chat", "stream"])
+def test_semantic_hits_are_sampled_for_verification(tmp_path, mode, verify_rate):
+    llm = _client(tmp_path, verify_rate)
+
+    def ask(text: str) -> str:
+        messages = [{"role": "user", "content": text}]
+        if mode == "chat":
+            return llm.chat(messages, agent="qa").text
+        return "".join(llm.stream(messages, agent="qa"))
+
+    first = ask("what is the capital of france")
+    second = ask("what is the capital of france today")
+    st = llm.semantic.stats()
+    assert st["hits"] == 1
+    if verify_rate:
+        assert second != first  # asked upstream again
+        assert st["verified"] == 1
+    else:
+        assert second == first  # answered from the semantic tier
+        assert st["verified"] == 0
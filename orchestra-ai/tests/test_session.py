@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+import orchestra.memory.session as session_mod
+from orchestra.memory.session import Message, SessionStore
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls: list[int] = []
+    real = os.fsync
+    monkeypatch.setattr(session_mod.os, "fsync", lambda fd: (calls.append(fd), real(fd)))
+    return calls
+
+def _store(tmp_path, **kw) -> SessionStore:
+    # background pass effectively off, so the tests decide when it runs
+    kw.setdefault("fsync_interval_s", 3600)
+    kw.setdefault("compact_interval_s", 3600)
+    return SessionStore(str(tmp_path), **kw)
+
+def test_fsync_always_syncs_every_append(tmp_path, fsyncs):
+    s = _store(tmp_path, fsync="always")
+    for i in range(3):
+        s.append("a", "user", f"m{i}")
+    assert len(fsyncs) == 3
+    s.close()
+
+def test_fsync_interval_syncs_once_per_round(tmp_path, fsyncs):
+    s = _store(tmp_path, fsync="interval")
+    for i in range(3):
+        s.append("a", "user", f"m{i}")
+    s.append("b", "user", "x")
+    assert fsyncs == []
+    s.close()  # runs the pending round: one fsync per touched session
+    assert len(fsyncs) == 2
+
+def test_fsync_never(tmp_path, fsyncs):
+    s = _store(tmp_path, fsync="never")
+    s.append("a", "user", "m")
+    s.close()
+    assert fsyncs == []
+
+def test_fsync_mode_is_checked(tmp_path):
+    with pytest.raises(ValueError):
+        SessionStore(str(tmp_path), fsync="sometimes")
+
+def test_tail_reads_only_the_end(tmp_path):
+    s = _store(tmp_path, cache_sessions=0)
+    big = "x" * 5000  # several tail blocks' worth of history
+    for i in range(50):
+        s.append("a", "user" if i % 2 == 0 else "assistant", f"{i} {big}")
+    last = s.load("a", last_n=3)
+    assert [m.content.split()[0] for m in last] == ["47", "48", "49"]
+    assert s.load("a", last_n=0) == []
+    assert len(s.load("a", last_n=100)) == 50
+    s.close()
+
+def test_torn_last_line_is_skipped(tmp_path):
+    s = _store(tmp_path, cache_sessions=0)
+    s.append("a", "user", "one")
+    s.append("a", "user", "two")
+    with s.path("a").open("ab") as f:
+        f.write(b'{"role": "user", "content": "thr')  # crash mid-write
+    assert [m.content for m in s.load("a")] == ["one", "two"]
+    assert [m.content for m in s.load("a", last_n=1)] == ["two"]
+    s.append("a", "user", "three")  # starts on a fresh line
+    assert [m.content for m in s.load("a")] == ["one", "two", "three"]
+    s.close()
+
+def test_compaction_trims_to_max_messages(tmp_path):
+    s = _store(tmp_path, max_messages=5)
+    for i in range(12):
+        s.append("a", "user", f"m{i}")
+    s.compact()
+    assert len(s.path("a").read_bytes().splitlines()) == 5
+    assert [m.content for m in s.load("a")] == [f"m{i}" for i in range(7, 12)]
+    page, cursor = s.messages("a", "", 3)
+    assert [m["seq"] for m in page] == [1, 2, 3] and cursor == "3"
+    assert all(m["ts"] is not None for m in page)  # append times survive the rewrite
+    s.close()
+
+def test_legacy_json_session_is_migrated(tmp_path):
+    s = _store(tmp_path)
+    legacy = s.root / "old.json"
+    legacy.write_text('[{"role": "user", "content": "hi"}]', encoding="utf-8")
+    assert s.load("old") == [Message(role="user", content="hi")]
+    assert not legacy.exists() and s.path("old").exists()
+    s.close()
+
+def test_messages_rejects_a_bad_cursor(tmp_path):
+    s = _store(tmp_path)
+    s.append("a", "user", "m")
+    with pytest.raises(ValueError):
+        s.messages("a", "abc")
+    s.close()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+
+import pytest
+
+from orchestra.memory.session import Message, SessionStore
+from orchestra.memory.session_sqlite import SqliteSessionStore
+
+@pytest.fixture
+def store(tmp_path):
+    s = SqliteSessionStore(tmp_path / "sessions.sqlite3")
+    yield s
+    s.close()
+
+def _hold_writer(s: SqliteSessionStore, statements: list[str]) -> threading.Event:
+    """Park the writer inside a job (tracing its statements) until the returned event is set."""
+    gate, parked = threading.Event(), threading.Event()
+
+    def job(conn: sqlite3.Connection) -> None:
+        conn.set_trace_callback(statements.append)
+        parked.set()
+        gate.wait()
+
+    threading.Thread(target=s._submit, args=(job,), daemon=True).start()
+    parked.wait()
+    return gate
+
+def test_queued_appends_share_one_commit(store):
+    statements: list[str] = []
+    gate = _hold_writer(store, statements)
+    threads = [threading.Thread(target=store.append, args=("a", "user", f"m{i}")) for i in range(20)]
+    for t in threads:
+        t.start()
+    while store._queue.qsize() < 20:
+        threading.Event().wait(0.01)
+    gate.set()
+    for t in threads:
+        t.join()
+    # the held batch, then all 20 appends together
+    assert statements.count("COMMIT") == 2
+    page, _ = store.messages("a", "", 100)
+    assert [m["seq"] for m in page] == list(range(1, 21))
+    assert sorted(m["content"] for m in page) == sorted(f"m{i}" for i in range(20))
+
+def test_a_failing_job_does_not_fail_its_batch(store):
+    gate = _hold_writer(store, [])
+    errors: list[Exception] = []
+
+    def bad() -> None:
+        try:
+            store._submit(lambda conn: conn.execute("INSERT INTO missing VALUES (1)"))
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store.append, args=("a", "user", f"m{i}")) for i in range(5)]
+    threads.insert(2, threading.Thread(target=bad))
+    for t in threads:
+        t.start()
+    while store._queue.qsize() < 6:
+        threading.Event().wait(0.01)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(errors) == 1
+    assert len(store.load("a")) == 5
+
+def test_pages_and_bad_cursor(store):
+    for i in range(5):
+        store.append("a", "user", f"m{i}")
+    page, cursor = store.messages("a", "", 2)
+    assert [m["content"] for m in page] == ["m0", "m1"] and cursor == "2"
+    page, cursor = store.messages("a", cursor, 10)
+    assert [m["seq"] for m in page] == [3, 4, 5] and cursor is None
+    with pytest.raises(ValueError):
+        store.messages("a", "2; DROP TABLE messages")
+
+def test_save_replaces_and_keeps_ts(store):
+    store.save("a", [Message("user", "x", ts=1.0), Message("assistant", "y")])
+    msgs = store.load("a")
+    assert [m.content for m in msgs] == ["x", "y"]
+    assert msgs[0].ts == 1.0 and msgs[1].ts is not None
+    assert store.load("a", last_n=1)[0].content == "y"
+
+def test_empty_database_imports_jsonl(tmp_path):
+    jsonl = SessionStore(str(tmp_path))
+    jsonl.append("old", "user", "hello")
+    jsonl.close()
+    s = SqliteSessionStore(tmp_path / "sessions.sqlite3", import_dir=tmp_path / "sessions")
+    assert [m.content for m in s.load("old")] == ["hello"]
+    s.close()
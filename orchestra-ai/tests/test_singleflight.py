@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from orchestra.llm.singleflight import SingleFlight
+
+def test_concurrent_threads_share_one_call():
+    sf = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    runs: list[int] = []
+
+    def fn() -> str:
+        runs.append(1)
+        started.set()
+        release.wait()
+        return "answer"
+
+    with ThreadPoolExecutor(8) as pool:
+        leader = pool.submit(sf.do, "k", fn)
+        started.wait()
+        waiters = [pool.submit(sf.do, "k", fn) for _ in range(5)]
+        while sf.stats.coalesced < 5:
+            threading.Event().wait(0.01)
+        release.set()
+        assert leader.result() == ("answer", False)
+        assert [w.result() for w in waiters] == [("answer", True)] * 5
+    assert len(runs) == 1
+    assert sf.snapshot() == {"leaders": 1, "coalesced": 5, "in_flight": 0}
+
+def test_waiters_get_the_leaders_exception():
+    sf = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fn() -> str:
+        started.set()
+        release.wait()
+        raise ValueError("upstream down")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(sf.do, "k", fn)
+        started.wait()
+        waiter = pool.submit(sf.do, "k", fn)
+        while sf.stats.coalesced < 1:
+            threading.Event().wait(0.01)
+        release.set()
+        for f in (leader, waiter):
+            with pytest.raises(ValueError, match="upstream down"):
+                f.result()
+    # nothing left in flight: the next call runs again
+    assert sf.do("k", lambda: "ok") == ("ok", False)
+
+def test_different_keys_do_not_coalesce():
+    sf = SingleFlight()
+    assert sf.do("a", lambda: 1) == (1, False)
+    assert sf.do("b", lambda: 2) == (2, False)
+    assert sf.stats.coalesced == 0
+
+def test_async_waiters_coalesce():
+    async def main():
+        sf = SingleFlight()
+        runs: list[int] = []
+
+        async def fn() -> str:
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        results = await asyncio.gather(*(sf.ado("k", fn) for _ in range(4)))
+        return results, runs
+
+    results, runs = asyncio.run(main())
+    assert len(runs) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+
+def test_cancelled_leader_hands_over_to_a_waiter():
+    async def main():
+        sf = SingleFlight()
+        calls: list[int] = []
+
+        async def fn() -> str:
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return f"run {len(calls)}"
+
+        leader = asyncio.create_task(sf.ado("k", fn))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(sf.ado("k", fn))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter, len(calls)
+
+    (text, coalesced), calls = asyncio.run(main())
+    # the waiter wasn't cancelled with the leader; it ran fn again as the new leader
+    assert (text, coalesced, calls) == ("run 2", False, 2)
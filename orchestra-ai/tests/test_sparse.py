@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import dataclasses
+import random
+import sys
+
+import pytest
+
+from orchestra.bootstrap import make_memory
+from orchestra.config import load_settings
+from orchestra.memory.vector import MemoryItem, TinyVectorIndex
+
+def _settings(**kw):
+    return dataclasses.replace(load_settings(), **kw)
+
+def _corpus(seed: int = 0) -> tuple[list[MemoryItem], list[str]]:
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(300)]
+    weights = [1 / (i + 1) for i in range(300)]
+
+    def text(n: int) -> str:
+        return " ".join(rng.choices(words, weights=weights, k=n))
+
+    return [MemoryItem(id=str(i), text=text(15), meta={}) for i in range(2000)], [text(rng.randint(2, 6)) for _ in range(40)]
+
+@pytest.mark.parametrize("idf", [False, True])
+def test_sparse_backend_matches_tiny_top_k(idf):
+    pytest.importorskip("numpy")
+    from orchestra.memory.sparse import SparseVectorIndex
+
+    sparse = make_memory(_settings(memory_backend="sparse", memory_idf=idf))
+    tiny = make_memory(_settings(memory_backend="memory", memory_idf=idf))
+    assert isinstance(sparse, SparseVectorIndex) and isinstance(tiny, TinyVectorIndex)
+    items, queries = _corpus()
+    for it in items:
+        sparse.add(it)
+        tiny.add(it)
+    for q in queries:
+        want, got = tiny.search(q, k=10), sparse.search(q, k=10)
+        # float32 storage can reorder exact ties, so compare the scores rank by rank
+        assert [s for _, s in got] == pytest.approx([s for _, s in want], abs=1e-5)
+        top = {it.id for it, s in want if s > want[-1][1] + 1e-5}  # above the tie at the cut
+        assert top <= {it.id for it, _ in got}
+
+def test_sparse_backend_without_numpy(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)  # import numpy now raises ImportError
+    monkeypatch.delitem(sys.modules, "orchestra.memory.sparse", raising=False)
+    with pytest.raises(ImportError, match=r"MEMORY_BACKEND=sparse needs NumPy: pip install -e \.\[fast\]"):
+        make_memory(_settings(memory_backend="sparse"))
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="sparse"):
+        make_memory(_settings(memory_backend="faiss"))
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from orchestra.tools.tabular import QueryError, run_query
+
+_ROWS = [
+    {"name": "a", "region": "EU", "country": "FR", "revenue": 10, "tags": ["x"]},
+    {"name": "b", "region": "EU", "country": "DE", "revenue": 30, "tags": ["x"]},
+    {"name": "c", "region": "US", "country": "US", "revenue": 20, "tags": ["y", "z"]},
+    {"name": "d", "region": "EU", "country": "FR", "revenue": 5, "tags": ["y", "z"]},
+    {"name": "e", "region": "APAC", "country": "JP", "revenue": "n/a", "tags": []},
+]
+
+@pytest.fixture(params=["csv", "jsonl"])
+def table(request, tmp_path):
+    if request.param == "csv":
+        path = tmp_path / "t.csv"
+        lines = ["name,region,country,revenue"] + [f"{r['name']},{r['region']},{r['country']},{r['revenue']}" for r in _ROWS]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    else:
+        path = tmp_path / "t.jsonl"
+        path.write_text("\n".join(json.dumps(r) for r in _ROWS) + "\nnot json\n", encoding="utf-8")
+    return path
+
+def test_where(table):
+    res = run_query(table, {"where": [{"col": "region", "op": "=", "value": "EU"}, {"col": "revenue", "op": ">=", "value": 10}], "columns": ["name"]})
+    assert res["rows"] == [["a"], ["b"]]
+    assert (res["rows_scanned"], res["rows_matched"], res["truncated"]) == (5, 2, False)
+    assert run_query(table, {"where": [{"col": "country", "op": "in", "value": ["JP", "US"]}], "columns": ["name"]})["rows"] == [["c"], ["e"]]
+    assert run_query(table, {"where": [{"col": "name", "op": "contains", "value": "B"}], "columns": ["name"]})["rows"] == [["b"]]
+
+def test_group_and_aggregates(table):
+    res = run_query(table, {
+        "group_by": ["region"],
+        "aggregates": [{"fn": "count"}, {"fn": "sum", "col": "revenue"}, {"fn": "avg", "col": "revenue"},
+                       {"fn": "min", "col": "revenue"}, {"fn": "max", "col": "revenue"}, {"fn": "count", "col": "revenue"}],
+        "order_by": "region",
+    })
+    assert res["columns"] == ["region", "count", "sum_revenue", "avg_revenue", "min_revenue", "max_revenue", "count_revenue"]
+    assert res["rows"] == [
+        ["APAC", 1, 0.0, None, None, None, 0],  # "n/a" isn't a number
+        ["EU", 3, 45.0, 15.0, 5.0, 30.0, 3],
+        ["US", 1, 20.0, 20.0, 20.0, 20.0, 1],
+    ]
+
+@pytest.mark.parametrize("desc, expected", [(True, [["b", "30"], ["c", "20"]]), (False, [["d", "5"], ["a", "10"]])])
+def test_top_k_rows(table, desc, expected):
+    numeric = [{"col": "revenue", "op": ">=", "value": 0}]
+    res = run_query(table, {"where": numeric, "columns": ["name", "revenue"], "order_by": "revenue", "desc": desc, "limit": 2})
+    rows = [[n, str(v)] for n, v in res["rows"]]
+    assert rows == expected
+    assert res["truncated"] and res["rows_matched"] == 4
+
+@pytest.mark.parametrize("desc, expected", [(True, ["EU", "US"]), (False, ["APAC", "US"])])
+def test_top_k_groups(table, desc, expected):
+    res = run_query(table, {"group_by": ["region"], "aggregates": [{"fn": "sum", "col": "revenue"}],
+                            "order_by": "sum_revenue", "desc": desc, "limit": 2})
+    assert [r[0] for r in res["rows"]] == expected
+    assert res["truncated"]
+
+def test_truncation_without_order(table):
+    res = run_query(table, {"limit": 3})
+    assert len(res["rows"]) == 3 and res["truncated"]
+    assert res["columns"][:2] == ["name", "region"]
+    assert not run_query(table, {"limit": 5})["truncated"]
+    assert not run_query(table, {"group_by": ["region"], "limit": 3})["truncated"]
+
+def test_unknown_order_by_is_rejected(table):
+    with pytest.raises(QueryError, match="order_by"):
+        run_query(table, {"columns": ["name"], "order_by": "revenu"})
+    with pytest.raises(QueryError, match="order_by"):
+        run_query(table, {"group_by": ["region"], "order_by": "revenu"})
+    # ordering by a column that isn't selected is fine
+    assert run_query(table, {"columns": ["name"], "order_by": "revenue", "limit": 1})["rows"] == [["d"]]
+
+def test_bad_queries(table):
+    with pytest.raises(QueryError):
+        run_query(table, {"aggregates": [{"fn": "median", "col": "revenue"}]})
+    with pytest.raises(QueryError):
+        run_query(table, {"aggregates": [{"fn": "sum"}]})
+    with pytest.raises(QueryError):
+        run_query(table, {"where": [{"col": "region", "op": "~"}]})
+
+def test_group_by_list_values(tmp_path):
+    path = tmp_path / "t.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in _ROWS), encoding="utf-8")
+    res = run_query(path, {"group_by": ["tags"], "aggregates": [{"fn": "count"}], "order_by": "count", "desc": True, "limit": 1})
+    assert res["rows"] == [['["x"]', 2]]
+    assert run_query(path, {"group_by": ["tags"]})["rows"] == [['["x"]', 2], ['["y", "z"]', 2], ["[]", 1]]
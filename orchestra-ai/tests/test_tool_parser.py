@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from orchestra.llm.tool_parser import (
+    JsonScanner,
+    ParseError,
+    ToolBatch,
+    ToolCall,
+    ToolCallStream,
+    compile_args,
+    parse_tool_output,
+)
+
+_BATCH = 'Sure, calling both:\n```json\n[{"tool": "search", "args": {"q": "a"}}, {"tool": "write", "args": {"path": "x"}}]\n```'
+
+def _chunks(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def _stream(text: str, size: int, early=None) -> tuple[ToolCallStream, list[list[ToolCall]]]:
+    s = ToolCallStream(early)
+    return s, [s.feed(c) for c in _chunks(text, size)]
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_chunked_stream_matches_the_full_parse(size):
+    s, per_chunk = _stream(_BATCH, size)
+    assert s.accepted
+    assert sum(per_chunk, []) == s.calls == parse_tool_output(_BATCH).calls
+
+def test_split_inside_a_token():
+    s = ToolCallStream()
+    assert s.feed('{"tool": "sea') == []
+    assert s.feed('rch", "ar') == []
+    assert s.feed('gs": {"q": 1') == []
+    assert s.feed("}}") == [ToolCall("search", {"q": 1})]
+    assert s.accepted and s.feed('{"tool": "again"}') == []  # only the first value counts
+
+def test_escaped_strings_do_not_close_brackets():
+    args = {"s": 'quote " brace } bracket ] backslash \\', "t": "\\"}
+    text = json.dumps({"tool": "echo", "args": args})
+    for size in (1, 3):
+        s, per_chunk = _stream(text, size)
+        assert sum(per_chunk, []) == [ToolCall("echo", args)]
+    assert parse_tool_output("say " + text + " ok").calls == [ToolCall("echo", args)]
+
+def test_nested_arrays_inside_a_batch():
+    text = '[{"tool": "a", "args": {"m": [[1, 2], [3, [4]]]}}, {"tool": "b", "args": {"o": {"p": [{}]}}}]'
+    sc = JsonScanner()
+    found = sum((sc.feed(c) for c in text), [])
+    # both items are reported as they close, with the index of the (still open) array
+    assert [(o["tool"], idx) for o, idx in found] == [("a", 0), ("b", 0)]
+    assert sc.values == [text]
+    assert parse_tool_output(text).calls == [ToolCall("a", {"m": [[1, 2], [3, [4]]]}), ToolCall("b", {"o": {"p": [{}]}})]
+
+@pytest.mark.parametrize("text, message", [
+    ('{"tool": "a", "args": {"x": 1}', "invalid JSON"),  # truncated
+    ("{not json}", "invalid JSON"),
+    ('{"tool": 3}', "tool must be a non-empty string"),
+    ('{"tool": "a", "args": [1]}', "args must be an object"),
+    ('[{"tool": "a"}, 2]', "batch item 1 must be an object"),
+    ("[1, 2]", "batch item 0 must be an object"),
+])
+def test_malformed_output_is_a_parse_error(text, message):
+    res = parse_tool_output(text)
+    assert isinstance(res, ParseError) and message in res.message
+
+def test_no_json_and_recovery_after_bad_brackets():
+    assert parse_tool_output("just prose, no call") is None
+    # a mismatched bracket resets the scanner; the next value is still found
+    assert parse_tool_output('oops {"a": ] then {"tool": "ok"}').calls == [ToolCall("ok", {})]
+    assert isinstance(parse_tool_output('{"tool": "t"}'), ToolBatch)
+
+def test_invalid_json_value_is_skipped_for_the_next_one():
+    s, per_chunk = _stream('{bad} [{"tool": "a"}]', 4)
+    assert s.accepted and sum(per_chunk, []) == s.calls == [ToolCall("a", {})]
+
+def test_early_dispatch_only_for_pure_tools():
+    s = ToolCallStream(early=lambda tool: tool == "search")
+    head, tail = _BATCH.split('{"tool": "write"')
+    assert s.feed(head) == [ToolCall("search", {"q": "a"})]  # before the array has closed
+    assert not s.accepted
+    # the side-effecting call waits for the whole batch to validate
+    assert s.feed('{"tool": "write"' + tail) == [ToolCall("write", {"path": "x"})]
+    assert s.accepted and [c.tool for c in s.calls] == ["search", "write"]
+
+def test_held_calls_are_dropped_when_the_batch_is_invalid():
+    s = ToolCallStream(early=lambda tool: tool == "search")
+    out = s.feed('[{"tool": "search"}, {"tool": "write"}, 1')
+    assert out == [ToolCall("search", {})]
+    assert s.feed("]") == []  # valid JSON, but not a batch of calls: write never runs
+    assert not s.accepted and s.calls == []
+
+def test_compile_args_coerces_and_reports():
+    validate = compile_args({
+        "type": "object",
+        "properties": {"n": {"type": "integer"}, "f": {"type": "boolean", "default": False}, "xs": {"type": "array"}},
+        "required": ["n"],
+    })
+    assert validate({"n": "3", "extra": 1}) == ({"n": 3, "f": False, "extra": 1}, [])
+    assert validate({"n": 1.5, "xs": "no"})[1] == ["n: expected integer", "xs: expected array"]
+    assert validate({}) == ({"f": False}, ["missing required: n"])
+    assert validate([]) == ({}, ["args must be an object"])
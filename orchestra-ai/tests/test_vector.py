@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import dataclasses
+import random
+
+from orchestra.bootstrap import make_memory
+from orchestra.config import load_settings
+from orchestra.memory.vector import MemoryItem, TinyVectorIndex, _cos, _tf
+
+def _texts(n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(40)]
+    # skewed draws: some words are in most items, others in a few
+    return [" ".join(rng.choices(words, weights=[1 / (i + 1) for i in range(40)], k=8)) for _ in range(n)]
+
+def test_default_is_exact_tf_cosine():
+    texts = _texts(300)
+    index = TinyVectorIndex()
+    for i, t in enumerate(texts):
+        index.add(MemoryItem(id=str(i), text=t, meta={}))
+    for q in _texts(20, seed=1):
+        qv = _tf(q)
+        want = sorted(((_cos(qv, _tf(t)), -i) for i, t in enumerate(texts)), reverse=True)[:5]
+        got = index.search(q, k=5)
+        assert [round(s, 9) for _, s in got] == [round(s, 9) for s, _ in want if s > 0]
+
+def test_idf_and_pruning_come_from_settings():
+    settings = dataclasses.replace(load_settings(), memory_backend="memory")
+    index = make_memory(settings)
+    assert (index.idf, index.max_postings) == (False, 0)
+    index = make_memory(dataclasses.replace(settings, memory_idf=True, memory_max_postings=100))
+    assert (index.idf, index.max_postings) == (True, 100)